@@ -0,0 +1,86 @@
+"""
+Equivalence check of the parallel runtime modes: every game is played against the fake LLM backend
+(`llm.api: fake`, with random latencies so that rounds finish out of order) sequentially and with each
+parallel mode that applies to it, and the JSONL interaction logs must be byte-identical apart from their
+first line (the config, which records the runtime settings).
+
+- `runtime.parallel_rounds` (donor, pd, trust; only used without gossip)
+- `runtime.parallel_episodes` (donor, pd; with two episodes)
+
+The market has no parallel mode (and an unseeded shuffled schedule), so it is not checked.
+
+Usage (from the repository root):
+    python -m benchmarks.equivalence
+    python -m benchmarks.equivalence --games donor --agents 8
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from omegaconf import OmegaConf
+
+from benchmarks.orchestration import make_config
+
+GAMES = ("donor", "pd", "trust")
+MODES = {
+    "parallel_rounds": (("donor", "pd", "trust"), (False,)),
+    "parallel_episodes": (("donor", "pd"), (False, True)),
+}
+
+
+def run_log(game, num_agents, gossip, directory, name, overrides):
+    """ Play one configuration and return the lines of its JSONL interaction log """
+    from llm.gateway import make_llm_client
+    from scenarios.donor.runner import DonorGameRunner
+    from scenarios.pd.runner import PDRunner
+    from scenarios.trust.runner import TrustGameRunner
+
+    runners = {"donor": DonorGameRunner, "pd": PDRunner, "trust": TrustGameRunner}
+    cfg = make_config(game, num_agents, gossip)
+    settings = {
+        "llm.fake.latency": "exponential", "llm.fake.latency_mean": 0.002, "llm.telemetry.enabled": False,
+        "log.format": "jsonl", "log.parquet": False, "runtime.max_workers": 8, **overrides,
+    }
+    for key, value in settings.items():
+        OmegaConf.update(cfg, key, value, force_add=True)
+    if "num_episodes" in cfg.experiment.env:
+        cfg.experiment.env.num_episodes = 2
+    log_path = os.path.join(directory, f"{name}.json")
+    cfg.metadata.save_dir = directory
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        client = make_llm_client(cfg, log_path)
+        runners[game](cfg, client, log_path).run_simulation(True)
+        client.close()
+    with open(os.path.join(directory, f"{name}.jsonl"), "rb") as f:
+        return f.read().splitlines()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the parallel runtime modes log exactly what the sequential run logs.")
+    parser.add_argument("--games", nargs="+", choices=GAMES, default=list(GAMES))
+    parser.add_argument("--agents", type=int, default=6)
+    args = parser.parse_args()
+
+    os.environ["WANDB_MODE"] = "disabled"
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for mode, (games, gossips) in MODES.items():
+            for game in (game for game in games if game in args.games):
+                for gossip in gossips:
+                    sequential = run_log(game, args.agents, gossip, directory, f"{game}_{gossip}_sequential", {})
+                    parallel = run_log(game, args.agents, gossip, directory, f"{game}_{gossip}_{mode}", {f"runtime.{mode}": True})
+                    same = sequential[1:] == parallel[1:]
+                    failures += not same
+                    print(f"{game:>6} gossip={str(gossip):<5} {mode:<17} {len(sequential) - 1:>5} rounds  {'identical' if same else 'DIFFERENT'}", flush=True)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
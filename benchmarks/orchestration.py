@@ -0,0 +1,292 @@
+"""
+Orchestration benchmark: runs the four game runners against the zero-latency fake LLM backend
+(`llm.api: fake`) and measures the non-LLM hot path.
+
+For every (game, number of agents, gossip) configuration it reports rounds/sec, prompt bytes per
+call, peak RSS, and the wall time split between prompt building (template substitution, STM
+updates), LLM calls (gateway + fake backend), env stepping, metrics and logging (the metrics
+sink, the interaction log, the round log, telemetry, prints). The metrics sink is `none` unless
+set with `--set metrics.sink=...`. Every configuration runs in a fresh process so that peak RSS is
+its own.
+
+Results are written as JSON (`--out`); pass an earlier result file as `--compare` to flag
+configurations whose rounds/sec dropped by more than `--tolerance`.
+
+Usage (from the repository root):
+    python -m benchmarks.orchestration
+    python -m benchmarks.orchestration --games donor pd --agents 5 21 51 --gossip on --max-rounds 0
+    python -m benchmarks.orchestration --out benchmarks/results/baseline.json
+    python -m benchmarks.orchestration --compare benchmarks/results/baseline.json
+"""
+import argparse
+import builtins
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+GAMES = ("donor", "pd", "trust", "market")
+CATEGORIES = ("prompt", "llm", "env", "metrics", "logging")
+
+
+class Timers:
+    """
+    Exclusive wall time per category: time spent in a wrapped call nested inside another one
+    (e.g. wandb.log inside logging_metrics) is charged to the inner category only.
+    """
+
+    def __init__(self):
+        self.totals = dict.fromkeys(CATEGORIES, 0.0)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _charge(self, category, seconds):
+        with self._lock:
+            self.totals[category] += seconds
+
+    def wrap(self, category, fn):
+        timers = self
+
+        def timed(*args, **kwargs):
+            stack = timers._local.__dict__.setdefault("stack", [])
+            now = time.perf_counter()
+            if stack:
+                timers._charge(stack[-1][0], now - stack[-1][1])
+            stack.append([category, now])
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                now = time.perf_counter()
+                timers._charge(category, now - stack.pop()[1])
+                if stack:
+                    stack[-1][1] = now
+
+        timed.__wrapped__ = fn
+        return timed
+
+    def patch(self, category, owner, name):
+        setattr(owner, name, self.wrap(category, getattr(owner, name)))
+
+
+def make_config(game, num_agents, gossip, overrides=()):
+    """ conf/config.yaml with conf/experiment/<game>.yaml, as hydra composes them, plus `key=value` overrides """
+    from omegaconf import OmegaConf
+
+    cfg = OmegaConf.load(os.path.join(ROOT, "conf", "config.yaml"))
+    cfg.pop("defaults", None)
+    experiment = OmegaConf.load(os.path.join(ROOT, "conf", "experiment", f"{game}.yaml"))
+    for i in range(num_agents):
+        if f"agent_{i}" not in experiment.agents:
+            experiment.agents[f"agent_{i}"] = {"name": f"Agent{i}"}
+    experiment.agents.num = num_agents
+    experiment.agents.is_gossip = gossip
+    experiment.agents.insert_greedy_agent = False
+    if "num_episodes" in experiment.env:
+        experiment.env.num_episodes = 1
+    cfg.experiment = experiment
+    cfg.llm.api = "fake"
+    cfg.llm.fake.latency_mean = 0.0
+    cfg.llm.fake.error_rate = 0.0
+    cfg.metrics.sink = "none"
+    cfg.metadata.trial_timestamp = "benchmark"
+    for override in overrides:
+        key, value = override.split("=", 1)
+        OmegaConf.update(cfg, key, OmegaConf.create({"v": value}).v if value else value, force_add=True)
+    return cfg
+
+
+def run_one(game, num_agents, gossip, max_rounds, overrides):
+    """ Run one configuration in this (fresh) process and return its measurements """
+    os.environ["WANDB_MODE"] = "disabled"
+    os.environ.setdefault("WANDB_SILENT", "true")
+    import wandb
+    from llm.gateway import LLMGateway, make_llm_client
+    from llm.telemetry import CallTelemetry
+    from scenarios.common.templates import CompiledTemplate
+    from scenarios.common.wal import RoundLog
+    from scenarios.common.interaction_log import InteractionLog
+    from scenarios.common.metrics_sink import MetricsSink
+    from scenarios.donor import agent as donor_agent, env as donor_env, runner as donor_runner
+    from scenarios.pd import agent as pd_agent, env as pd_env, runner as pd_runner
+    from scenarios.trust import agent as trust_agent, env as trust_env, runner as trust_runner
+    from scenarios.market import agent as market_agent, env as market_env, runner as market_runner
+
+    modules = {
+        "donor": (donor_agent, donor_env.DonorGameEnv, donor_runner, donor_runner.DonorGameRunner),
+        "pd": (pd_agent, pd_env.PDEnv, pd_runner, pd_runner.PDRunner),
+        "trust": (trust_agent, trust_env.TrustGameEnv, trust_runner, trust_runner.TrustGameRunner),
+        "market": (market_agent, market_env.ProductChoiceMarketEnv, market_runner, market_runner.ProductChoiceMarketRunner),
+    }
+    agent_module, env_cls, runner_module, runner_cls = modules[game]
+
+    timers = Timers()
+    prompt_bytes = []
+    rounds = [0]
+
+    def counted_complete(complete):
+        def complete_and_count(self, rule_prompt, user_prompt, response_class):
+            prompt_bytes.append(len(rule_prompt.encode()) + len(user_prompt.encode()))
+            return complete(self, rule_prompt, user_prompt, response_class)
+        return complete_and_count
+
+    def capped_schedule(schedule):
+        def cap(self, episode, pairs, agents):
+            if max_rounds and pairs and isinstance(pairs[0], list):
+                # pd concurrent matchings: keep whole matchings up to max_rounds pairs
+                kept, total = [], 0
+                for matching in pairs:
+                    if total >= max_rounds:
+                        break
+                    kept.append(matching)
+                    total += len(matching)
+                pairs = kept
+            elif max_rounds:
+                pairs = pairs[:max_rounds]
+            return schedule(self, episode, pairs, agents)
+        return cap
+
+    def counted_round(play_or_restore):
+        def play_and_count(self, *args, **kwargs):
+            rounds[0] += 1
+            return play_or_restore(self, *args, **kwargs)
+        return play_and_count
+
+    LLMGateway.complete = timers.wrap("llm", counted_complete(LLMGateway.complete))
+    RoundLog.schedule = capped_schedule(RoundLog.schedule)
+    RoundLog.play_or_restore = counted_round(RoundLog.play_or_restore)
+    timers.patch("prompt", CompiledTemplate, "substitute")
+    for cls in vars(agent_module).values():
+        if isinstance(cls, type) and "update_stm" in vars(cls):
+            timers.patch("prompt", cls, "update_stm")
+    timers.patch("env", env_cls, "step")
+    for name, fn in list(vars(runner_module).items()):
+        if callable(fn) and (name.startswith("compute_") or name.startswith("logging_metrics")):
+            timers.patch("metrics", runner_module, name)
+    for name in ("init_log", "close_log"):
+        if hasattr(runner_module, name):
+            timers.patch("logging", runner_module, name)
+    timers.patch("logging", wandb, "log")
+    timers.patch("logging", MetricsSink, "log")
+    timers.patch("logging", MetricsSink, "log_series")
+    timers.patch("logging", json, "dump")
+    timers.patch("logging", RoundLog, "_write")
+    timers.patch("logging", InteractionLog, "write")
+    timers.patch("logging", InteractionLog, "close")
+    timers.patch("logging", CallTelemetry, "record")
+
+    cfg = make_config(game, num_agents, gossip, overrides)
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, "w") as devnull:
+        log_path = os.path.join(directory, "benchmark.json")
+        cfg.metadata.save_dir = directory
+        print_ = builtins.print
+        builtins.print = timers.wrap("logging", print_)
+        try:
+            with contextlib.redirect_stdout(devnull):
+                client = make_llm_client(cfg, log_path)
+                start = time.perf_counter()
+                runner_cls(cfg, client, log_path).run_simulation(True)
+                wall = time.perf_counter() - start
+                client.close()
+        finally:
+            builtins.print = print_
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+    split = {category: round(seconds, 4) for category, seconds in timers.totals.items()}
+    split["other"] = round(max(wall - sum(timers.totals.values()), 0.0), 4)
+    non_llm = max(wall - timers.totals["llm"], 1e-9)
+    return {
+        "game": game,
+        "agents": num_agents,
+        "gossip": gossip,
+        "rounds": rounds[0],
+        "calls": len(prompt_bytes),
+        "wall_s": round(wall, 4),
+        "rounds_per_s": round(rounds[0] / wall, 2) if wall else None,
+        "non_llm_rounds_per_s": round(rounds[0] / non_llm, 2),
+        "prompt_bytes_per_call": round(sum(prompt_bytes) / len(prompt_bytes), 1) if prompt_bytes else 0,
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "time_split_s": split,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, tolerance):
+    """ Print the configurations whose rounds/sec fell below (1 - tolerance) x the baseline; return how many """
+    with open(baseline_path) as f:
+        baseline = {(r["game"], r["agents"], r["gossip"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    for result in results:
+        before = baseline.get((result["game"], result["agents"], result["gossip"]))
+        if before is None or not before.get("rounds_per_s"):
+            continue
+        ratio = result["rounds_per_s"] / before["rounds_per_s"]
+        flag = ratio < 1 - tolerance
+        regressions += flag
+        print(f"{result['game']:>6} n={result['agents']:<4} gossip={str(result['gossip']):<5} rounds/s {before['rounds_per_s']:>9} -> {result['rounds_per_s']:>9} ({ratio:.2f}x){'  REGRESSION' if flag else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the game runners against the zero-latency fake LLM.")
+    parser.add_argument("--games", nargs="+", choices=GAMES, default=list(GAMES))
+    parser.add_argument("--agents", nargs="+", type=int, default=[5, 10, 20, 50, 100, 200])
+    parser.add_argument("--gossip", choices=("on", "off", "both"), default="both")
+    parser.add_argument("--max-rounds", type=int, default=500, help="play at most this many rounds of the schedule (0 = the full schedule)")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="KEY=VALUE", help="config override, e.g. --set memory.messages_scope=counterpart")
+    parser.add_argument("--out", default=None, help="result file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="earlier result file to compare rounds/sec against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative drop of rounds/sec before a configuration is flagged")
+    args = parser.parse_args()
+
+    gossips = {"on": [True], "off": [False], "both": [False, True]}[args.gossip]
+    configs = [(game, n, gossip) for game in args.games for n in args.agents for gossip in gossips]
+    results = []
+    for game, n, gossip in configs:
+        # a fresh process per configuration, so that peak RSS and module state are its own
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            result = pool.submit(run_one, game, n, gossip, args.max_rounds, tuple(args.overrides)).result()
+        results.append(result)
+        split = ", ".join(f"{k} {v:.2f}s" for k, v in result["time_split_s"].items())
+        print(f"{game:>6} n={n:<4} gossip={str(gossip):<5} {result['rounds']:>6} rounds  {result['rounds_per_s']:>9} rounds/s  "
+              f"{result['prompt_bytes_per_call']:>10} B/call  {result['peak_rss_mb']:>7} MB  [{split}]", flush=True)
+
+    out = args.out or os.path.join(ROOT, "benchmarks", "results", f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "max_rounds": args.max_rounds,
+            "overrides": args.overrides,
+            "results": results,
+        }, f, indent=4)
+    print(f"Results saved to {out}")
+    if args.compare:
+        if compare(results, args.compare, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
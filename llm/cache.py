@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def request_key(api, model, temperature, rule_prompt, user_prompt, response_class):
+    """
+    Content address of one LLM request: a SHA-256 over everything that determines the response.
+    """
+    schema = response_class.model_json_schema() if hasattr(response_class, "model_json_schema") else str(response_class)
+    payload = json.dumps([api, model, temperature, rule_prompt, user_prompt, schema], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Disk-backed LLM response cache (SQLite), keyed by `request_key`.
+
+    The total size of the stored responses is bounded by `max_bytes`; when it is exceeded the
+    least recently used entries are evicted. The database can be shared by several processes: the
+    running size estimate is re-read from the database every `refresh_every` stores, so the writes
+    of other processes count too. Hits only queue their access time, which is written in one batch
+    with the next store (or every `touch_batch` hits), so a lookup never writes.
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024, refresh_every=100, touch_batch=256):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.refresh_every = refresh_every
+        self.touch_batch = touch_batch
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._touched = {} # key -> last access not written yet
+        self._puts = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+        # running estimate of the stored bytes; the exact total is recomputed every `refresh_every` stores
+        # and when it crosses the bound
+        self._size = self._stored_bytes()
+
+    @classmethod
+    def from_config(cls, cache_cfg):
+        return cls(path=cache_cfg.path, max_bytes=int(cache_cfg.get("max_size_mb", 512) * 1024 * 1024))
+
+    def get(self, key):
+        """ Return the cached response dict for `key`, or None """
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touches()
+        return json.loads(row[0])
+
+    def put(self, key, response):
+        data = json.dumps(response, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._write_touches()
+                replaced = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, data, len(data), time.time()),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._size += len(data) - (replaced[0] if replaced is not None else 0)
+            self._puts += 1
+            if self._puts % self.refresh_every == 0:
+                self._size = self._stored_bytes()
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _write_touches(self):
+        """ Write the queued access times of the hits (inside the caller's transaction) """
+        if self._touched:
+            self._conn.executemany("UPDATE responses SET last_access = ? WHERE key = ?", [(t, key) for key, t in self._touched.items()])
+            self._touched.clear()
+
+    def _flush_touches(self):
+        if self._touched:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._write_touches()
+            self._conn.execute("COMMIT")
+
+    def _stored_bytes(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self):
+        """ Drop least recently used entries until the stored responses fit in max_bytes """
+        total = self._stored_bytes()
+        self._size = total
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+            if freed >= excess:
+                break
+            doomed.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+        self._size = total - freed
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_touches()
+            self._conn.close()
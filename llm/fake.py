@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+
+from llm.rate_limit import estimate_tokens
+
+POLICIES = ("cooperate", "defect", "tit_for_tat", "random")
+LATENCIES = ("constant", "uniform", "exponential", "lognormal")
+
+# categorical action fields: (cooperative value, uncooperative value, all valid values)
+CHOICES = {
+    "donor_action": ("cooperate", "defect", ("cooperate", "defect")),
+    "player_action": ("C", "D", ("C", "D")),
+    "seller_action": ("H", "L", ("H", "L")),
+    "buyer_action": ("c", "none", ("c", "s", "none")),
+}
+# numeric action fields: share of the allowed maximum played when cooperating
+AMOUNTS = {
+    "investor_action": 1.0,
+    "responder_action": 0.5,
+}
+# the JSON format instructions state the allowed range, e.g. "a real number between 0 and 10 representing ..."
+MAX_AMOUNT = re.compile(r"between 0 and (\S+?) representing")
+
+
+class FakeAPIError(Exception):
+    """ Injected provider failure; carries an HTTP status like the SDK errors, so the limiter treats it the same way """
+
+    def __init__(self, status_code):
+        super().__init__(f"fake provider error {status_code}")
+        self.status_code = status_code
+
+
+class FakeLLM:
+    """
+    Offline backend for `llm.api: fake`, used to load-test the runners and the gateway machinery
+    (concurrency, rate limiting, retries, telemetry) without API calls.
+
+    Every response is schema-valid for its response class, and its action follows `llm.fake.policy`:
+    - cooperate / defect: always the cooperative (uncooperative) action;
+    - tit_for_tat: the counterpart's last move in the episode, cooperating against unknown agents (pairs rarely
+      meet twice in these games, so this is the indirect-reciprocity reading of TFT);
+    - random: a uniform choice among the valid actions.
+    Gossip praises a counterpart whose last move was cooperative and criticises it otherwise.
+
+    Each call sleeps for a latency drawn from `latency` (constant, uniform on [0, 2 * mean], exponential
+    with `latency_mean`, or lognormal with median `latency_mean` and shape `latency_sigma`), then fails
+    with `error_status` with probability `error_rate`. The draws are seeded by `seed`, the episode, the
+    prompt and the attempt number, so a run is reproducible however the calls interleave.
+    """
+
+    def __init__(self, policy="tit_for_tat", seed=0, latency="constant", latency_mean=0.0, latency_sigma=0.5, error_rate=0.0, error_status=429):
+        if policy not in POLICIES:
+            raise ValueError(f"Invalid fake policy '{policy}'. Choose one of {POLICIES}.")
+        if latency not in LATENCIES:
+            raise ValueError(f"Invalid fake latency '{latency}'. Choose one of {LATENCIES}.")
+        self.policy = policy
+        self.seed = seed
+        self.latency = latency
+        self.latency_mean = latency_mean
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.last_move = {} # (episode, agent name) -> whether its latest action was cooperative
+        self.attempts = {} # (episode, prompt digest) -> calls so far, so that retries draw fresh errors
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, fake_cfg):
+        if fake_cfg is None:
+            return cls()
+        return cls(
+            policy=fake_cfg.get("policy", "tit_for_tat"),
+            seed=fake_cfg.get("seed", 0),
+            latency=fake_cfg.get("latency", "constant"),
+            latency_mean=fake_cfg.get("latency_mean", 0.0),
+            latency_sigma=fake_cfg.get("latency_sigma", 0.5),
+            error_rate=fake_cfg.get("error_rate", 0.0),
+            error_status=fake_cfg.get("error_status", 429),
+        )
+
+    def _rng(self, rule_prompt, user_prompt, episode=None):
+        digest = hashlib.sha256(f"{rule_prompt}\x00{user_prompt}".encode()).hexdigest()
+        with self._lock:
+            attempt = self.attempts.get((episode, digest), 0)
+            self.attempts[(episode, digest)] = attempt + 1
+        return random.Random(f"{self.seed}:{episode}:{digest}:{attempt}")
+
+    def _delay(self, rng):
+        if self.latency_mean <= 0:
+            return 0.0
+        if self.latency == "uniform":
+            return rng.uniform(0.0, 2 * self.latency_mean)
+        if self.latency == "exponential":
+            return rng.expovariate(1.0 / self.latency_mean)
+        if self.latency == "lognormal":
+            return self.latency_mean * math.exp(rng.gauss(0.0, self.latency_sigma))
+        return self.latency_mean
+
+    def _cooperates(self, counterpart):
+        if self.policy == "cooperate":
+            return True
+        if self.policy == "defect":
+            return False
+        if self.policy == "random":
+            return None
+        return self.last_move.get(counterpart, True)
+
+    def respond(self, rng, user_prompt, response_class, tags):
+        """ The fields of a `response_class` reply for the agent and counterpart in `tags` """
+        # moves are remembered per episode, so that concurrently played episodes stay independent
+        agent, counterpart = (tags.get("episode"), tags.get("agent")), (tags.get("episode"), tags.get("counterpart"))
+        cooperate = self._cooperates(counterpart)
+        fields = {}
+        for field in response_class.model_fields:
+            if field in CHOICES:
+                nice, nasty, values = CHOICES[field]
+                value = rng.choice(values) if cooperate is None else (nice if cooperate else nasty)
+                fields[field] = value
+                with self._lock:
+                    self.last_move[agent] = value == nice
+            elif field in AMOUNTS:
+                match = MAX_AMOUNT.search(user_prompt)
+                maximum = float(match.group(1)) if match else 0.0
+                amount = rng.uniform(0.0, maximum) if cooperate is None else (AMOUNTS[field] * maximum if cooperate else 0.0)
+                fields[field] = amount
+                with self._lock:
+                    self.last_move[agent] = amount > 0
+            elif field == "tone":
+                fields[field] = "praising" if self.last_move.get(counterpart, True) else "criticism"
+            elif field == "gossip":
+                fields[field] = f"{counterpart[1]} {'cooperated' if self.last_move.get(counterpart, True) else 'defected'} last time."
+            else:
+                fields[field] = f"fake {self.policy} policy"
+        return fields
+
+    async def complete(self, rule_prompt, user_prompt, response_class, tags):
+        rng = self._rng(rule_prompt, user_prompt, tags.get("episode"))
+        delay = self._delay(rng)
+        if delay:
+            await asyncio.sleep(delay)
+        if rng.random() < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            raise FakeAPIError(self.error_status)
+        fields = self.respond(rng, user_prompt, response_class, tags)
+        usage = (estimate_tokens(rule_prompt, user_prompt), 0, estimate_tokens(json.dumps(fields)), 0)
+        return fields, usage
+
+    async def close(self):
+        if self.errors:
+            print(f"Fake LLM: injected {self.errors} errors")
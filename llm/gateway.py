@@ -0,0 +1,255 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+import httpx
+from openai import AsyncOpenAI
+from google import genai
+from together import AsyncTogether
+
+from llm.cache import ResponseCache, request_key
+from llm.fake import FakeLLM
+from llm.rate_limit import ProviderLimiter
+from llm.replay import ReplayClient, ResponseRecorder
+from llm.telemetry import CallTelemetry, call_tags, current_tags
+from llm.usage import TokenUsage, gemini_usage, openai_usage
+
+
+def extract_json(s: str) -> str:
+    start = s.find("{")
+    end = s.rfind("}")
+    if start == -1 or end == -1 or end <= start:
+        raise ValueError(f"No JSON object found in string: {repr(s)}")
+    return s[start:end+1]
+
+
+def parse_json_content(content: str) -> dict:
+    """
+    Parse a JSON reply, falling back to the outermost {...} block for models that wrap it in text.
+    """
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        return json.loads(extract_json(content))
+
+
+class LLMGateway:
+    """
+    Shared asynchronous front-end for every LLM call made by the agents.
+
+    The gateway owns one provider client with a pooled HTTP connection pool and an
+    event loop running on a background thread. Agents call `complete` (blocking) from
+    any thread, or `acomplete` from a coroutine; both return the parsed response as a
+    dict with the fields of `response_class`. At most `llm.max_concurrency` requests
+    are in flight at the same time.
+
+    Requests go through a `ProviderLimiter` configured by `llm.rate_limit`: optional
+    requests/min and tokens/min budgets, retry with jittered exponential backoff on
+    rate-limit and transient errors, and a concurrency limit that is halved on every
+    burst of 429s and grows back while calls succeed.
+
+    If `llm.cache.enabled` is set, responses are looked up in (and stored to) a persistent
+    `ResponseCache` before any request is sent. With `llm.replay.mode: record` every
+    response is also appended to a `ResponseRecorder` log for later offline replay.
+
+    Token usage reported by the provider, including prompt tokens served from its prefix cache,
+    is accumulated in `self.usage` and printed on `close`; `llm.log_usage` also prints it per call.
+    With `llm.telemetry.enabled` every call is also streamed to a `CallTelemetry` JSONL file
+    (by default `<log>.calls.jsonl`), tagged with the `call_tags` active in the calling thread.
+    """
+
+    def __init__(self, cfg, log_path=None):
+        self.cfg = cfg
+        self.api = cfg.llm.api
+        self.model = cfg.llm.model
+        self.temperature = cfg.llm.get("temperature", None)
+        self.max_concurrency = cfg.llm.get("max_concurrency", 16)
+        self.log_usage = cfg.llm.get("log_usage", False)
+        self.usage = TokenUsage()
+
+        self._dispatch = {
+            "openai": self._parse_openai,
+            "gemini-v2": self._parse_openai,
+            "together": self._parse_together,
+            "gemini": self._parse_gemini,
+            "deepseek": self._parse_deepseek,
+            "fake": self._parse_fake,
+        }
+        if self.api not in self._dispatch:
+            raise ValueError(f"Invalid API '{self.api}'. Choose one of {sorted(self._dispatch)}.")
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-gateway", daemon=True)
+        self._thread.start()
+        self.limiter = ProviderLimiter.from_config(cfg.llm.get("rate_limit", None), self.max_concurrency, provider=self.api)
+        self._client = self.build_client()
+
+        cache_cfg = cfg.llm.get("cache", None)
+        self.cache = ResponseCache.from_config(cache_cfg) if cache_cfg is not None and cache_cfg.enabled else None
+        replay_cfg = cfg.llm.get("replay", None)
+        self.recorder = ResponseRecorder(replay_cfg.path) if replay_cfg is not None and replay_cfg.mode == "record" else None
+        self.telemetry = CallTelemetry.from_config(cfg, log_path)
+
+    # ---------------------------
+    # provider clients
+    # ---------------------------
+    def _http_client(self):
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        return httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(600.0, connect=10.0))
+
+    def build_client(self):
+        # the SDKs' own retries are disabled so that 429s reach the limiter
+        if self.api == 'openai':
+            return AsyncOpenAI(api_key=os.environ["OPENAI_API_KEY"], http_client=self._http_client(), max_retries=0)
+        elif self.api == 'gemini':
+            return genai.Client(api_key=os.environ["GEMINI_API_KEY"])
+        elif self.api == 'gemini-v2':
+            return AsyncOpenAI(api_key=os.environ["GEMINI_API_KEY"], base_url="https://generativelanguage.googleapis.com/v1beta", http_client=self._http_client(), max_retries=0)
+        elif self.api == 'deepseek':
+            return AsyncOpenAI(api_key=os.environ["DEEPSEEK_API_KEY"], base_url="https://api.deepseek.com", http_client=self._http_client(), max_retries=0)
+        elif self.api == 'together':
+            return AsyncTogether(api_key=os.environ["TOGETHER_API_KEY"], http_client=self._http_client(), max_retries=0)
+        elif self.api == 'fake':
+            return FakeLLM.from_config(self.cfg.llm.get("fake", None))
+
+    # ---------------------------
+    # per-provider request/parse: each returns (parsed fields, (prompt, cached, completion) tokens)
+    # ---------------------------
+    async def _parse_openai(self, rule_prompt, user_prompt, response_class):
+        response = await self._client.beta.chat.completions.parse(
+            model=self.model,
+            messages=[
+                {"role": "developer", "content": rule_prompt}, # Instructions to the model that are prioritized ahead of user messages, following chain of command. Previously called the system prompt.
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format=response_class,
+        )
+        return response.choices[0].message.parsed.model_dump(), openai_usage(response.usage)
+
+    async def _parse_together(self, rule_prompt, user_prompt, response_class):
+        messages = [
+            {"role": "system", "content": rule_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        if self.model in ("deepseek-reasoner", "deepseek-chat"):
+            # DeepSeek-V3.1 on Together toggles reasoning instead of exposing two model names
+            response = await self._client.chat.completions.create(
+                model="deepseek-ai/DeepSeek-V3.1",
+                messages=messages,
+                reasoning={"enabled": self.model == "deepseek-reasoner"},
+            )
+        else:
+            response = await self._client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                response_format={'type': 'json_schema',
+                                 "schema": response_class.model_json_schema()}
+            )
+        return parse_json_content(response.choices[0].message.content), openai_usage(response.usage)
+
+    async def _parse_gemini(self, rule_prompt, user_prompt, response_class):
+        response = await self._client.aio.models.generate_content(
+            model=self.model,
+            contents=[rule_prompt, user_prompt],
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": response_class,
+            }
+        )
+        return json.loads(response.text), gemini_usage(response.usage_metadata)
+
+    async def _parse_deepseek(self, rule_prompt, user_prompt, response_class):
+        response = await self._client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": rule_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={'type': 'json_object'}
+        )
+        return json.loads(response.choices[0].message.content), openai_usage(response.usage)
+
+    async def _parse_fake(self, rule_prompt, user_prompt, response_class):
+        return await self._client.complete(rule_prompt, user_prompt, response_class, current_tags())
+
+    # ---------------------------
+    # public API
+    # ---------------------------
+    async def acomplete(self, rule_prompt, user_prompt, response_class, tags=None):
+        """
+        Send one structured request and return the parsed fields of `response_class` as a dict.
+        Must be awaited on the gateway loop; use `submit` or `complete` from other threads.
+        `tags` label the call in the telemetry (default: the `call_tags` of the current context).
+        """
+        start = time.perf_counter()
+        tags = current_tags() if tags is None else tags
+        usage, source = (0, 0, 0, 0), "cache"
+        key = None
+        if self.cache is not None or self.recorder is not None:
+            key = request_key(self.api, self.model, self.temperature, rule_prompt, user_prompt, response_class)
+        # SQLite calls run off the loop: a lookup can wait on the lock of a cache shared by a sweep
+        response = await asyncio.to_thread(self.cache.get, key) if self.cache is not None else None
+        if response is None:
+            source = "api"
+            with call_tags(**tags): # visible to the request (the fake backend plays by agent and counterpart)
+                response, usage = await self.limiter.run(
+                    lambda: self._dispatch[self.api](rule_prompt, user_prompt, response_class),
+                    rule_prompt, user_prompt,
+                )
+            self.usage.add(*usage)
+            if self.log_usage:
+                print(f"LLM usage: prompt_tokens={usage[0]} cached_tokens={usage[1]} completion_tokens={usage[2]}")
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.put, key, response)
+        if self.recorder is not None:
+            self.recorder.record(key, response_class, response)
+        if self.telemetry is not None:
+            self.telemetry.record(tags, time.perf_counter() - start, source, usage)
+        return response
+
+    def submit(self, rule_prompt, user_prompt, response_class):
+        """ Schedule a request on the gateway loop and return a concurrent.futures.Future """
+        # the call tags live in the caller's thread, not on the gateway loop
+        return asyncio.run_coroutine_threadsafe(self.acomplete(rule_prompt, user_prompt, response_class, current_tags()), self._loop)
+
+    def complete(self, rule_prompt, user_prompt, response_class):
+        """ Blocking call used by the agents; safe to call from several threads at once """
+        return self.submit(rule_prompt, user_prompt, response_class).result()
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        if self.cache is not None:
+            print(f"LLM response cache: {self.cache.stats()}")
+            self.cache.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.usage.calls:
+            print(f"LLM token usage: {self.usage.stats()}")
+        if self.telemetry is not None:
+            summary = self.telemetry.close()
+            print(f"LLM call telemetry ({self.telemetry.path}): {summary['calls']} calls, latency {summary['per_call']['latency_s']} s, "
+                  f"per round latency {summary['per_round']['latency_s']} s / tokens {summary['per_round']['tokens']}")
+        if self.limiter.retries:
+            print(f"LLM rate limiter: {self.limiter.stats()}")
+        if self.api == "gemini":
+            close = self._client.aio.aclose
+        else:
+            close = self._client.close
+        asyncio.run_coroutine_threadsafe(close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def make_llm_client(cfg, log_path=None):
+    """
+    Build the client shared by all agents: an `LLMGateway`, or a `ReplayClient` when `llm.replay.mode` is 'replay'.
+    `log_path` (the run's JSON log) places the default call telemetry file next to it.
+    """
+    replay_cfg = cfg.llm.get("replay", None)
+    if replay_cfg is not None and replay_cfg.mode == "replay":
+        return ReplayClient(cfg, replay_cfg.path)
+    return LLMGateway(cfg, log_path)
@@ -0,0 +1,228 @@
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import httpx
+
+
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "InternalServerError", "ServiceUnavailableError", "ServerError"}
+
+
+def error_status(e):
+    """ HTTP status carried by a provider SDK exception (openai/together use status_code, google-genai uses code) """
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(e, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_rate_limit_error(e):
+    return error_status(e) == 429 or type(e).__name__ == "RateLimitError"
+
+
+def is_retryable_error(e):
+    if is_rate_limit_error(e) or type(e).__name__ in RETRYABLE_ERRORS:
+        return True
+    status = error_status(e)
+    if status is not None:
+        return status >= 500 or status == 408
+    return isinstance(e, (httpx.TransportError, asyncio.TimeoutError))
+
+
+def retry_after(e):
+    """ Seconds requested by a Retry-After response header, if the provider sent one """
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(*texts, completion_tokens=0):
+    """ Rough token count (~4 characters per token) used to charge the tokens/min budget before a call """
+    return sum(len(t) for t in texts) // 4 + completion_tokens
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate_per_minute`, holding at most one minute of budget.
+    Callers reserve tokens up front and sleep off any deficit, so concurrent callers queue fairly.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        """ Take `amount` tokens (possibly going into debt) and return the seconds to wait before using them """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self, amount=1):
+        delay = self.reserve(amount)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    `TokenBucket` whose state lives in a SQLite database, so that several processes (e.g. the workers
+    of `sweep.py`) draw from one budget. Buckets are identified by `name`, one per provider and limit.
+    """
+
+    def __init__(self, path, name, rate_per_minute):
+        super().__init__(rate_per_minute)
+        self.path = path
+        self.name = name
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)", (name, self.capacity, time.time()))
+
+    def reserve(self, amount):
+        # wall-clock time, since monotonic clocks are not comparable across processes
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                tokens, updated = self._conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+                now = time.time()
+                tokens = min(self.capacity, tokens + max(now - updated, 0.0) * self.rate) - min(amount, self.capacity)
+                self._conn.execute("UPDATE buckets SET tokens = ?, updated = ? WHERE name = ?", (tokens, now, self.name))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return 0.0 if tokens >= 0 else -tokens / self.rate
+
+    async def acquire(self, amount=1):
+        # the transaction can wait on the other processes' locks, so it runs off the event loop
+        delay = await asyncio.to_thread(self.reserve, amount)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AdaptiveConcurrency:
+    """
+    Async concurrency limit adjusted by AIMD: +1 per window of successful calls, halved on a rate-limit error
+    (at most once per `cooldown` seconds, so a burst of 429s from the same window counts once).
+    """
+
+    def __init__(self, max_limit, min_limit=1, cooldown=1.0):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def on_rate_limited(self):
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown:
+            self.limit = max(self.min_limit, self.limit / 2)
+            self._last_decrease = now
+
+
+class ProviderLimiter:
+    """
+    Client-side limits for one provider: requests/min and tokens/min token buckets, an AIMD concurrency
+    limit, and jittered exponential retry of rate-limit and transient errors.
+
+    With `shared_path` the two budgets are `SharedTokenBucket`s in that SQLite file, named after
+    `provider`, and shared by every process using the same file and provider.
+    """
+
+    def __init__(self, max_concurrency, requests_per_minute=None, tokens_per_minute=None, completion_tokens_estimate=0,
+                 max_retries=8, initial_backoff=1.0, max_backoff=60.0, shared_path=None, provider=None):
+        def bucket(limit, rate_per_minute):
+            if shared_path:
+                return SharedTokenBucket(shared_path, f"{provider}:{limit}", rate_per_minute)
+            return TokenBucket(rate_per_minute)
+
+        self.requests = bucket("requests", requests_per_minute) if requests_per_minute else None
+        self.tokens = bucket("tokens", tokens_per_minute) if tokens_per_minute else None
+        self.completion_tokens_estimate = completion_tokens_estimate
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.retries = 0
+        self.rate_limited = 0
+
+    @classmethod
+    def from_config(cls, rl_cfg, max_concurrency, provider=None):
+        if rl_cfg is None:
+            return cls(max_concurrency)
+        return cls(
+            max_concurrency,
+            requests_per_minute=rl_cfg.get("requests_per_minute", None),
+            tokens_per_minute=rl_cfg.get("tokens_per_minute", None),
+            completion_tokens_estimate=rl_cfg.get("completion_tokens_estimate", 0),
+            max_retries=rl_cfg.get("max_retries", 8),
+            initial_backoff=rl_cfg.get("initial_backoff", 1.0),
+            max_backoff=rl_cfg.get("max_backoff", 60.0),
+            shared_path=rl_cfg.get("shared_path", None),
+            provider=provider,
+        )
+
+    def backoff(self, attempt):
+        cap = min(self.max_backoff, self.initial_backoff * 2 ** attempt)
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    async def run(self, request, *prompts):
+        """
+        Await `request()` within the limits, retrying retryable failures; `prompts` are only used to estimate tokens.
+        """
+        num_tokens = estimate_tokens(*prompts, completion_tokens=self.completion_tokens_estimate)
+        for attempt in range(self.max_retries + 1):
+            if self.requests is not None:
+                await self.requests.acquire(1)
+            if self.tokens is not None:
+                await self.tokens.acquire(num_tokens)
+            try:
+                async with self.concurrency:
+                    result = await request()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable_error(e):
+                    raise
+                if is_rate_limit_error(e):
+                    self.rate_limited += 1
+                    self.concurrency.on_rate_limited()
+                self.retries += 1
+                delay = retry_after(e) or self.backoff(attempt)
+                print(f"LLM request failed ({type(e).__name__}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s, concurrency limit {int(self.concurrency.limit)}")
+                await asyncio.sleep(delay)
+            else:
+                self.concurrency.on_success()
+                return result
+
+    def stats(self):
+        return {"retries": self.retries, "rate_limited": self.rate_limited, "concurrency_limit": int(self.concurrency.limit)}
@@ -0,0 +1,87 @@
+import gzip
+import json
+import os
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import Future
+
+from llm.cache import request_key
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class ResponseRecorder:
+    """
+    Append-only log of (request key, parsed response) records, one JSON object per line.
+    Prompts are not stored, only their `request_key`, which keeps recordings small.
+    A `.gz` path is written gzip-compressed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = _open(path, "a")
+        self._lock = threading.Lock()
+
+    def record(self, key, response_class, response):
+        line = json.dumps({"key": key, "class": response_class.__name__, "response": response}, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ReplayClient:
+    """
+    Offline stand-in for `LLMGateway` that serves responses from a recording made with
+    `llm.replay.mode: record`, without any network access.
+
+    Responses are matched by `request_key`, so the replayed run must use the same llm config
+    and produce the same prompts as the recorded one. Requests that occurred several times
+    are answered in their recorded order; once those are used up the last one is repeated.
+    """
+
+    def __init__(self, cfg, path):
+        self.api = cfg.llm.api
+        self.model = cfg.llm.model
+        self.temperature = cfg.llm.get("temperature", None)
+        self.path = path
+        self.served = 0
+        self._responses = defaultdict(deque)
+        self._lock = threading.Lock()
+        with _open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._responses[record["key"]].append(record["response"])
+
+    def complete(self, rule_prompt, user_prompt, response_class):
+        key = request_key(self.api, self.model, self.temperature, rule_prompt, user_prompt, response_class)
+        with self._lock:
+            queue = self._responses.get(key)
+            if not queue:
+                raise KeyError(f"No recorded {response_class.__name__} response for this request in {self.path}; the prompts or llm config differ from the recorded run.")
+            response = queue.popleft() if len(queue) > 1 else queue[0]
+            self.served += 1
+        return response
+
+    async def acomplete(self, rule_prompt, user_prompt, response_class):
+        return self.complete(rule_prompt, user_prompt, response_class)
+
+    def submit(self, rule_prompt, user_prompt, response_class):
+        future = Future()
+        try:
+            future.set_result(self.complete(rule_prompt, user_prompt, response_class))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def close(self):
+        print(f"Replayed {self.served} LLM responses from {self.path}")
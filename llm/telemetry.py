@@ -0,0 +1,196 @@
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+TOKEN_FIELDS = ("prompt_tokens", "cached_tokens", "completion_tokens", "reasoning_tokens")
+
+_call_tags = contextvars.ContextVar("llm_call_tags", default={})
+
+
+@contextmanager
+def call_tags(**tags):
+    """
+    Tag the LLM calls made inside the block (in this thread) for telemetry, e.g.
+    `with call_tags(agent=self.name, role="donor", call="action"):`. Nested blocks add to the outer tags.
+    """
+    token = _call_tags.set({**_call_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _call_tags.reset(token)
+
+
+def current_tags():
+    return dict(_call_tags.get())
+
+
+def _percentiles(values):
+    values = np.asarray(values, dtype=float)
+    if values.size == 0:
+        return {"p50": None, "p95": None}
+    p50, p95 = np.percentile(values, [50, 95])
+    return {"p50": round(float(p50), 4), "p95": round(float(p95), 4)}
+
+
+class _Quantiles:
+    """
+    Running count, total and quantiles of non-negative values in O(log range) memory: a histogram whose
+    bins grow by a factor `GAMMA`, so a quantile is off by at most (GAMMA - 1) / (GAMMA + 1) (1%), and
+    is clamped to the smallest and largest value seen.
+    """
+
+    GAMMA = 1.02
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.zeros = 0
+        self.bins = defaultdict(int) # bin i holds the values in (GAMMA^(i-1), GAMMA^i]
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if value <= 0:
+            self.zeros += 1
+        else:
+            self.bins[math.ceil(math.log(value) / math.log(self.GAMMA))] += 1
+
+    def _value(self, rank):
+        """ The value of 0-based rank `rank` (in ascending order), up to the bin width """
+        seen = self.zeros
+        value = 0.0
+        if rank >= seen:
+            for index in sorted(self.bins):
+                seen += self.bins[index]
+                if rank < seen:
+                    value = 2 * self.GAMMA ** index / (self.GAMMA + 1)
+                    break
+        return min(max(value, self.min), self.max)
+
+    def quantile(self, q):
+        """ Linear interpolation between the closest ranks, like `np.percentile` """
+        rank = q * (self.count - 1)
+        lower, upper = math.floor(rank), math.ceil(rank)
+        low = self._value(lower)
+        return low + (self._value(upper) - low) * (rank - lower)
+
+    def percentiles(self):
+        if self.count == 0:
+            return {"p50": None, "p95": None}
+        return {"p50": round(float(self.quantile(0.5)), 4), "p95": round(float(self.quantile(0.95)), 4)}
+
+
+class _CallStats:
+    """ Number of calls, latency and token usage of a group of calls """
+
+    def __init__(self):
+        self.calls = 0
+        self.latency = _Quantiles()
+        self.tokens = {field: _Quantiles() for field in TOKEN_FIELDS}
+
+    def add(self, record):
+        self.calls += 1
+        self.latency.add(record["latency_s"])
+        for field in TOKEN_FIELDS:
+            self.tokens[field].add(record[field])
+
+    def describe(self):
+        out = {"calls": self.calls, "latency_s": self.latency.percentiles()}
+        for field, quantiles in self.tokens.items():
+            out[field] = {"total": int(quantiles.total), **quantiles.percentiles()}
+        return out
+
+
+class CallTelemetry:
+    """
+    Per-call telemetry of the LLM gateway. Every request is appended as one JSON line to `path` as
+    soon as it completes, with its tags (game, episode, round, agent, role, call type), where the
+    response came from (`api` or the response `cache`), end-to-end latency in seconds (including
+    rate-limit waits and retries) and the token usage reported by the provider.
+
+    `close` writes `<path>.summary.json` (p50/p95 latency and tokens per call, per role/call type and
+    per round) and returns it. Only running aggregates of the calls are kept in memory, so the
+    percentiles of calls are approximate (see `_Quantiles`); those of whole rounds are exact.
+    """
+
+    def __init__(self, path, tags=None):
+        self.path = path
+        self.tags = dict(tags or {})
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.per_call = _CallStats() # api calls only: cache hits cost no latency or tokens
+        self.per_role_call = defaultdict(_CallStats)
+        self.per_round = defaultdict(_CallStats)
+
+    @classmethod
+    def from_config(cls, cfg, log_path=None):
+        """ `llm.telemetry`; by default the records go to `<log>.calls.jsonl` next to the JSON log """
+        telemetry_cfg = cfg.llm.get("telemetry", None)
+        if telemetry_cfg is None or not telemetry_cfg.get("enabled", False):
+            return None
+        path = telemetry_cfg.get("path", None)
+        if path is None:
+            if log_path is None:
+                return None
+            path = f"{os.path.splitext(log_path)[0]}.calls.jsonl"
+        return cls(path, tags={"game": cfg.experiment.env.game_name})
+
+    def record(self, tags, latency, source, usage=(0, 0, 0, 0)):
+        record = {"time": round(time.time(), 3), **self.tags, **tags, "source": source, "latency_s": round(latency, 4)}
+        record.update(zip(TOKEN_FIELDS, usage))
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.calls += 1
+            if source == "api":
+                self.per_call.add(record)
+                self.per_role_call[f"{record.get('role')}/{record.get('call')}"].add(record)
+                if record.get("round") is not None:
+                    self.per_round[(record.get("episode"), record["round"])].add(record)
+
+    def summary(self):
+        with self._lock:
+            # per-round totals: the latency / tokens a whole round costs
+            round_totals = [(stats.latency.total, stats.tokens["prompt_tokens"].total + stats.tokens["completion_tokens"].total)
+                            for stats in self.per_round.values()]
+            return {
+                "calls": self.calls,
+                "cache_hits": self.calls - self.per_call.calls,
+                "per_call": self.per_call.describe(),
+                "per_role_call": {key: stats.describe() for key, stats in sorted(self.per_role_call.items())},
+                "per_round": {
+                    "rounds": len(round_totals),
+                    "latency_s": _percentiles([latency for latency, _ in round_totals]),
+                    "tokens": _percentiles([tokens for _, tokens in round_totals]),
+                    "rounds_detail": [
+                        {"episode": episode, "round": round_num, **self.per_round[(episode, round_num)].describe()}
+                        for episode, round_num in sorted(self.per_round, key=lambda key: (str(key[0]), key[1]))
+                    ],
+                },
+            }
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return None
+            self._file.close()
+        summary = self.summary()
+        with open(f"{os.path.splitext(self.path)[0]}.summary.json", "w") as f:
+            json.dump(summary, f, indent=4)
+        return summary
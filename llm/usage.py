@@ -0,0 +1,70 @@
+import threading
+
+
+def _field(obj, *names):
+    """ First non-null attribute (or dict key) of `obj` among `names`, else 0 """
+    for name in names:
+        value = obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+        if value is not None:
+            return value
+    return 0
+
+
+def openai_usage(usage):
+    """
+    (prompt_tokens, cached_tokens, completion_tokens, reasoning_tokens) of an OpenAI-compatible `usage` block.
+    Cached tokens are read from `prompt_tokens_details.cached_tokens` (OpenAI, Together, Gemini's
+    OpenAI endpoint) or `prompt_cache_hit_tokens` (DeepSeek).
+    """
+    if usage is None:
+        return 0, 0, 0, 0
+    details = _field(usage, "prompt_tokens_details") or {}
+    cached = _field(details, "cached_tokens") or _field(usage, "prompt_cache_hit_tokens", "cached_tokens")
+    reasoning = _field(_field(usage, "completion_tokens_details") or {}, "reasoning_tokens")
+    return _field(usage, "prompt_tokens"), cached, _field(usage, "completion_tokens"), reasoning
+
+
+def gemini_usage(usage_metadata):
+    """ (prompt_tokens, cached_tokens, completion_tokens, reasoning_tokens) of a google-genai `usage_metadata` block """
+    if usage_metadata is None:
+        return 0, 0, 0, 0
+    return (
+        _field(usage_metadata, "prompt_token_count"),
+        _field(usage_metadata, "cached_content_token_count"),
+        _field(usage_metadata, "candidates_token_count"),
+        _field(usage_metadata, "thoughts_token_count"),
+    )
+
+
+class TokenUsage:
+    """
+    Running totals of the token usage reported by the provider, in particular how many prompt
+    tokens were served from its prefix cache (see `llm.prompt_layout`).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.reasoning_tokens = 0
+
+    def add(self, prompt_tokens, cached_tokens, completion_tokens, reasoning_tokens=0):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+            self.completion_tokens += completion_tokens
+            self.reasoning_tokens += reasoning_tokens
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+                "completion_tokens": self.completion_tokens,
+                "reasoning_tokens": self.reasoning_tokens,
+            }
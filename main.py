@@ -1,43 +1,45 @@
-from openai import OpenAI
-from google import genai
+from llm.gateway import make_llm_client
 from scenarios.donor.runner import DonorGameRunner, DonorGameRunnerWithGreedyAgent
 from scenarios.pd.runner import PDRunner, PDRunnerrWithGreedyAgent
 from scenarios.trust.runner import TrustGameRunner
 from scenarios.market.runner import ProductChoiceMarketRunner
+from scenarios.common.wal import RoundLog
 import hydra
 from omegaconf import DictConfig, OmegaConf
 import os
+import sys
 from datetime import datetime
-from together import Together
 
+# Metrics go to the local run store by default (metrics.sink=sqlite); with metrics.sink=wandb:
 # os.environ["WANDB_MODE"] = "disabled" # Set to "disabled" if you don't want to log to wandb, "offline" for local logging
 # is_test = True  # Set True for testing
 is_test = False
 
-@hydra.main(version_base=None, config_path="conf", config_name="config")
-def main(cfg: DictConfig):
+def run_experiment(cfg: DictConfig, timestamp=None):
+    """
+    Run the simulation configured by `cfg` and return the path of its JSON log.
+    `timestamp` names the log (default: the current time); `sweep.py` passes a unique one per job.
+    """
+    resume = cfg.runtime.get("resume", None)
+    if resume:
+        # continue a crashed run with its recorded config; the runner restores the logged rounds
+        header = RoundLog.read_header(resume)
+        cfg = OmegaConf.create(header["config"])
+        cfg.runtime.resume = resume
+        log_path = header["log_path"]
+        print(f"Resuming {log_path} from round log {resume}")
     print(OmegaConf.to_yaml(cfg))
-    root_dir = cfg.metadata.save_dir
-    if is_test:
-        root_dir = f"{root_dir}TEST/"
-    directory = f"{root_dir}logs/{cfg.experiment.env.game_name}_horizon_{cfg.experiment.env.horizon}_gossip_{cfg.experiment.agents.is_gossip}_greedy_{cfg.experiment.agents.insert_greedy_agent}/"
-    os.makedirs(directory, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    cfg.metadata.trial_timestamp = timestamp
-    log_path = f"{directory}/{timestamp}.json"
+    if not resume:
+        root_dir = cfg.metadata.save_dir
+        if is_test:
+            root_dir = f"{root_dir}TEST/"
+        directory = f"{root_dir}logs/{cfg.experiment.env.game_name}_horizon_{cfg.experiment.env.horizon}_gossip_{cfg.experiment.agents.is_gossip}_greedy_{cfg.experiment.agents.insert_greedy_agent}/"
+        os.makedirs(directory, exist_ok=True)
+        timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+        cfg.metadata.trial_timestamp = timestamp
+        log_path = f"{directory}/{timestamp}.json"
 
-    if cfg.llm.api == 'openai':
-        client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
-    elif cfg.llm.api == 'gemini':
-        client = genai.Client(api_key=os.environ["GEMINI_API_KEY"])
-    elif cfg.llm.api == 'gemini-v2':
-        client = OpenAI(api_key=os.environ["GEMINI_API_KEY"], base_url="https://generativelanguage.googleapis.com/v1beta")
-    elif cfg.llm.api == 'deepseek':
-        client = OpenAI(api_key=os.environ["DEEPSEEK_API_KEY"], base_url="https://api.deepseek.com")
-    elif cfg.llm.api == 'together':
-        client = Together(api_key=os.environ["TOGETHER_API_KEY"])
-    else:
-        raise ValueError("Invalid API. Choose 'openai' or 'deepseek'.")
+    client = make_llm_client(cfg, log_path)
 
     if cfg.experiment.env.game_name == 'donor':
         if cfg.experiment.agents.insert_greedy_agent:
@@ -59,6 +61,17 @@ def main(cfg: DictConfig):
         runner.run_simulation(is_test)
     else:
         raise ValueError(f"Invalid game. Choose 'donor', 'pd', or 'trust'.")
+    client.close()
+    return log_path
+
+
+@hydra.main(version_base=None, config_path="conf", config_name="config")
+def main(cfg: DictConfig):
+    run_experiment(cfg)
 
 if __name__ == "__main__":
+    # `python main.py --resume <log>.rounds.jsonl` is shorthand for the runtime.resume override
+    if "--resume" in sys.argv:
+        i = sys.argv.index("--resume")
+        sys.argv[i:i + 2] = [f"runtime.resume={sys.argv[i + 1]}"]
     main()
\ No newline at end of file
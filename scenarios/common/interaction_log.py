@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+
+from omegaconf import OmegaConf
+
+LOG_FORMATS = ("jsonl", "json")
+PARQUET_CHUNK_ROWS = 10000
+
+
+def flatten(record, prefix=""):
+    """ Flatten nested dicts into one level of dotted keys, e.g. {"resources_before_donation.donor": 10} """
+    flat = {}
+    for key, value in record.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def _round_records(path):
+    """ The round records of a JSONL interaction log, flattened """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get("type") != "config":
+                yield flatten(record)
+
+
+def _column_type(pa, types):
+    """ Arrow type of a column from the Python types of its values (ints mixed with floats are floats) """
+    types = types - {type(None)}
+    if not types:
+        return pa.null()
+    if types == {bool}:
+        return pa.bool_()
+    if types == {int}:
+        return pa.int64()
+    if types <= {int, float}:
+        return pa.float64()
+    if types == {str}:
+        return pa.string()
+    return None # anything else (lists, mixed types) is stored as JSON text
+
+
+def export_parquet(jsonl_path, parquet_path):
+    """
+    Convert a JSONL interaction log to Parquet, one row per round and one column per (flattened) field,
+    in chunks of `PARQUET_CHUNK_ROWS` rows. Returns False (and prints why) if pyarrow is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("Parquet export skipped: pyarrow is not installed (pip install pyarrow)")
+        return False
+    # first pass: the columns and their types, so that every chunk has the same schema
+    values = {}
+    for record in _round_records(jsonl_path):
+        for key, value in record.items():
+            values.setdefault(key, set()).add(type(value))
+    columns = list(values)
+    types = {column: _column_type(pa, values[column]) for column in columns}
+    schema = pa.schema([(column, types[column] or pa.string()) for column in columns])
+
+    def chunk_table(rows):
+        data = {}
+        for column in columns:
+            column_values = [row.get(column) for row in rows]
+            if types[column] is None:
+                column_values = [None if value is None else json.dumps(value, ensure_ascii=False) for value in column_values]
+            elif types[column] == pa.float64():
+                column_values = [None if value is None else float(value) for value in column_values]
+            data[column] = column_values
+        return pa.table(data, schema=schema)
+
+    with pq.ParquetWriter(parquet_path, schema) as writer:
+        rows = []
+        for record in _round_records(jsonl_path):
+            rows.append(record)
+            if len(rows) == PARQUET_CHUNK_ROWS:
+                writer.write_table(chunk_table(rows))
+                rows = []
+        if rows or not columns:
+            writer.write_table(chunk_table(rows))
+    return True
+
+
+def read_interactions(path, columns=None):
+    """
+    Load the rounds of an interaction log as {column: [values]}, one entry per round, with `episode`
+    and `round` columns. `path` is the `.parquet` or `.jsonl` file, or the run's `.json` log path (its
+    Parquet export is used when present). With `columns` (e.g. ["episode", "round", "action_1",
+    "reward_1"]) only those are kept; from Parquet only those are read at all, so the justifications
+    are never loaded.
+    """
+    base, extension = os.path.splitext(path)
+    if extension == ".json":
+        path = f"{base}.parquet" if os.path.exists(f"{base}.parquet") else f"{base}.jsonl"
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.read_table(path, columns=columns).to_pydict()
+    data = {} if columns is None else {column: [] for column in columns}
+    num_rows = 0
+    for record in _round_records(path):
+        if columns is None:
+            for key in record.keys() - data.keys():
+                data[key] = [None] * num_rows
+            for key, column_values in data.items():
+                column_values.append(record.get(key))
+        else:
+            for column in columns:
+                data[column].append(record.get(column))
+        num_rows += 1
+    return data
+
+
+class InteractionLog:
+    """
+    Log of the played rounds of a run, configured by `log`:
+    - `format: jsonl` (default): `<log>.jsonl` starts with a {"type": "config"} line, followed by one
+      compact line {"episode": e, "round": r, **round_info} per round, in episode and round order, so the
+      file is the same whether rounds and episodes are played sequentially or in parallel. A round is
+      written as soon as it and all earlier rounds have been played; only rounds that finish ahead of
+      an earlier one are held back. Runners declare the rounds of every episode with `expect_rounds`;
+      the rounds of undeclared episodes are written as they come. With `parquet: true` the rounds are
+      also exported to a columnar `<log>.parquet` on `close` (see `read_interactions`).
+    - `format: json`: the whole run as one indented JSON at `log_path`, written on `close`:
+      {"config": ..., "episode_e": {"interaction": {"round_r": round_info}}}, or, with `episodes=False`
+      (trust), {"config": ..., "round_r": round_info}.
+    Restored rounds of a resumed run are written again, so the log is always complete.
+    """
+
+    def __init__(self, log_path, cfg, episodes=True):
+        log_cfg = cfg.get("log", None) or {}
+        self.format = log_cfg.get("format", "jsonl")
+        if self.format not in LOG_FORMATS:
+            raise ValueError(f"Invalid log format '{self.format}'. Choose one of {LOG_FORMATS}.")
+        self.parquet = log_cfg.get("parquet", False)
+        self.episodes = episodes
+        self.config = OmegaConf.to_container(cfg, resolve=True)
+        self._lock = threading.Lock()
+        if self.format == "jsonl":
+            self.path = f"{os.path.splitext(log_path)[0]}.jsonl"
+            self._file = open(self.path, "w", encoding="utf-8")
+            self._file.write(json.dumps({"type": "config", "config": self.config}, ensure_ascii=False) + "\n")
+            self._num_rounds = {} # episode -> number of rounds, from `expect_rounds`
+            self._held = {} # (episode, round) -> line of a round that finished ahead of an earlier one
+            self._next = (1, 1) # next (episode, round) to write; episodes and rounds are numbered from 1
+        else:
+            self.path = log_path
+            self.rounds = {}
+
+    def expect_rounds(self, episode, num_rounds):
+        """ Declare that `episode` has rounds 1..num_rounds, to be written in that order """
+        if self.format == "jsonl":
+            with self._lock:
+                self._num_rounds[episode] = num_rounds
+                self._write_ready()
+
+    def write(self, episode, round_num, round_info):
+        if self.format == "json":
+            with self._lock:
+                self.rounds[(episode, round_num)] = round_info
+            return
+        line = json.dumps({"episode": episode, "round": round_num, **round_info}, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if episode not in self._num_rounds:
+                self._file.write(line + "\n")
+            else:
+                self._held[(episode, round_num)] = line
+                self._write_ready()
+            self._file.flush()
+
+    def _write_ready(self):
+        """ Write the held rounds that are next in order, moving on to the next episode at the end of one """
+        while True:
+            episode, round_num = self._next
+            if round_num > self._num_rounds.get(episode, round_num):
+                self._next = (episode + 1, 1)
+            elif self._next in self._held:
+                self._file.write(self._held.pop(self._next) + "\n")
+                self._next = (episode, round_num + 1)
+            else:
+                return
+
+    def close(self):
+        if self.format == "jsonl":
+            with self._lock:
+                # rounds still held back (e.g. an episode that was not played to the end)
+                for key in sorted(self._held):
+                    self._file.write(self._held[key] + "\n")
+                self._held.clear()
+                self._file.close()
+            if self.parquet:
+                parquet_path = f"{os.path.splitext(self.path)[0]}.parquet"
+                if export_parquet(self.path, parquet_path):
+                    print(f"Interaction log exported to {parquet_path}")
+            return
+        data = {"config": self.config}
+        for (episode, round_num), round_info in sorted(self.rounds.items()):
+            if self.episodes:
+                data.setdefault(f"episode_{episode}", {"interaction": {}})["interaction"][f"round_{round_num}"] = round_info
+            else:
+                data[f"round_{round_num}"] = round_info
+        with open(self.path, "w") as f:
+            json.dump(data, f, indent=4)
@@ -0,0 +1,95 @@
+OMITTED = "({} earlier rounds omitted)"
+
+
+class ShortTermMemory:
+    """
+    An agent's interaction log for the current episode, substituted into the `$stm` prompt slot.
+
+    Each entry is the verbatim round context written by `update_stm`, optionally with a one-line
+    summary of the round. With the default config (no window, no budget) the memory renders exactly
+    like the plain list it replaces. Otherwise:
+    - `window`: only the last `window` rounds are rendered verbatim, older rounds by their summary;
+    - `max_tokens`: budget of the rendered section (~4 characters per token). When it is exceeded,
+      the oldest verbatim rounds are summarised first (keeping at least the latest one), then the
+      oldest summaries are dropped and replaced by a count of omitted rounds.
+
+    Every entry and summary is formatted once, on `append`; rendering only joins the cached pieces,
+    and the full unwindowed rendering is an append-only buffer.
+    """
+
+    def __init__(self, window=None, max_tokens=None):
+        self.window = window
+        self.max_tokens = max_tokens
+        self.entries = []
+        self.summaries = []
+        # repr of every entry / summary, formatted once when the round is appended
+        self._entry_reprs = []
+        self._summary_reprs = []
+        # rendered size of every entry / summary inside the list repr, for the budget arithmetic
+        self._entry_sizes = []
+        self._summary_sizes = []
+        self._buffer = "" # ", ".join(self._entry_reprs), extended on append
+        self._rendered = None # last render(), until the next append
+
+    @classmethod
+    def from_config(cls, cfg):
+        memory_cfg = cfg.get("memory", None)
+        if memory_cfg is None:
+            return cls()
+        return cls(window=memory_cfg.get("window", None), max_tokens=memory_cfg.get("max_tokens", None))
+
+    def append(self, round_context, summary=None):
+        # without a summary the round can only be shown verbatim
+        summary = summary if summary is not None else round_context
+        self.entries.append(round_context)
+        self.summaries.append(summary)
+        entry_repr, summary_repr = repr(round_context), repr(summary)
+        self._entry_reprs.append(entry_repr)
+        self._summary_reprs.append(summary_repr)
+        self._entry_sizes.append(len(entry_repr) + 2)
+        self._summary_sizes.append(len(summary_repr) + 2)
+        self._buffer = f"{self._buffer}, {entry_repr}" if self._buffer else entry_repr
+        self._rendered = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __getitem__(self, index):
+        return self.entries[index]
+
+    def _layout(self):
+        """ Return (first_kept, split): summaries[first_kept:split] and entries[split:] are rendered """
+        n = len(self.entries)
+        split = 0 if self.window is None else n - min(self.window, n)
+        first_kept = 0
+        if self.max_tokens is None:
+            return first_kept, split
+        budget = self.max_tokens * 4
+        size = sum(self._summary_sizes[:split]) + sum(self._entry_sizes[split:])
+        while size > budget and split < n - 1:
+            size += self._summary_sizes[split] - self._entry_sizes[split]
+            split += 1
+        if size > budget:
+            budget -= len(OMITTED.format(split)) + 2
+        while size > budget and first_kept < split:
+            size -= self._summary_sizes[first_kept]
+            first_kept += 1
+        return first_kept, split
+
+    def render(self):
+        if self._rendered is None:
+            first_kept, split = self._layout()
+            if first_kept == 0 and split == 0:
+                self._rendered = f"[{self._buffer}]"
+            else:
+                parts = [repr(OMITTED.format(first_kept))] if first_kept else []
+                self._rendered = "[" + ", ".join(parts + self._summary_reprs[first_kept:split] + self._entry_reprs[split:]) + "]"
+        return self._rendered
+
+    def __str__(self):
+        return self.render()
+
+    __repr__ = __str__
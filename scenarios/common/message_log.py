@@ -0,0 +1,117 @@
+from collections import defaultdict
+
+OMITTED = "({} older messages omitted)"
+
+
+class MessageLog:
+    """
+    The public gossip log of an episode (`historical_messages`), indexed incrementally by subject:
+    `subjects(message)` returns the names of the agents a message is about.
+
+    It behaves like the list it replaces (append/extend/len/iteration, and renders identically
+    in a prompt). `view(subject)` is what a decision about `subject` gets to read: the whole log
+    with `memory.messages_scope: all`, or with `counterpart` only the messages about `subject`
+    plus the `memory.messages_tail` most recent messages, in chronological order. With a
+    `memory.messages_max_tokens` budget (~4 characters per token) a view that does not fit drops
+    the oldest messages that are not about `subject` first, then the oldest ones about it, and
+    says how many were left out.
+
+    Messages are formatted once, on `append`: the full log is rendered from an append-only buffer
+    and a counterpart view only joins the cached pieces.
+    """
+
+    def __init__(self, subjects, scope="all", tail=0, max_tokens=None):
+        if scope not in ("all", "counterpart"):
+            raise ValueError(f"Invalid messages_scope '{scope}'. Choose 'all' or 'counterpart'.")
+        self.subjects = subjects
+        self.scope = scope
+        self.tail = tail or 0
+        self.max_tokens = max_tokens
+        self.messages = []
+        self.by_subject = defaultdict(list) # subject name -> indices into messages, ascending
+        self._reprs = [] # repr of every message, formatted once on append
+        self._sizes = [] # rendered size of every message inside the list repr, for the budget
+        self._buffer = "" # ", ".join(self._reprs), extended on append
+        self._rendered = None # str(self), until the next append
+
+    @classmethod
+    def from_config(cls, cfg, subjects):
+        memory_cfg = cfg.get("memory", None)
+        if memory_cfg is None:
+            return cls(subjects)
+        return cls(
+            subjects,
+            scope=memory_cfg.get("messages_scope", "all"),
+            tail=memory_cfg.get("messages_tail", 0),
+            max_tokens=memory_cfg.get("messages_max_tokens", None),
+        )
+
+    def append(self, message):
+        index = len(self.messages)
+        self.messages.append(message)
+        message_repr = repr(message)
+        self._reprs.append(message_repr)
+        self._sizes.append(len(message_repr) + 2)
+        self._buffer = f"{self._buffer}, {message_repr}" if self._buffer else message_repr
+        self._rendered = None
+        for subject in self.subjects(message):
+            self.by_subject[subject].append(index)
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
+
+    def about(self, subject):
+        return [self.messages[i] for i in self.by_subject.get(subject, [])]
+
+    def view(self, subject):
+        """ The messages shown to an agent deciding about (or facing) `subject`, ready for the prompt """
+        if self.scope == "all" and self.max_tokens is None:
+            return self
+        about = self.by_subject.get(subject, [])
+        if self.scope == "all":
+            shown = range(len(self.messages))
+        else:
+            first_tail = max(len(self.messages) - self.tail, 0)
+            shown = [i for i in about if i < first_tail] + list(range(first_tail, len(self.messages)))
+        omitted = 0
+        if self.max_tokens is not None:
+            shown, omitted = self._fit(shown, set(about))
+            if self.scope == "all" and not omitted:
+                return self
+        parts = [repr(OMITTED.format(omitted))] if omitted else []
+        return "[" + ", ".join(parts + [self._reprs[i] for i in shown]) + "]"
+
+    def _fit(self, shown, about):
+        """ (kept indices, number dropped) of `shown` within the budget, dropping messages not in `about` first """
+        budget = self.max_tokens * 4
+        size = sum(self._sizes[i] for i in shown)
+        if size <= budget:
+            return shown, 0
+        budget -= len(repr(OMITTED.format(len(shown)))) + 2
+        dropped = set()
+        for keep_about in (True, False):
+            for i in shown:
+                if size <= budget:
+                    break
+                if i not in dropped and not (keep_about and i in about):
+                    dropped.add(i)
+                    size -= self._sizes[i]
+        return [i for i in shown if i not in dropped], len(dropped)
+
+    def __str__(self):
+        if self._rendered is None:
+            self._rendered = f"[{self._buffer}]"
+        return self._rendered
+
+    __repr__ = __str__
+
@@ -0,0 +1,103 @@
+"""
+Vectorized episode metrics. The per-step series of all agents (rewards, donations, actions, ...) are
+stacked into one (agents x steps) matrix, zero-padded to the longest series, and every per-agent
+metric is one array operation over it; population metrics are reductions over the agent axis. The
+functions also accept more leading axes, e.g. (episodes x agents x steps) for post-processing.
+"""
+import threading
+
+import numpy as np
+
+_discount_vectors = {}
+_discount_lock = threading.Lock()
+
+
+def discount_vector(discount_factor, num_steps):
+    """ [1, g, g^2, ..., g^(num_steps-1)] for g = `discount_factor`, computed once per factor and extended as needed """
+    with _discount_lock:
+        vector = _discount_vectors.get(discount_factor)
+        if vector is None or len(vector) < num_steps:
+            vector = np.power(float(discount_factor), np.arange(max(num_steps, 2 * len(vector) if vector is not None else 64), dtype=float))
+            vector.flags.writeable = False
+            _discount_vectors[discount_factor] = vector
+    return vector[:num_steps]
+
+
+def stack(series, dtype=float):
+    """ (matrix, lengths) of a list of per-agent series: row i holds series[i] followed by zeros """
+    lengths = np.fromiter((len(values) for values in series), dtype=np.int64, count=len(series))
+    matrix = np.zeros((len(series), int(lengths.max(initial=0))), dtype=dtype)
+    if matrix.size:
+        matrix[np.arange(matrix.shape[1]) < lengths[:, None]] = np.concatenate([np.asarray(values, dtype=dtype) for values in series])
+    return matrix, lengths
+
+
+def stack_attribute(agents, name, dtype=float):
+    """ `stack` of the series `agent.<name>` of every agent """
+    return stack([getattr(agent, name) for agent in agents], dtype)
+
+
+def discounted_returns(matrix, discount_factor):
+    """ Discounted cumulative sum of every row (the last axis), with the first step undiscounted """
+    return matrix @ discount_vector(discount_factor, matrix.shape[-1])
+
+
+def row_means(matrix, lengths):
+    """ Mean of the first `lengths` entries of every row, 0 for empty rows """
+    sums = matrix.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(lengths > 0, sums / np.maximum(lengths, 1), 0.0)
+
+
+def signed_counts(flags, lengths):
+    """ Per row: the number of True minus the number of False among the first `lengths` entries (the image score) """
+    return 2 * flags.sum(axis=-1) - lengths
+
+
+def std_err(values, axis=-1):
+    """ Standard error of the mean (ddof=0) along `axis`, 0 for no values """
+    values = np.asarray(values, dtype=float)
+    n = values.shape[axis]
+    if n == 0:
+        return values.sum(axis=axis)
+    return np.std(values, axis=axis) / np.sqrt(n)
+
+
+TOP_FRACTION = 0.1
+
+
+def inequality(values, top_fraction=TOP_FRACTION):
+    """
+    Gini coefficient, min-shifted Theil index and top share (the share of the total held by the top
+    `top_fraction` of the agents, at least one) of `values` along the last axis, all from one sort:
+    O(n log n) time and O(n) memory. The Gini coefficient is half the relative mean absolute difference
+    over all n^2 pairs; it and the top share are NaN for a zero total. The Theil index is always that of
+    `values - min(values)`, so it is defined for series that can be negative (e.g. discounted returns)
+    and comparable across runs (0 when all values are equal). All are NaN for no values.
+    """
+    x = np.sort(np.asarray(values, dtype=float), axis=-1)
+    n = x.shape[-1]
+    if n == 0:
+        nan = np.full(x.shape[:-1], np.nan)[()]
+        return {"gini": nan, "shifted_theil": nan, "top_share": nan}
+    total = x.sum(axis=-1)
+    k = max(1, int(np.ceil(top_fraction * n)))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # sum_ij |x_i - x_j| = 2 * sum_i (2i - n - 1) x_(i) for ascending x and 1-based i
+        gini = (x @ (2 * np.arange(1, n + 1) - n - 1)) / (n * total)
+        top_share = x[..., n - k:].sum(axis=-1) / total
+        shifted = x - x[..., :1]
+        mean = shifted.mean(axis=-1, keepdims=True)
+        ratio = np.divide(shifted, mean, out=np.ones_like(shifted), where=mean > 0) # all equal: ratio 1, Theil 0
+        theil = np.sum(ratio * np.log(np.where(ratio > 0, ratio, 1.0)), axis=-1) / n
+    return {"gini": gini, "shifted_theil": theil, "top_share": top_share}
+
+
+def inequality_metrics(values, name, top_fraction=TOP_FRACTION):
+    """ `inequality` of `values` as logged metrics, e.g. {"Gini Coefficient of <name>": ...} """
+    result = inequality(values, top_fraction)
+    return {
+        f"Gini Coefficient of {name}": result["gini"],
+        f"Min-Shifted Theil Index of {name}": result["shifted_theil"],
+        f"Top {top_fraction:.0%} Share of {name}": result["top_share"],
+    }
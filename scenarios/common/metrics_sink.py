@@ -0,0 +1,187 @@
+import csv
+import os
+import threading
+from abc import ABC, abstractmethod
+
+import numpy as np
+from omegaconf import OmegaConf
+
+from scenarios.common.tracking import WANDB_ENTITY, RunStore
+
+METRICS_SINKS = ("sqlite", "wandb", "csv", "none")
+
+
+class MetricsSink(ABC):
+    """
+    Buffered replacement for `wandb.log`. `log(metrics)` records one step and `log_series(series)` a whole
+    per-step series at once; neither writes anything. A background thread hands the buffered steps to the
+    backend in one batch every `flush_interval` seconds (or as soon as `batch_size` steps are waiting), so
+    the simulation never waits on it. `finish` writes what is left and closes the backend.
+
+    Backends implement `_write(rows)` with rows as (step, {key: value}), in step order, and `_close()`.
+    """
+
+    def __init__(self, flush_interval=5.0, batch_size=10000):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.step = 0
+        self._pending = [] # (first step, {key: array}) in step order
+        self._num_pending = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="metrics-sink", daemon=True)
+        self._thread.start()
+
+    def log(self, metrics):
+        self._append({key: [value] for key, value in metrics.items()}, 1)
+
+    def log_series(self, series):
+        """ Log per-step series {key: values}: step t holds values[t] of every series longer than t """
+        series = {key: np.asarray(values) for key, values in series.items()}
+        self._append(series, max((len(values) for values in series.values()), default=0))
+
+    def _append(self, series, num_steps):
+        if not num_steps:
+            return
+        with self._lock:
+            self._pending.append((self.step, series))
+            self.step += num_steps
+            self._num_pending += num_steps
+            if self._num_pending >= self.batch_size:
+                self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e: # reported by `finish`, the simulation goes on
+                self._error = e
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending, self._num_pending = self._pending, [], 0
+            if pending:
+                self._write(rows(pending))
+
+    def finish(self):
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        self._close()
+        if self._error is not None:
+            raise RuntimeError(f"Writing metrics failed: {self._error}") from self._error
+
+    @abstractmethod
+    def _write(self, rows):
+        """ Write (step, {key: value}) rows, in step order, to the backend """
+
+    def _close(self):
+        pass
+
+
+def rows(pending):
+    """ Expand buffered (first step, {key: array}) series into (step, {key: value}) rows """
+    for first_step, series in pending:
+        series = {key: values.tolist() if isinstance(values, np.ndarray) else values for key, values in series.items()}
+        num_steps = max(len(values) for values in series.values())
+        for t in range(num_steps):
+            yield first_step + t, {key: values[t] for key, values in series.items() if t < len(values)}
+
+
+class WandbSink(MetricsSink):
+    """ Logs to a wandb run, one `run.log` per step instead of one per agent and step """
+
+    def __init__(self, run, **kwargs):
+        self.run = run
+        super().__init__(**kwargs)
+
+    def _write(self, rows):
+        for step, row in rows:
+            self.run.log(row, step=step)
+
+    def _close(self):
+        self.run.finish()
+
+
+class SQLiteSink(MetricsSink):
+    """ Stores the run and its metrics in the local run store (see `scenarios/common/tracking.py`) """
+
+    def __init__(self, store, run_id, **kwargs):
+        self.store = store
+        self.run_id = run_id
+        super().__init__(**kwargs)
+
+    def _write(self, rows):
+        self.store.add_metrics(self.run_id, ((step, {key: value.item() if isinstance(value, np.generic) else value for key, value in row.items()}) for step, row in rows))
+
+    def _close(self):
+        self.store.finish_run(self.run_id)
+        self.store.close()
+
+
+class CSVSink(MetricsSink):
+    """ Appends (step, key, value) lines to a local CSV file, e.g. `<log>.metrics.csv` """
+
+    def __init__(self, path, **kwargs):
+        self.path = path
+        self._file = open(path, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(["step", "key", "value"])
+        super().__init__(**kwargs)
+
+    def _write(self, rows):
+        self._writer.writerows((step, key, value) for step, row in rows for key, value in row.items())
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+
+class NullSink:
+    """ Drops every metric, e.g. for benchmarks of the orchestration """
+
+    step = 0
+
+    def log(self, metrics):
+        pass
+
+    def log_series(self, series):
+        pass
+
+    def flush(self):
+        pass
+
+    def finish(self):
+        pass
+
+
+def make_metrics_sink(cfg, log_path, project, group, name):
+    """
+    Metrics sink configured by `metrics.sink`: sqlite (the local run store `metrics.store`), wandb (a
+    run named `name` in `project`/`group`), csv (`metrics.path`, by default `<log>.metrics.csv`) or none.
+    """
+    metrics_cfg = cfg.get("metrics", None) or {}
+    sink = metrics_cfg.get("sink", "sqlite")
+    options = {"flush_interval": metrics_cfg.get("flush_interval", 5.0), "batch_size": metrics_cfg.get("batch_size", 10000)}
+    config = OmegaConf.to_container(cfg, resolve=True)
+    if sink == "sqlite":
+        store = RunStore(metrics_cfg.get("store", None) or "./tracking/runs.sqlite")
+        run_id = store.start_run(os.path.abspath(log_path), config, project=project, group=group, name=name)
+        return SQLiteSink(store, run_id, **options)
+    if sink == "wandb":
+        import wandb
+        run = wandb.init(entity=WANDB_ENTITY, project=project, group=group, name=name, dir=cfg.metadata.save_dir, config=config)
+        return WandbSink(run, **options)
+    if sink == "csv":
+        path = metrics_cfg.get("path", None) or f"{os.path.splitext(log_path)[0]}.metrics.csv"
+        return CSVSink(path, **options)
+    if sink == "none":
+        return NullSink()
+    raise ValueError(f"Invalid metrics sink '{sink}'. Choose one of {METRICS_SINKS}.")
@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+def round_dependencies(schedule):
+    """
+    For every round of `schedule` (a list of agent tuples), return the set of earlier rounds it depends on:
+    the most recent previous round of each agent that takes part in it.
+    """
+    deps = []
+    last_round = {}
+    for round_index, agents in enumerate(schedule):
+        deps.append({last_round[agent] for agent in agents if agent in last_round})
+        for agent in agents:
+            last_round[agent] = round_index
+    return deps
+
+
+def play_schedule(schedule, play_round, max_workers=None):
+    """
+    Call `play_round(round_index, agents)` for every round of `schedule` and return the results in schedule order.
+
+    With `max_workers` > 1 the rounds are executed on a thread pool following the dependency DAG built by
+    `round_dependencies`: a round starts as soon as the previous rounds of all its agents have finished, so
+    rounds between disjoint agents overlap. This is only valid when a round reads and writes nothing but the
+    state of its own agents (i.e. no shared public message log), in which case the outcome is identical to
+    the sequential run.
+    """
+    if not max_workers or max_workers <= 1:
+        return [play_round(round_index, agents) for round_index, agents in enumerate(schedule)]
+
+    deps = round_dependencies(schedule)
+    children = [[] for _ in schedule]
+    for round_index, parents in enumerate(deps):
+        for parent in parents:
+            children[parent].append(round_index)
+    num_waiting = [len(parents) for parents in deps]
+
+    results = [None] * len(schedule)
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="round")
+    try:
+        pending = {pool.submit(play_round, i, schedule[i]): i for i, n in enumerate(num_waiting) if n == 0}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                round_index = pending.pop(future)
+                results[round_index] = future.result()
+                for child in children[round_index]:
+                    num_waiting[child] -= 1
+                    if num_waiting[child] == 0:
+                        pending[pool.submit(play_round, child, schedule[child])] = child
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    return results
+
+
+def play_batch(rounds, play_round, max_workers):
+    """
+    Call `play_round(i, agents)` for every entry of `rounds` at the same time and return the results in order.
+    The rounds of a batch must involve disjoint agents.
+    """
+    if len(rounds) <= 1 or not max_workers or max_workers <= 1:
+        return [play_round(i, agents) for i, agents in enumerate(rounds)]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(rounds)), thread_name_prefix="round") as pool:
+        futures = [pool.submit(play_round, i, agents) for i, agents in enumerate(rounds)]
+        return [future.result() for future in futures]
+
+
+def play_episodes(num_episodes, play_episode, max_workers=None):
+    """
+    Yield `play_episode(episode)` for episodes 1..num_episodes, in episode order.
+
+    With `max_workers` > 1 the episodes run concurrently on a thread pool; each must then play with its own
+    agents and env state. Results are still yielded in episode order, each as soon as it and all earlier
+    episodes have finished, so the caller logs them exactly as in the sequential run.
+    """
+    episodes = range(1, num_episodes + 1)
+    if num_episodes <= 1 or not max_workers or max_workers <= 1:
+        yield from map(play_episode, episodes)
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, num_episodes), thread_name_prefix="episode") as pool:
+        yield from pool.map(play_episode, episodes)
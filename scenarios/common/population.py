@@ -0,0 +1,263 @@
+"""
+LLM-free population simulator: the payoff rules of the four games played by scripted strategies on
+NumPy arrays, for baselines and reputation-dynamics ground truth at population sizes far beyond what
+LLM agents can afford.
+
+Every round the population is randomly matched into disjoint pairs (sellers with buyers in the market)
+that all play at once. The first agent of a pair is the donor / investor / seller / player 1, the second
+the recipient / responder / buyer / player 2. Each agent decides whether to cooperate (donate, play C,
+invest its resources, return a share, sell high quality, buy customized) from the public reputation of
+its counterpart:
+- always_defect: never (the scripted `GreedyAgent`), always_cooperate: always, random: with probability 1/2;
+- tit_for_tat: if the counterpart's last move was cooperative (unknown agents get cooperation);
+- image_scoring: if the counterpart's image score (+1 per cooperative, -1 per uncooperative move, as in
+  `signed_counts` in `scenarios/common/metrics.py`) is at least `image_threshold`;
+- standing: if the counterpart is in good standing. An agent keeps good standing by cooperating, or by
+  defecting against a counterpart in bad standing; defecting against a good one makes it bad.
+Intended cooperation fails with probability `error_rate` (execution errors).
+
+Usage (from the repository root):
+    python -m scenarios.common.population --game donor --agents 100000 --rounds 200 \
+        --mix always_defect=0.2 tit_for_tat=0.3 image_scoring=0.25 standing=0.25
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+from omegaconf import OmegaConf
+
+from scenarios.common.metrics import inequality
+
+STRATEGIES = ("always_defect", "always_cooperate", "random", "tit_for_tat", "image_scoring", "standing")
+ALWAYS_DEFECT, ALWAYS_COOPERATE, RANDOM, TIT_FOR_TAT, IMAGE_SCORING, STANDING = range(len(STRATEGIES))
+GAMES = ("donor", "pd", "trust", "market")
+
+# actions of (the first, the second agent of a pair), uncooperative first, then cooperative (then others)
+ACTIONS = {
+    "pd": (("D", "C"), ("D", "C")),
+    "market": (("L", "H"), ("none", "c", "s")),
+}
+
+
+def payoff_tables(env, game):
+    """
+    Reward tables (first agent, second agent) of a simultaneous-move game, indexed by the positions of the
+    two actions in `ACTIONS` (0 = defect, 1 = cooperate), read off `env.step`
+    """
+    first, second = ACTIONS[game]
+    tables = np.zeros((2, len(first), len(second)))
+    for i, a in enumerate(first):
+        for j, b in enumerate(second):
+            tables[:, i, j] = env.step((a, b)) if game == "pd" else env.step(a, b)
+    return tables[0], tables[1]
+
+
+class PopulationSimulator:
+    """
+    Scripted population playing the game of `cfg.experiment.env` (payoff parameters included) for
+    `run(num_rounds)`. `strategies` gives the strategy name of every agent; in the market the first half
+    of the agents are sellers and the second half buyers, like in `ProductChoiceMarketRunner`.
+
+    In the trust game a cooperative investor invests `invest_share` of the initial resources (at most its
+    current resources, so that the stakes do not compound over rounds) and a cooperative responder returns
+    `return_share` of the multiplied investment, like the fake LLM backend.
+    """
+
+    def __init__(self, cfg, strategies, seed=0, error_rate=0.0, image_threshold=0, invest_share=1.0, return_share=0.5):
+        self.cfg = cfg
+        self.game = cfg.experiment.env.game_name
+        if self.game not in GAMES:
+            raise ValueError(f"Invalid game '{self.game}'. Choose one of {GAMES}.")
+        unknown = set(strategies) - set(STRATEGIES)
+        if unknown:
+            raise ValueError(f"Invalid strategies {sorted(unknown)}. Choose from {STRATEGIES}.")
+        self.strategy = np.array([STRATEGIES.index(s) for s in strategies], dtype=np.int8)
+        self.num_agents = len(self.strategy)
+        self.rng = np.random.default_rng(seed)
+        self.error_rate = error_rate
+        self.image_threshold = image_threshold
+        self.invest_share = invest_share
+        self.return_share = return_share
+
+        env_cfg = cfg.experiment.env
+        if self.game == "pd":
+            from scenarios.pd.env import PDEnv
+            self.tables = payoff_tables(PDEnv(cfg), self.game)
+        elif self.game == "market":
+            from scenarios.market.env import ProductChoiceMarketEnv
+            self.tables = payoff_tables(ProductChoiceMarketEnv(cfg), self.game)
+        elif self.game == "donor":
+            self.cost, self.benefit = env_cfg.cost, env_cfg.benefit
+        else:
+            self.investment_multiplier = env_cfg.investment_multiplier
+        self.reset()
+
+    @classmethod
+    def from_mix(cls, cfg, num_agents, mix, **kwargs):
+        """ Population of `num_agents` whose strategy shares are given by `mix` ({strategy: weight}), in random order """
+        names = list(mix)
+        weights = np.array([mix[name] for name in names], dtype=float)
+        counts = np.floor(weights / weights.sum() * num_agents).astype(int)
+        counts[np.argmax(weights)] += num_agents - counts.sum()
+        rng = np.random.default_rng(kwargs.get("seed", 0))
+        strategies = rng.permutation(np.repeat(names, counts))
+        return cls(cfg, list(strategies), **kwargs)
+
+    def reset(self):
+        n = self.num_agents
+        self.last_move = np.ones(n, dtype=bool) # unknown agents count as cooperative
+        self.image = np.zeros(n, dtype=np.int64)
+        self.good = np.ones(n, dtype=bool)
+        self.payoff = np.zeros(n)
+        self.moves = np.zeros(n, dtype=np.int64)
+        self.cooperations = np.zeros(n, dtype=np.int64)
+        if self.game in ("donor", "trust"):
+            self.initial_resources = float(self.cfg.experiment.env.initial_resources)
+            self.resources = np.full(n, self.initial_resources)
+
+    def match(self):
+        """ Random disjoint pairs: (first agents, second agents) """
+        if self.game == "market":
+            half = self.num_agents // 2
+            return self.rng.permutation(half), half + self.rng.permutation(half)
+        order = self.rng.permutation(self.num_agents)
+        half = self.num_agents // 2
+        return order[:half], order[half:2 * half]
+
+    def decide(self, agents, counterparts):
+        """ Whether each of `agents` cooperates with its counterpart, by strategy and the counterpart's reputation """
+        strategy = self.strategy[agents]
+        cooperate = np.select(
+            [strategy == ALWAYS_COOPERATE, strategy == RANDOM, strategy == TIT_FOR_TAT, strategy == IMAGE_SCORING, strategy == STANDING],
+            [True, self.rng.random(len(agents)) < 0.5, self.last_move[counterparts], self.image[counterparts] >= self.image_threshold, self.good[counterparts]],
+            default=False,
+        )
+        if self.error_rate:
+            cooperate &= self.rng.random(len(agents)) >= self.error_rate
+        return cooperate
+
+    def observe(self, agents, counterparts, cooperate, counterpart_good):
+        """ Update the public reputation of `agents` after their moves against `counterparts` """
+        self.last_move[agents] = cooperate
+        self.image[agents] += np.where(cooperate, 1, -1)
+        self.good[agents] = cooperate | ~counterpart_good
+        self.moves[agents] += 1
+        self.cooperations[agents] += cooperate
+
+    def step(self):
+        """ Play one round; return the number of interactions and of cooperative moves """
+        first, second = self.match()
+        good_first, good_second = self.good[first], self.good[second]
+        if self.game == "donor":
+            # DonorGameEnv.step: the donor pays `cost` (if it can afford it), the recipient gets `benefit`
+            donate = self.decide(first, second) & (self.resources[first] >= self.cost)
+            donation = np.where(donate, self.cost, 0.0)
+            received = np.where(donate, self.benefit, 0.0)
+            self.resources[first] -= donation
+            self.resources[second] += received
+            self.payoff[first] -= donation
+            self.payoff[second] += received
+            self.observe(first, second, donate, good_second)
+            return len(first), int(donate.sum())
+        cooperate_first = self.decide(first, second)
+        cooperate_second = self.decide(second, first)
+        if self.game == "trust":
+            # TrustGameEnv.step: the investment is multiplied for the responder, who returns part of it
+            stake = np.minimum(self.invest_share * self.initial_resources, self.resources[first])
+            investment = np.where(cooperate_first, stake, 0.0)
+            benefit = investment * self.investment_multiplier
+            returned = np.where(cooperate_second, self.return_share * benefit, 0.0)
+            reward_first, reward_second = returned - investment, benefit - returned
+            self.resources[first] += reward_first
+            self.resources[second] += reward_second
+        else:
+            table_first, table_second = self.tables
+            reward_first = table_first[cooperate_first.view(np.int8), cooperate_second.view(np.int8)]
+            reward_second = table_second[cooperate_first.view(np.int8), cooperate_second.view(np.int8)]
+        self.payoff[first] += reward_first
+        self.payoff[second] += reward_second
+        self.observe(first, second, cooperate_first, good_second)
+        self.observe(second, first, cooperate_second, good_first)
+        return len(first), int(cooperate_first.sum() + cooperate_second.sum())
+
+    def by_strategy(self, values):
+        """ Mean of per-agent `values` for every strategy (NaN for absent strategies) """
+        counts = np.bincount(self.strategy, minlength=len(STRATEGIES))
+        sums = np.bincount(self.strategy, weights=values, minlength=len(STRATEGIES))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return sums / counts
+
+    def run(self, num_rounds):
+        """
+        Play `num_rounds` rounds and return the per-round reputation dynamics (cooperation rate, and per
+        strategy the mean cumulative payoff and the shares in good standing) with a final summary and
+        the inequality (Gini, min-shifted Theil, top 10% share) of the final wealth: the resources in the donor and
+        trust games, the cumulative payoffs otherwise
+        """
+        moves_per_round = 2 if self.game != "donor" else 1
+        cooperation = np.zeros(num_rounds)
+        payoff = np.zeros((num_rounds, len(STRATEGIES)))
+        good = np.zeros((num_rounds, len(STRATEGIES)))
+        interactions = 0
+        start = time.perf_counter()
+        for t in range(num_rounds):
+            num_pairs, num_cooperative = self.step()
+            interactions += num_pairs
+            cooperation[t] = num_cooperative / max(num_pairs * moves_per_round, 1)
+            payoff[t] = self.by_strategy(self.payoff)
+            good[t] = self.by_strategy(self.good)
+        seconds = time.perf_counter() - start
+        present = [k for k in range(len(STRATEGIES)) if np.any(self.strategy == k)]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cooperation_ratio = self.by_strategy(np.where(self.moves > 0, self.cooperations / self.moves, 0.0))
+        return {
+            "cooperation": cooperation,
+            "payoff_by_strategy": payoff,
+            "good_by_strategy": good,
+            "strategies": STRATEGIES,
+            "summary": {
+                STRATEGIES[k]: {
+                    "agents": int(np.sum(self.strategy == k)),
+                    "payoff": float(payoff[-1, k]) if num_rounds else 0.0,
+                    "cooperation_ratio": float(cooperation_ratio[k]),
+                    "image_score": float(self.by_strategy(self.image)[k]),
+                    "good_standing": float(good[-1, k]) if num_rounds else 1.0,
+                }
+                for k in present
+            },
+            "inequality": {name: float(value) for name, value in inequality(self.resources if self.game in ("donor", "trust") else self.payoff).items()},
+            "interactions": interactions,
+            "interactions_per_s": interactions / seconds if seconds else None,
+        }
+
+
+def experiment_config(game):
+    """ The game's `conf/experiment/<game>.yaml` under `experiment`, as in the composed hydra config """
+    conf_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "conf")
+    return OmegaConf.create({"experiment": OmegaConf.load(os.path.join(conf_dir, "experiment", f"{game}.yaml"))})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a population of scripted strategies with the payoff rules of a game.")
+    parser.add_argument("--game", choices=GAMES, default="donor")
+    parser.add_argument("--agents", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--mix", nargs="+", default=[f"{s}=1" for s in STRATEGIES], metavar="STRATEGY=WEIGHT")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--image-threshold", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mix = {name: float(weight) for name, weight in (item.split("=", 1) for item in args.mix)}
+    simulator = PopulationSimulator.from_mix(experiment_config(args.game), args.agents, mix, seed=args.seed, error_rate=args.error_rate, image_threshold=args.image_threshold)
+    result = simulator.run(args.rounds)
+    print(f"{args.game}: {args.agents} agents, {args.rounds} rounds, {result['interactions']} interactions "
+          f"({result['interactions_per_s']:,.0f}/s), final cooperation rate {result['cooperation'][-1]:.3f}")
+    for name, summary in result["summary"].items():
+        print(f"  {name:>16}: {summary}")
+    print(f"  wealth inequality: {result['inequality']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+from itertools import combinations
+
+
+def is_alternating_schedule(schedule, agents):
+    """
+    Check the constraints of the donor/trust round robin: every unordered pair plays exactly once,
+    each agent alternates between the first (D) and second (R) role, and plays each role at most
+    ⌈(n-1)/2⌉ times.
+    """
+    n = len(agents)
+    role_cap = n // 2
+    played = set()
+    last_role = {}
+    first_cnt, second_cnt = {a: 0 for a in agents}, {a: 0 for a in agents}
+    for first, second in schedule:
+        pair = frozenset((first, second))
+        if first is second or pair in played:
+            return False
+        if last_role.get(first) == 'D' or last_role.get(second) == 'R':
+            return False
+        played.add(pair)
+        last_role[first], last_role[second] = 'D', 'R'
+        first_cnt[first] += 1
+        second_cnt[second] += 1
+    return len(played) == n * (n - 1) // 2 and all(first_cnt[a] <= role_cap and second_cnt[a] <= role_cap for a in agents)
+
+
+def _odd_schedule(n):
+    """
+    Rotational round robin on the indices 0..n-1 (n odd): in block k agent k sits out and the pairs are
+    {k-i, k+i} (mod n). The j-th game of agent v is played in the first role iff j + v is even; in every
+    pair the two players get opposite roles, so each agent strictly alternates.
+    """
+    schedule = []
+    for k in range(n):
+        for i in range(1, (n - 1) // 2 + 1):
+            a, b = (k - i) % n, (k + i) % n
+            a_games_before = k - (k > a) # blocks k' < k that a has played in
+            schedule.append((a, b) if (a_games_before + a) % 2 == 0 else (b, a))
+    return schedule
+
+
+def _split_games(first_role_starters, second_role_starters):
+    """
+    Split the games of the extra agent z (even n) between the start and the end of the odd schedule.
+    Before an opponent's first game z takes the role that opponent starts with, after its last game the
+    other one; z's own roles must alternate across both parts. Returns (prefix, suffix) as lists of
+    (opponent, z_role) in play order, as balanced as possible.
+    """
+    def interleave(n_d, n_r, opponents_d, opponents_r):
+        """ All alternating orders of n_d games as D and n_r games as R (one, or two if n_d == n_r) """
+        if abs(n_d - n_r) > 1:
+            return []
+        starts = [start for start, count in (('D', n_d), ('R', n_r)) if count >= max(n_d, n_r)]
+        orders = []
+        for start in starts:
+            other = 'R' if start == 'D' else 'D'
+            pools = {'D': list(opponents_d), 'R': list(opponents_r)}
+            roles = [start if i % 2 == 0 else other for i in range(n_d + n_r)]
+            orders.append([(pools[role].pop(0), role) for role in roles])
+        return orders
+
+    num_a, num_b = len(first_role_starters), len(second_role_starters)
+    best = None
+    for prefix_a in range(num_a + 1):
+        for prefix_b in range(max(0, prefix_a - 1), min(num_b, prefix_a + 1) + 1):
+            # prefix: z is D against agents that start with D, R against those that start with R
+            prefixes = interleave(prefix_a, prefix_b, first_role_starters[:prefix_a], second_role_starters[:prefix_b])
+            # suffix: z takes the opposite roles
+            suffixes = interleave(num_b - prefix_b, num_a - prefix_a, second_role_starters[prefix_b:], first_role_starters[prefix_a:])
+            for prefix in prefixes:
+                for suffix in suffixes:
+                    if prefix and suffix and prefix[-1][1] == suffix[0][1]:
+                        continue
+                    imbalance = abs(len(prefix) - len(suffix))
+                    if best is None or imbalance < best[0]:
+                        best = (imbalance, prefix, suffix)
+    return best[1], best[2]
+
+
+def alternating_round_robin(agents):
+    """
+    Constructive O(n^2) version of the donor/trust round robin: an ordered list of (first, second) role
+    pairs in which every unordered pair plays once and every agent alternates roles (see
+    `is_alternating_schedule`). Odd n uses `_odd_schedule`; for even n the last agent's games are
+    added before and after the odd schedule of the others, where they cannot break alternation.
+    """
+    agents = list(agents)
+    n = len(agents)
+    if n < 2:
+        return []
+    if n % 2 == 1:
+        return [(agents[a], agents[b]) for a, b in _odd_schedule(n)]
+
+    schedule = _odd_schedule(n - 1)
+    # in the odd schedule agent v plays its first game in the first role iff v is even
+    first_role_starters = [v for v in range(n - 1) if v % 2 == 0]
+    second_role_starters = [v for v in range(n - 1) if v % 2 == 1]
+    prefix, suffix = _split_games(first_role_starters, second_role_starters)
+    z = n - 1
+    def oriented(games):
+        return [(z, v) if z_role == 'D' else (v, z) for v, z_role in games]
+    schedule = oriented(prefix) + schedule + oriented(suffix)
+    return [(agents[a], agents[b]) for a, b in schedule]
+
+
+def backtracking_round_robin(agents):
+    """
+    Exhaustive depth-first search for the same schedule (exponential; only used as a fallback).
+    Raises RuntimeError if no schedule exists.
+    """
+    n = len(agents)
+    plays_per_agent  = n - 1
+    donor_low, donor_high = plays_per_agent // 2, (plays_per_agent + 1) // 2
+
+    # --- all unordered pairs produced in one line with *combinations* ---
+    remaining_pairs = list(combinations(agents, 2))
+
+    # bookkeeping
+    donor_cnt, recip_cnt = {a: 0 for a in agents}, {a: 0 for a in agents}
+    last_role           = {a: None for a in agents}
+    used_pairs, schedule = set(), []
+
+    # depth-first search with back-tracking — minimalist but guaranteed
+    def dfs():
+        if len(schedule) == len(remaining_pairs):
+            return True
+
+        for a, b in remaining_pairs:
+            if (a, b) in used_pairs:
+                continue
+
+            for donor, recip in ((a, b), (b, a)):      # orient the pair
+                # quotas
+                if donor_cnt[donor]   >= donor_high or recip_cnt[recip] >= donor_high:
+                    continue
+                # role alternation
+                if last_role[donor] == 'D' or last_role[recip] == 'R':
+                    continue
+
+                # commit
+                used_pairs.add((a, b))
+                schedule.append((donor, recip))
+                donor_cnt[donor]   += 1
+                recip_cnt[recip]   += 1
+                prev_d, prev_r      = last_role[donor], last_role[recip]
+                last_role[donor]    = 'D'
+                last_role[recip]    = 'R'
+
+                if dfs():
+                    return True
+
+                # back-track
+                used_pairs.remove((a, b))
+                schedule.pop()
+                donor_cnt[donor]   -= 1
+                recip_cnt[recip]   -= 1
+                last_role[donor]    = prev_d
+                last_role[recip]    = prev_r
+        return False
+
+    if not dfs():
+        raise RuntimeError("No valid schedule under the requested constraints.")
+    return schedule
+
+
+def round_robin_schedule(agents):
+    """
+    Alternating round-robin schedule: the constructive one, or the backtracking search if it ever fails validation.
+    """
+    schedule = alternating_round_robin(agents)
+    if is_alternating_schedule(schedule, agents):
+        return schedule
+    return backtracking_round_robin(agents)
@@ -0,0 +1,87 @@
+from functools import lru_cache, wraps
+from string import Template
+
+PROMPT_LAYOUTS = ("default", "cache_friendly")
+
+
+class CompiledTemplate(Template):
+    """
+    `string.Template` parsed once into literal chunks and placeholder names, so that `substitute`
+    is a single join instead of a regex pass over the whole prompt. Behaves like `Template.substitute`
+    (`$$` escapes, KeyError on a missing name); templates with an invalid placeholder fall back to it.
+    """
+
+    def __init__(self, template):
+        super().__init__(template)
+        self._chunks = [] # literal text, with the placeholder names at odd positions
+        self._names = []
+        pos = 0
+        literal = []
+        for match in self.pattern.finditer(template):
+            if match.group("invalid") is not None:
+                self._chunks = None
+                return
+            literal.append(template[pos:match.start()])
+            pos = match.end()
+            if match.group("escaped") is not None:
+                literal.append(self.delimiter)
+                continue
+            self._chunks.append("".join(literal))
+            literal = []
+            name = match.group("named") or match.group("braced")
+            self._chunks.append(name)
+            self._names.append(name)
+        literal.append(template[pos:])
+        self._chunks.append("".join(literal))
+
+    def substitute(self, mapping=None, /, **kws):
+        if self._chunks is None:
+            return super().substitute(mapping, **kws) if mapping is not None else super().substitute(**kws)
+        if mapping is None:
+            mapping = kws
+        elif kws:
+            mapping = {**mapping, **kws}
+        parts = self._chunks[:]
+        for i in range(1, len(parts), 2):
+            parts[i] = str(mapping[parts[i]])
+        return "".join(parts)
+
+
+def compiled_template(builder):
+    """
+    Decorator for the prompt builders: the Template they return is compiled once per distinct
+    argument combination (horizon, is_gossip, use_equilibrium_knowledge) and reused afterwards.
+    """
+    @lru_cache(maxsize=None)
+    def compile(*args, **kwargs):
+        return CompiledTemplate(builder(*args, **kwargs).template)
+
+    @wraps(builder)
+    def cached_builder(*args, **kwargs):
+        return compile(*args, **kwargs)
+
+    cached_builder.cache_info = compile.cache_info
+    return cached_builder
+
+
+def join_sections(sections, dynamic=(), layout="default"):
+    """
+    Join the sections of a user prompt. `default` keeps the authored order. `cache_friendly` moves the
+    `dynamic` sections (the ones substituted with per-call state: identity, memory, community messages)
+    after the run-invariant ones, so that consecutive requests share the longest possible prefix for
+    provider-side prompt caching; the `## ... Instructions` title stays on top.
+    """
+    sections = [s.strip() for s in sections if s]
+    if layout == "default":
+        return "\n\n".join(sections)
+    if layout != "cache_friendly":
+        raise ValueError(f"Invalid prompt_layout '{layout}'. Choose one of {PROMPT_LAYOUTS}.")
+    dynamic = {s.strip() for s in dynamic if s}
+    title = []
+    if sections and sections[0] in dynamic and sections[0].startswith("## "):
+        heading, _, rest = sections[0].partition("\n")
+        title, sections = [heading], [rest] + sections[1:]
+        dynamic.add(rest)
+    # the guidelines point at the per-call sections, which now follow them
+    static = [s.replace("**Community Messages** provided above", "**Community Messages** provided below") for s in sections if s not in dynamic]
+    return "\n\n".join(title + static + [s for s in sections if s in dynamic])
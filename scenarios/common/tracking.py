@@ -0,0 +1,185 @@
+"""
+Local run store: the config, per-step series and episode metrics of every run in one SQLite file
+(`metrics.store`), written by the `sqlite` metrics sink without any remote service. Runs can be
+queried across experiments and uploaded to wandb later:
+
+    python -m scenarios.common.tracking runs --game donor
+    python -m scenarios.common.tracking sync --project donor_Concur_N5_horizon_infinite
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+WANDB_ENTITY = "ALIGN"
+RUN_COLUMNS = ("run_id", "project", "group_name", "name", "game", "log_path", "status", "started_at", "finished_at", "synced_at")
+
+
+class RunStore:
+    """
+    SQLite store of runs (`runs`: one row per log path, with its config) and their metrics (`metrics`:
+    one row per run, key and step). The database can be shared by several processes, e.g. a sweep.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "run_id INTEGER PRIMARY KEY, project TEXT, group_name TEXT, name TEXT, game TEXT, log_path TEXT UNIQUE, "
+            "config TEXT, status TEXT, started_at REAL, finished_at REAL, synced_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS runs_project ON runs(project, group_name)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS runs_game ON runs(game)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS metrics ("
+            "run_id INTEGER NOT NULL, key TEXT NOT NULL, step INTEGER NOT NULL, value, "
+            "PRIMARY KEY (run_id, key, step)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS metrics_key ON metrics(key)")
+
+    def start_run(self, log_path, config, project=None, group=None, name=None):
+        """
+        Register the run logging to `log_path` and return its id. A resumed run keeps its id and
+        starts over with its metrics, since the runner logs them again for the restored rounds.
+        """
+        game = config.get("experiment", {}).get("env", {}).get("game_name")
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT run_id FROM runs WHERE log_path = ?", (log_path,)).fetchone()
+                if row is not None:
+                    self._conn.execute("DELETE FROM metrics WHERE run_id = ?", row)
+                self._conn.execute(
+                    "INSERT INTO runs (project, group_name, name, game, log_path, config, status, started_at) VALUES (?, ?, ?, ?, ?, ?, 'running', ?) "
+                    "ON CONFLICT(log_path) DO UPDATE SET project = excluded.project, group_name = excluded.group_name, name = excluded.name, "
+                    "game = excluded.game, config = excluded.config, status = 'running', started_at = excluded.started_at, finished_at = NULL, synced_at = NULL",
+                    (project, group, name, game, log_path, json.dumps(config), time.time()),
+                )
+                run_id = self._conn.execute("SELECT run_id FROM runs WHERE log_path = ?", (log_path,)).fetchone()[0]
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return run_id
+
+    def add_metrics(self, run_id, rows):
+        """ Store (step, {key: value}) rows in one transaction """
+        values = [(run_id, key, step, value) for step, row in rows for key, value in row.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR REPLACE INTO metrics (run_id, key, step, value) VALUES (?, ?, ?, ?)", values)
+            self._conn.execute("COMMIT")
+
+    def finish_run(self, run_id, status="finished"):
+        with self._lock:
+            self._conn.execute("UPDATE runs SET status = ?, finished_at = ? WHERE run_id = ?", (status, time.time(), run_id))
+
+    def runs(self, **where):
+        """ Runs matching column values, e.g. runs(game="donor", status="finished"), oldest first """
+        unknown = set(where) - set(RUN_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown run columns {sorted(unknown)}. Choose from {RUN_COLUMNS}.")
+        clause = " AND ".join(f"{column} IS ?" for column in where)
+        query = f"SELECT {', '.join(RUN_COLUMNS)} FROM runs{' WHERE ' + clause if clause else ''} ORDER BY run_id"
+        with self._lock:
+            return [dict(zip(RUN_COLUMNS, row)) for row in self._conn.execute(query, tuple(where.values()))]
+
+    def config(self, run_id):
+        with self._lock:
+            row = self._conn.execute("SELECT config FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def series(self, key, run_ids=None):
+        """ {run_id: (steps, values)} of metric `key`, for the given runs or every run that logged it """
+        if run_ids is None:
+            query, args = "SELECT run_id, step, value FROM metrics WHERE key = ? ORDER BY run_id, step", (key,)
+        else:
+            run_ids = list(run_ids)
+            query = f"SELECT run_id, step, value FROM metrics WHERE key = ? AND run_id IN ({', '.join('?' * len(run_ids))}) ORDER BY run_id, step"
+            args = (key, *run_ids)
+        result = {}
+        with self._lock:
+            for run_id, step, value in self._conn.execute(query, args):
+                steps, values = result.setdefault(run_id, ([], []))
+                steps.append(step)
+                values.append(value)
+        return result
+
+    def rows(self, run_id):
+        """ The metrics of a run as (step, {key: value}) rows in step order, as they were logged """
+        step, row = None, {}
+        with self._lock:
+            records = self._conn.execute("SELECT step, key, value FROM metrics WHERE run_id = ? ORDER BY step", (run_id,)).fetchall()
+        for record_step, key, value in records:
+            if record_step != step and row:
+                yield step, row
+                row = {}
+            step = record_step
+            row[key] = value
+        if row:
+            yield step, row
+
+    def mark_synced(self, run_id):
+        with self._lock:
+            self._conn.execute("UPDATE runs SET synced_at = ? WHERE run_id = ?", (time.time(), run_id))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def sync_runs(store, runs, entity=WANDB_ENTITY):
+    """ Upload `runs` (rows of `store.runs`) with their config and metrics to wandb, then mark them synced """
+    import wandb
+
+    for run in runs:
+        config = store.config(run["run_id"])
+        wandb_run = wandb.init(
+            entity=entity,
+            project=run["project"],
+            group=run["group_name"],
+            name=run["name"],
+            dir=config.get("metadata", {}).get("save_dir"),
+            config=config,
+        )
+        for step, row in store.rows(run["run_id"]):
+            wandb_run.log(row, step=step)
+        wandb_run.finish()
+        store.mark_synced(run["run_id"])
+        print(f"Synced run {run['run_id']} ({run['log_path']}) to {entity}/{run['project']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List the runs in the local run store or upload them to wandb.")
+    parser.add_argument("command", choices=("runs", "sync"), help="runs: list the matching runs | sync: upload the matching finished runs that were not synced yet")
+    parser.add_argument("--store", default="./tracking/runs.sqlite", help="run store (metrics.store)")
+    parser.add_argument("--project", default=None)
+    parser.add_argument("--group", default=None)
+    parser.add_argument("--game", default=None)
+    parser.add_argument("--run-id", type=int, default=None)
+    parser.add_argument("--resync", action="store_true", help="sync: also upload runs that were synced before")
+    args = parser.parse_args()
+
+    store = RunStore(args.store)
+    where = {"project": args.project, "group_name": args.group, "game": args.game, "run_id": args.run_id}
+    where = {column: value for column, value in where.items() if value is not None}
+    if args.command == "sync":
+        where["status"] = "finished"
+    runs = store.runs(**where)
+    if args.command == "runs":
+        for run in runs:
+            print(" | ".join(f"{column}={run[column]}" for column in RUN_COLUMNS))
+    else:
+        sync_runs(store, [run for run in runs if args.resync or run["synced_at"] is None])
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
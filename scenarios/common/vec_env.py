@@ -0,0 +1,89 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+class VecGameEnv(ABC):
+    """
+    Batch of `num_envs` independent repeated two-player games, stepped together with a gym-like vector API:
+
+        obs, info = env.reset(seed=0)
+        obs, rewards, terminated, truncated, info = env.step(actions)
+
+    `actions` and `rewards` have shape (num_envs, 2), one column per player. All game state lives in
+    arrays; `obs` is a dict of arrays with at least the step of every game (`step`) and the actions of
+    the previous step (`last_actions`, -1 before the first step and for a player that did not act).
+
+    A game is truncated after `max_steps` steps (by default `horizon_length` for a finite horizon, else
+    100) and is then reset at once: `info["episode_return"]` and `info["episode_discounted_return"]`
+    (discounted by `discount_factor`) hold the returns of the games that just ended, NaN for the others.
+
+    Subclasses define the payoff rules: `_reset_games(mask)` and `_play(actions)`, which returns the
+    rewards and the actions as recorded in `last_actions`, and optionally `_observe()`.
+    """
+
+    num_players = 2
+
+    def __init__(self, cfg, num_envs, max_steps=None, seed=None):
+        self.cfg = cfg
+        self.num_envs = num_envs
+        env_cfg = cfg.experiment.env
+        self.discount_factor = env_cfg.discount_factor
+        if max_steps is None:
+            max_steps = env_cfg.get("horizon_length", 100) if env_cfg.horizon == "finite" else 100
+        self.max_steps = int(max_steps)
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self.t = np.zeros(self.num_envs, dtype=np.int64)
+        self.last_actions = np.full((self.num_envs, self.num_players), -1.0)
+        self.returns = np.zeros((self.num_envs, self.num_players))
+        self.discounted_returns = np.zeros((self.num_envs, self.num_players))
+        self._reset_games(np.ones(self.num_envs, dtype=bool))
+        return self.observe(), {}
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        if actions.shape != (self.num_envs, self.num_players):
+            raise ValueError(f"Expected actions of shape {(self.num_envs, self.num_players)}, got {actions.shape}.")
+        rewards, played = self._play(actions)
+        self.returns += rewards
+        self.discounted_returns += (self.discount_factor ** self.t)[:, None] * rewards
+        self.last_actions = played
+        self.t += 1
+
+        terminated = np.zeros(self.num_envs, dtype=bool)
+        truncated = self.t >= self.max_steps
+        info = {}
+        done = terminated | truncated
+        if done.any():
+            info["episode_return"] = np.where(done[:, None], self.returns, np.nan)
+            info["episode_discounted_return"] = np.where(done[:, None], self.discounted_returns, np.nan)
+            self.t[done] = 0
+            self.last_actions[done] = -1.0
+            self.returns[done] = 0.0
+            self.discounted_returns[done] = 0.0
+            self._reset_games(done)
+        return self.observe(), rewards, terminated, truncated, info
+
+    def observe(self):
+        return {"step": self.t.copy(), "last_actions": self.last_actions.copy(), **self._observe()}
+
+    def _reset_games(self, mask):
+        pass
+
+    @abstractmethod
+    def _play(self, actions):
+        """ Play one step of every game: return (rewards, played actions), both (num_envs, 2) arrays """
+
+    def _observe(self):
+        return {}
+
+
+def alternating_roles(t):
+    """ (first role, second role) player index of every game at steps `t`: the roles swap every step """
+    first = (t % 2).astype(np.intp)
+    return first, 1 - first
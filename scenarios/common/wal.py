@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+from collections import defaultdict
+
+from omegaconf import OmegaConf
+
+
+def _names(schedule):
+    """ Replace every agent of a (possibly nested) schedule by its name """
+    if hasattr(schedule, "name"):
+        return schedule.name
+    return [_names(item) for item in schedule]
+
+
+def _agents(names, by_name):
+    """ Inverse of `_names`: pairs become tuples of agents, outer levels stay lists """
+    if isinstance(names, str):
+        return by_name[names]
+    items = [_agents(item, by_name) for item in names]
+    return tuple(items) if all(isinstance(item, str) for item in names) else items
+
+
+def _run_config(config):
+    """ `config` without `runtime.resume`, which is the only setting a resumed run adds """
+    runtime = {key: value for key, value in config.get("runtime", {}).items() if key != "resume"}
+    return {**config, "runtime": runtime}
+
+
+class RoundLog:
+    """
+    Write-ahead log of a simulation, kept next to the final JSON log as `<log>.rounds.jsonl`.
+
+    Every completed round is appended (and fsync'ed) as soon as it has been played, so a run
+    that crashes can be resumed with `python main.py --resume <log>.rounds.jsonl`: the logged
+    rounds are re-applied to the agents without any LLM call and the run continues with the
+    first round that is missing. Lines are one of
+        {"type": "header", "log_path": ..., "config": {...}}
+        {"type": "schedule", "episode": e, "schedule": [[name, name], ...]}
+        {"type": "round", "episode": e, "round": r, "info": {...}}
+    where `r` is the number used for the round in the episode log (`round_{r}`).
+    """
+
+    def __init__(self, path, cfg, log_path):
+        self.path = path
+        self.header = None
+        self.schedules = {}
+        self.rounds = defaultdict(dict)
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._load()
+        self._file = open(path, "a", encoding="utf-8")
+        if self.header is None:
+            self.header = {"type": "header", "log_path": log_path, "config": OmegaConf.to_container(cfg, resolve=True)}
+            self._write(self.header)
+        elif self.rounds:
+            print(f"Resuming from {path}: {sum(len(r) for r in self.rounds.values())} rounds already played")
+
+    @staticmethod
+    def path_for(log_path):
+        return f"{os.path.splitext(log_path)[0]}.rounds.jsonl"
+
+    @classmethod
+    def for_run(cls, cfg, log_path):
+        """
+        Round log of the run logging to `log_path`: the file named by `runtime.resume` when resuming,
+        otherwise `<log>.rounds.jsonl`. A resumed round log must have been written by the same run
+        (same log path and config), so a mismatch fails instead of silently starting over.
+        """
+        resume = cfg.get("runtime", {}).get("resume", None)
+        if not resume:
+            return cls(cls.path_for(log_path), cfg, log_path)
+        header = cls.read_header(resume)
+        if header["log_path"] != log_path:
+            raise ValueError(f"Round log {resume} belongs to {header['log_path']}, not to {log_path}.")
+        if _run_config(header["config"]) != _run_config(OmegaConf.to_container(cfg, resolve=True)):
+            raise ValueError(f"Round log {resume} was written with a different config than this run.")
+        return cls(resume, cfg, log_path)
+
+    @staticmethod
+    def read_header(path):
+        with open(path, encoding="utf-8") as f:
+            header = json.loads(f.readline())
+        if header.get("type") != "header":
+            raise ValueError(f"{path} is not a round log.")
+        return header
+
+    def _load(self):
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break # torn write of the last line
+                valid_bytes += len(line)
+                if record["type"] == "header":
+                    self.header = record
+                elif record["type"] == "schedule":
+                    self.schedules[record["episode"]] = record["schedule"]
+                elif record["type"] == "round":
+                    self.rounds[record["episode"]][record["round"]] = record["info"]
+        if valid_bytes < os.path.getsize(self.path):
+            os.truncate(self.path, valid_bytes)
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def schedule(self, episode, schedule, agents):
+        """
+        Return the schedule of `episode`: the logged one when resuming (so random schedules are
+        reproduced), otherwise `schedule`, which is logged.
+        """
+        if episode in self.schedules:
+            return _agents(self.schedules[episode], {agent.name: agent for agent in agents})
+        self.schedules[episode] = _names(schedule)
+        self._write({"type": "schedule", "episode": episode, "schedule": self.schedules[episode]})
+        return schedule
+
+    def play_or_restore(self, episode, round_num, play, restore):
+        """
+        If round `round_num` of `episode` is logged, pass its info to `restore` and return it.
+        Otherwise call `play()`, log the round info it returns and return it.
+        """
+        round_info = self.rounds[episode].get(round_num)
+        if round_info is not None:
+            print(f"Round {round_num} (restored from {self.path})")
+            restore(round_info)
+            return round_info
+        round_info = play()
+        self._write({"type": "round", "episode": episode, "round": round_num, "info": round_info})
+        return round_info
+
+    def close(self):
+        with self._lock:
+            self._file.close()
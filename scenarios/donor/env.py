@@ -1,3 +1,5 @@
+from scenarios.common.memory import ShortTermMemory
+
 class DonorGameEnv:
     def __init__(self, cfg):
         self.config = cfg
@@ -9,7 +11,7 @@ class DonorGameEnv:
             agent.donation_ratios = []
             agent.benefits = [] # stores the benefit received by the agent everytime he takes on recipient role
             agent.rewards = [] # stores the reward obtained at every time step (so includes both donor and recipient roles)
-            agent.stm = [] # The interaction log for each episode
+            agent.stm = ShortTermMemory.from_config(self.config) # The interaction log for each episode
 
     def step(self, donor, recipient, donation, benefit):
         donor.resources -= donation
@@ -2,7 +2,10 @@ import os
 import textwrap
 from string import Template
 
+from scenarios.common.templates import compiled_template, join_sections
 
+
+@compiled_template
 def rulePrompt(horizon: str, is_gossip: bool) -> Template:
     """
     Build a rules prompt for the donation game.
@@ -90,7 +93,8 @@ def rulePrompt(horizon: str, is_gossip: bool) -> Template:
     return Template(prompt_text)
 
 
-def donationPrompt(horizon: str, is_gossip: bool, use_equilibrium_knowledge: bool
+@compiled_template
+def donationPrompt(horizon: str, is_gossip: bool, use_equilibrium_knowledge: bool, layout: str = "default"
 ) -> Template:
     """
     Build the donor-instruction prompt for a single round.
@@ -218,12 +222,13 @@ def donationPrompt(horizon: str, is_gossip: bool, use_equilibrium_knowledge: boo
         sections = [identity, objective, memory, community_messages, accountability, equilibrium_knowledge, donation_rule, response_instruction]
     else:
         sections = [identity, objective, memory, community_messages, accountability, donation_rule, response_instruction]
-    full_prompt = "\n\n".join(s.strip() for s in sections if s)
+    full_prompt = join_sections(sections, dynamic=[identity, memory, community_messages], layout=layout)
 
     return Template(full_prompt)
 
 
-def gossipPrompt(horizon: str, use_equilibrium_knowledge: bool) -> Template:
+@compiled_template
+def gossipPrompt(horizon: str, use_equilibrium_knowledge: bool, layout: str = "default") -> Template:
     """
     Build the recipient-side gossip prompt.
     """
@@ -345,7 +350,7 @@ def gossipPrompt(horizon: str, use_equilibrium_knowledge: bool) -> Template:
         sections = [identity, objective, memory, community_messages, accountability, equilibrium_knowledge, gossip_rule, response_instruction]
     else:
         sections = [identity, objective, memory, community_messages, accountability, gossip_rule, response_instruction]
-    prompt_text = "\n\n".join(s.strip() for s in sections if s)
+    prompt_text = join_sections(sections, dynamic=[identity, memory, community_messages], layout=layout)
     return Template(prompt_text)
 
 
@@ -3,9 +3,13 @@ from scenarios.donor.env import DonorGameEnv
 from scenarios.donor.prompt import rulePrompt
 from scenarios.donor.utility import *
 from scenarios.donor.log_metrics import *
+from scenarios.common.parallel import play_schedule, play_episodes
+from scenarios.common.wal import RoundLog
+from scenarios.common.schedule import round_robin_schedule
+from scenarios.common.message_log import MessageLog
+from scenarios.common.interaction_log import InteractionLog
+from llm.telemetry import call_tags
 import numpy as np
-from itertools import combinations
-import json
 
 class DonorGameRunner:
     def __init__(self, cfg, client, log_path):
@@ -40,148 +44,134 @@ class DonorGameRunner:
         3. Each agent is donor ⌊(n-1)/2⌋ or ⌈(n-1)/2⌉ times.
 
         One pair plays per round —­ the list order *is* the round order.
-        Raises RuntimeError if no schedule exists (rare for n ≤ 10).
+        Built constructively in O(n^2) (see scenarios/common/schedule.py).
         """
-        n = len(agents)
-        plays_per_agent  = n - 1
-        donor_low, donor_high = plays_per_agent // 2, (plays_per_agent + 1) // 2
+        return round_robin_schedule(agents)
 
-        # --- all unordered pairs produced in one line with *combinations* ---
-        remaining_pairs = list(combinations(agents, 2))      # ← ★ here ★
-
-        # bookkeeping
-        donor_cnt, recip_cnt = {a: 0 for a in agents}, {a: 0 for a in agents}
-        last_role           = {a: None for a in agents}
-        used_pairs, schedule = set(), []
-
-        # depth-first search with back-tracking — minimalist but guaranteed
-        def dfs():
-            if len(schedule) == len(remaining_pairs):
-                return True
-
-            for a, b in remaining_pairs:
-                if (a, b) in used_pairs:
-                    continue
-
-                for donor, recip in ((a, b), (b, a)):      # orient the pair
-                    # quotas
-                    if donor_cnt[donor]   >= donor_high or recip_cnt[recip] >= donor_high:
-                        continue
-                    # role alternation
-                    if last_role[donor] == 'D' or last_role[recip] == 'R':
-                        continue
-
-                    # commit
-                    used_pairs.add((a, b))
-                    schedule.append((donor, recip))
-                    donor_cnt[donor]   += 1
-                    recip_cnt[recip]   += 1
-                    prev_d, prev_r      = last_role[donor], last_role[recip]
-                    last_role[donor]    = 'D'
-                    last_role[recip]    = 'R'
+    def play_round(self, round_index, pair, historical_messages):
+        """
+        Play one donor/recipient interaction, update both agents and return the round info
+        """
+        print(f"Round {round_index + 1}")
+        donor, recipient = pair
+        # for donor, recipient in round_pairings:
+        resources_before_donation = {"donor": donor.resources, "recipient": recipient.resources}
 
-                    if dfs():
-                        return True
+        if self.is_gossip:
+            donor_justification, donor_action = donor.donate(self.rules, recipient, historical_messages.view(recipient.name))
+        else:
+            donor_justification, donor_action = donor.donate(self.rules, recipient)
+
+        assert donor_action in ["cooperate", "defect"], "Invalid action taken by donor."
+        if donor_action == "defect":
+            donation = 0
+            received_benefit = 0
+        else: # cooperate
+            donation = self.cfg.experiment.env.cost
+            received_benefit = self.cfg.experiment.env.benefit
+        print(f"Donor: {donor.name}, Recipient: {recipient.name}, Action : {donor_action}, Donation: {donation} \n")
+    
+        print(f"Donor's Justification: {donor_justification} \n")
+        
+        assert donation <= donor.resources, "Donation amount is invalid."
+        donation_ratio = compute_donation_ratio(donation, donor.resources)
 
-                    # back-track
-                    used_pairs.remove((a, b))
-                    schedule.pop()
-                    donor_cnt[donor]   -= 1
-                    recip_cnt[recip]   -= 1
-                    last_role[donor]    = prev_d
-                    last_role[recip]    = prev_r
-            return False
+        if self.is_gossip:
+            recipient_justification, recipient_tone, recipient_message = recipient.gossip(self.rules, donor, donation, donation_ratio, received_benefit, historical_messages.view(donor.name))
+            print(f"Recipient: {recipient.name}, Selected Tone: {recipient_tone}, Gossip: {recipient_message},\n Recipient's Justification: {recipient_justification}\n")
+            cur_round_info = {"donor_name": donor.name, "recipient_name": recipient.name, "resources_before_donation": resources_before_donation, "donation": donation, "donation_ratio": donation_ratio, "donor_justification": donor_justification, "received_benefit": received_benefit, "recipient_justification": recipient_justification, "tone":recipient_tone, "gossip": recipient_message} # Update the trajectory(STM) of the players with this current round info 
+        else:
+            cur_round_info = {"donor_name": donor.name, "recipient_name": recipient.name, "resources_before_donation": resources_before_donation, "donation": donation, "donation_ratio": donation_ratio, "donor_justification": donor_justification, "received_benefit": received_benefit}
+        self.apply_round(round_index, pair, cur_round_info, historical_messages)
+        return cur_round_info
 
-        if not dfs():
-            raise RuntimeError("No valid schedule under the requested constraints.")
-        return schedule
+    def apply_round(self, round_index, pair, cur_round_info, historical_messages):
+        """
+        Apply the outcome of a played (or logged) round to both agents and the public message log
+        """
+        donor, recipient = pair
+        donation = cur_round_info["donation"]
+        received_benefit = cur_round_info["received_benefit"]
+        if self.is_gossip:
+            message_summary = {"round": {round_index+1}, "donor": donor.name, "recipient": recipient.name, f"message from {recipient.name}": cur_round_info["gossip"]}
+            historical_messages.append(message_summary)
+        donor.update_stm(round_index+1, cur_round_info)
+        recipient.update_stm(round_index+1, cur_round_info)
+        self.env.step(donor, recipient, donation, received_benefit)
+        # Update reward signals and donations made
+        donor.donations.append(donation)
+        donor.donation_ratios.append(cur_round_info["donation_ratio"])
+        recipient.benefits.append(received_benefit)
+        donor.rewards.append(-donation)
+        recipient.rewards.append(received_benefit)
+
+    def play_or_restore(self, round_log, episode, round_index, pair, historical_messages):
+        with call_tags(episode=episode, round=round_index+1):
+            cur_round_info = round_log.play_or_restore(
+                episode, round_index+1,
+                lambda: self.play_round(round_index, pair, historical_messages),
+                lambda cur_round_info: self.apply_round(round_index, pair, cur_round_info, historical_messages),
+            )
+        self.interaction_log.write(episode, round_index+1, cur_round_info) # Log data per round
+        return cur_round_info
+
+    def play_episode(self, round_log, episode, agents, max_workers=None):
+        """
+        Reset `agents` and play episode `episode` (1-based) with them; return their starting resources
+        """
+        historical_messages = MessageLog.from_config(self.cfg, message_subjects)
+        self.env.reset(agents)
+        all_pairs_schedule = round_log.schedule(episode, self.round_robin_donor_game(agents), agents)
+        self.interaction_log.expect_rounds(episode, len(all_pairs_schedule))
+        resources_start = [agent.resources for agent in agents]
 
+        play_schedule(all_pairs_schedule, lambda round_index, pair: self.play_or_restore(round_log, episode, round_index, pair, historical_messages), max_workers)
+        return resources_start
 
     def run_simulation(self, is_test):
         """
         run simulation
         """
-        run = init_log(self.cfg, is_test)
-        scenario_data = {}
-        scenario_data["config"] = OmegaConf.to_container(self.cfg, resolve=True)
-        for episode in range(self.cfg.experiment.env.num_episodes):
-            episode_logs = {}
-            episode_data = {}
-            historical_messages = []
-            self.env.reset(self.agents)
-            all_pairs_schedule = self.round_robin_donor_game(self.agents)
-            resources_start = [agent.resources for agent in self.agents]
-
-            for round_index, pair in enumerate(all_pairs_schedule):
-                print(f"Round {round_index + 1}")
-                donor, recipient = pair
-                # for donor, recipient in round_pairings:
-                resources_before_donation = {"donor": donor.resources, "recipient": recipient.resources}
-
-                if self.is_gossip:
-                    donor_justification, donor_action = donor.donate(self.rules, recipient, historical_messages)
-                else:
-                    donor_justification, donor_action = donor.donate(self.rules, recipient)
-
-                assert donor_action in ["cooperate", "defect"], "Invalid action taken by donor."
-                if donor_action == "defect":
-                    donation = 0
-                    received_benefit = 0
-                else: # cooperate
-                    donation = self.cfg.experiment.env.cost
-                    received_benefit = self.cfg.experiment.env.benefit
-                print(f"Donor: {donor.name}, Recipient: {recipient.name}, Action : {donor_action}, Donation: {donation} \n")
-            
-                print(f"Donor's Justification: {donor_justification} \n")
-                
-                assert donation <= donor.resources, "Donation amount is invalid."
-                donation_ratio = compute_donation_ratio(donation, donor.resources)
-
-                if self.is_gossip:
-                    recipient_justification, recipient_tone, recipient_message = recipient.gossip(self.rules, donor, donation, donation_ratio, received_benefit, historical_messages)
-                    print(f"Recipient: {recipient.name}, Selected Tone: {recipient_tone}, Gossip: {recipient_message},\n Recipient's Justification: {recipient_justification}\n")
-                    message_summary = {"round": {round_index+1}, "donor": donor.name, "recipient": recipient.name, f"message from {recipient.name}": recipient_message}
-                    historical_messages.append(message_summary)
-                    cur_round_info = {"donor_name": donor.name, "recipient_name": recipient.name, "resources_before_donation": resources_before_donation, "donation": donation, "donation_ratio": donation_ratio, "donor_justification": donor_justification, "received_benefit": received_benefit, "recipient_justification": recipient_justification, "tone":recipient_tone, "gossip": recipient_message} # Update the trajectory(STM) of the players with this current round info 
-                else:
-                    cur_round_info = {"donor_name": donor.name, "recipient_name": recipient.name, "resources_before_donation": resources_before_donation, "donation": donation, "donation_ratio": donation_ratio, "donor_justification": donor_justification, "received_benefit": received_benefit}
-                episode_data[f"round_{round_index+1}"] = cur_round_info # Log data per round
-                donor.update_stm(round_index+1, cur_round_info)
-                recipient.update_stm(round_index+1, cur_round_info)
-                self.env.step(donor, recipient, donation, received_benefit)
-                # Update reward signals and donations made
-                donor.donations.append(donation)
-                donor.donation_ratios.append(donation_ratio)
-                recipient.benefits.append(received_benefit)
-                donor.rewards.append(-donation)
-                recipient.rewards.append(received_benefit)
-
-            for k, agent in enumerate(self.agents):
+        run = init_log(self.cfg, is_test, self.log_path)
+        round_log = RoundLog.for_run(self.cfg, self.log_path)
+        self.interaction_log = InteractionLog(self.log_path, self.cfg)
+        # Without gossip a round only touches its own two agents, so independent rounds can overlap
+        max_workers = self.cfg.runtime.max_workers if self.cfg.runtime.parallel_rounds and not self.is_gossip else None
+        # Episodes are independent: in parallel, each plays with its own agents
+        parallel_episodes = self.cfg.runtime.get("parallel_episodes", False)
+
+        def play(episode):
+            agents = self.init_agents() if parallel_episodes else self.agents
+            return agents, self.play_episode(round_log, episode, agents, max_workers)
+
+        episodes = play_episodes(self.cfg.experiment.env.num_episodes, play, self.cfg.runtime.max_workers if parallel_episodes else None)
+        for agents, resources_start in episodes:
+            step_series = {}
+            for k, agent in enumerate(agents):
                 donations = agent.donations
                 donation_ratios = agent.donation_ratios
                 rewards = agent.rewards
                 benefits = agent.benefits
-                assert len(donations) == len(donation_ratios) == len(benefits) == len(rewards)/2, "Mismatch in lengths of donations, donation ratios, rewards, and benefits."
-                for step in range(len(donations)):
-                    wandb.log({f"Agent {k} Donation Per Step": donations[step], f"Agent {k} Donation Ratio Per Step": donation_ratios[step], f"Agent {k} Reward Per Step": rewards[step], f"Agent {k} Benefit Per Step": benefits[step]})
+                # every round gives one reward to each side; with an even number of agents the donor/recipient counts differ by one
+                assert len(donations) == len(donation_ratios) and len(donations) + len(benefits) == len(rewards), "Mismatch in lengths of donations, donation ratios, rewards, and benefits."
+                step_series.update({
+                    f"Agent {k} Reward Per Step": rewards[:max(len(donations), len(benefits))],
+                    f"Agent {k} Donation Per Step": donations,
+                    f"Agent {k} Donation Ratio Per Step": donation_ratios,
+                    f"Agent {k} Benefit Per Step": benefits,
+                })
+            run.log_series(step_series)
 
             # Compute metrics
-            avg_donation_all = [compute_avg_donation(agent) for agent in self.agents] # This should be appended to the agent's long-term memory as a feedback signal
-            avg_donation_ratios_all = [compute_avg_donation_ratio(agent) for agent in self.agents]
-            returns_all = [compute_return(agent, resources_start[agent_idx]) for agent_idx, agent in enumerate(self.agents)]
-            discounted_cumulative_rewards_all = [compute_dis_cum_reward(agent, self.discount_factor) for agent in self.agents] # This should be appended to the agent's long-term memory as a feedback signal
-            image_score_all = [compute_image_score(agent) for agent in self.agents]
+            # The average donations and discounted cumulative rewards should be appended to the agents' long-term memory as a feedback signal
+            avg_donation_all, avg_donation_ratios_all, returns_all, discounted_cumulative_rewards_all, image_score_all = compute_episode_metrics(agents, resources_start, self.discount_factor)
 
-            # Log data per episode
-            episode_logs["interaction"] = episode_data
-            scenario_data[f"episode_{episode+1}"] = episode_logs
             # Log metrics per episode    
-            logging_metrics(avg_donation_all, avg_donation_ratios_all, returns_all, discounted_cumulative_rewards_all, image_score_all)
+            logging_metrics(run, avg_donation_all, avg_donation_ratios_all, returns_all, discounted_cumulative_rewards_all, image_score_all)
+        round_log.close()
         close_log(run)
-        # print(scenario_data)
-        with open(f'{self.log_path}', "w") as f:
-            json.dump(scenario_data, f, indent=4)
-        print(f"Simulation completed. Logs saved to {self.log_path}")
+        self.interaction_log.close()
+        print(f"Simulation completed. Logs saved to {self.interaction_log.path}")
 
 
 class DonorGameRunnerWithGreedyAgent:
@@ -233,12 +223,9 @@ class DonorGameRunnerWithGreedyAgent:
         """
         run simulation
         """
-        run = init_log(self.cfg, is_test)
-        scenario_data = {}
-        scenario_data["config"] = OmegaConf.to_container(self.cfg, resolve=True)
+        run = init_log(self.cfg, is_test, self.log_path)
+        interaction_log = InteractionLog(self.log_path, self.cfg)
         for episode in range(self.cfg.experiment.env.num_episodes):
-            episode_logs = {}
-            episode_data = {}
             historical_messages = []
             self.env.reset(self.agents)
             all_pairs_schedule = self.schedule_vs_newcomer()
@@ -286,7 +273,7 @@ class DonorGameRunnerWithGreedyAgent:
                     cur_round_info = {"donor_name": donor.name, "recipient_name": recipient.name, "resources_before_donation": resources_before_donation, "donation": donation, "donation_ratio": donation_ratio, "donor_justification": donor_justification, "received_benefit": received_benefit, "recipient_justification": recipient_justification, "tone":recipient_tone, "gossip": recipient_message} # Update the trajectory(STM) of the players with this current round info 
                 else:
                     cur_round_info = {"donor_name": donor.name, "recipient_name": recipient.name, "resources_before_donation": resources_before_donation, "donation": donation, "donation_ratio": donation_ratio, "donor_justification": donor_justification, "received_benefit": received_benefit}
-                episode_data[f"round_{round_index+1}"] = cur_round_info # Log data per round
+                interaction_log.write(episode+1, round_index+1, cur_round_info) # Log data per round
                 donor.update_stm(round_index+1, cur_round_info)
                 recipient.update_stm(round_index+1, cur_round_info)
                 self.env.step(donor, recipient, donation, received_benefit)
@@ -304,21 +291,12 @@ class DonorGameRunnerWithGreedyAgent:
             rewards = greedy_agent.rewards
             benefits = greedy_agent.benefits
             assert len(donations) == len(donation_ratios) == len(benefits) == len(rewards)/2, "Mismatch in lengths of donations, donation ratios, rewards, and benefits."
-            for step in range(len(donations)):
-                wandb.log({f"Greedy Agent Donation Per Step": donations[step], f"Greedy Agent Donation Ratio Per Step": donation_ratios[step], f"Greedy Agent Reward Per Step": rewards[step], f"Greedy Agent Benefit Per Step": benefits[step]})
+            run.log_series({f"Greedy Agent Donation Per Step": donations, f"Greedy Agent Donation Ratio Per Step": donation_ratios, f"Greedy Agent Reward Per Step": rewards[:len(donations)], f"Greedy Agent Benefit Per Step": benefits})
 
             # Compute metrics
-            avg_donation_all = [compute_avg_donation(agent) for agent in self.agents] # This should be appended to the agent's long-term memory as a feedback signal
-            avg_donation_ratios_all = [compute_avg_donation_ratio(agent) for agent in self.agents]
-            returns_all = [compute_return(agent, resources_start[agent_idx]) for agent_idx, agent in enumerate(self.agents)]
-            discounted_cumulative_rewards_all = [compute_dis_cum_reward(agent, self.discount_factor) for agent in self.agents] # This should be appended to the agent's long-term memory as a feedback signal
-            image_score_all = [compute_image_score(agent) for agent in self.agents]
-            episode_logs["interaction"] = episode_data
-            scenario_data[f"episode_{episode+1}"] = episode_logs
+            avg_donation_all, avg_donation_ratios_all, returns_all, discounted_cumulative_rewards_all, image_score_all = compute_episode_metrics(self.agents, resources_start, self.discount_factor)
             # Log metrics per episode    
-            logging_metrics(avg_donation_all, avg_donation_ratios_all, returns_all, discounted_cumulative_rewards_all, image_score_all)
+            logging_metrics(run, avg_donation_all, avg_donation_ratios_all, returns_all, discounted_cumulative_rewards_all, image_score_all)
         close_log(run)
-        # print(scenario_data)
-        with open(f'{self.log_path}', "w") as f:
-            json.dump(scenario_data, f, indent=4)
-        print(f"Simulation completed. Logs saved to {self.log_path}")
\ No newline at end of file
+        interaction_log.close()
+        print(f"Simulation completed. Logs saved to {interaction_log.path}")
\ No newline at end of file
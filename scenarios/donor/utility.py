@@ -1,6 +1,8 @@
 from pydantic import BaseModel
 import numpy as np
 
+from scenarios.common.metrics import discounted_returns, row_means, signed_counts, stack_attribute
+
 class BinaryDonationResponse(BaseModel):
     justification: str
     donor_action: str
@@ -10,24 +12,6 @@ class GossipResponse(BaseModel):
     tone: str
     gossip: str
 
-def compute_return(agent, resources_start): 
-    return agent.resources - resources_start
-
-def compute_dis_cum_reward(agent, discount_factor):
-    """
-    Calculate the discounted cumulative reward for an agent.
-    """
-    discounted_cumulative_reward = 0
-    for idx, reward in enumerate(agent.rewards):
-        discounted_cumulative_reward += (discount_factor ** idx) * reward
-    return discounted_cumulative_reward
-
-def compute_avg_donation(agent):
-    """
-    Calculate the average donation made by an agent.
-    """
-    return 0 if len(agent.donations) == 0 else np.mean(agent.donations)
-
 def compute_donation_ratio(donation, total_resources):
     """
     Calculate the average donation ratio for an agent.
@@ -35,17 +19,34 @@ def compute_donation_ratio(donation, total_resources):
     """
     return donation / total_resources if total_resources > 0 else 0
 
-def compute_avg_donation_ratio(agent):
-    return 0 if len(agent.donation_ratios) == 0 else np.mean(agent.donation_ratios)
-
-def compute_image_score(agent):
-    """
-    Calculate the image score for an agent based on their donations.
-    """
-    image_score = 0
-    for donation in agent.donations:
-        if donation > 0:
-            image_score += 1
-        else:
-            image_score -= 1
-    return image_score
\ No newline at end of file
+def compute_episode_metrics(agents, resources_start, discount_factor):
+    """
+    Average donation, average donation ratio, return, discounted cumulative reward and image score
+    of every agent in an episode, as arrays over `agents`
+    """
+    donations, num_donations = stack_attribute(agents, "donations")
+    donation_ratios, _ = stack_attribute(agents, "donation_ratios")
+    rewards, _ = stack_attribute(agents, "rewards")
+    returns = np.array([agent.resources for agent in agents]) - np.asarray(resources_start)
+    return (
+        row_means(donations, num_donations),
+        row_means(donation_ratios, num_donations),
+        returns,
+        discounted_returns(rewards, discount_factor),
+        signed_counts(donations > 0, num_donations),
+    )
+
+def summarize_round(name, round_idx, round_info):
+    """ One-line summary of a round from the perspective of `name`, used for older rounds in the STM """
+    action = "cooperated" if round_info["donation"] > 0 else "defected"
+    if name == round_info["donor_name"]:
+        summary = f"Round {round_idx}: donor to {round_info['recipient_name']}, I {action} (paid {round_info['donation']})."
+    else:
+        summary = f"Round {round_idx}: recipient of {round_info['donor_name']}, who {action} (I received {round_info['received_benefit']})."
+    if "tone" in round_info:
+        summary += f" Message tone: {round_info['tone']}."
+    return summary
+
+def message_subjects(message):
+    """ Agents a public message is about: the recipient's message is about the donor """
+    return [message["donor"]]
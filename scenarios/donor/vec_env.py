@@ -0,0 +1,45 @@
+import numpy as np
+
+from scenarios.common.vec_env import VecGameEnv, alternating_roles
+
+
+class DonorGameVecEnv(VecGameEnv):
+    """
+    `num_envs` repeated donor games with the rules of `DonorGameEnv`: the two players alternate as donor
+    (player 0 at even steps) and recipient. The donor's action is 1 = cooperate (donate `cost`, which it
+    must afford, so that the recipient receives `benefit`) or 0 = defect; the recipient's action is ignored.
+    Observations add both players' `resources` and the current `donor`.
+    """
+
+    def __init__(self, cfg, num_envs, max_steps=None, seed=None):
+        env_cfg = cfg.experiment.env
+        self.cost = env_cfg.cost
+        self.benefit = env_cfg.benefit
+        self.initial_resources = float(env_cfg.initial_resources)
+        self.resources = np.full((num_envs, 2), self.initial_resources)
+        super().__init__(cfg, num_envs, max_steps, seed)
+
+    def _reset_games(self, mask):
+        self.resources[mask] = self.initial_resources
+
+    def _play(self, actions):
+        games = np.arange(self.num_envs)
+        donor, recipient = alternating_roles(self.t)
+        cooperate = actions[games, donor]
+        if not np.isin(cooperate, (0, 1)).all():
+            raise ValueError("Donor actions must be 1 (cooperate) or 0 (defect).")
+        # a donor that cannot afford the donation defects
+        donate = (cooperate == 1) & (self.resources[games, donor] >= self.cost)
+        donation = np.where(donate, self.cost, 0.0)
+        received_benefit = np.where(donate, self.benefit, 0.0)
+        self.resources[games, donor] -= donation
+        self.resources[games, recipient] += received_benefit
+        rewards = np.zeros((self.num_envs, 2))
+        rewards[games, donor] = -donation
+        rewards[games, recipient] = received_benefit
+        played = np.full((self.num_envs, 2), -1.0)
+        played[games, donor] = donate
+        return rewards, played
+
+    def _observe(self):
+        return {"resources": self.resources.copy(), "donor": alternating_roles(self.t)[0]}
@@ -1,6 +1,6 @@
+from llm.telemetry import call_tags
 from scenarios.market.prompt import sellerPrompt, buyerPrompt, buyerGossipPrompt
-from scenarios.market.utility import SellerActionResponse, BuyerActionResponse, BuyerGossipResponse
-import json
+from scenarios.market.utility import SellerActionResponse, BuyerActionResponse, BuyerGossipResponse, summarize_round
 
 class SellerBaselineAgent:
     def __init__(self, client, agent_id, cfg, log_path, horizon_length, env):
@@ -10,60 +10,16 @@ class SellerBaselineAgent:
         self.log_path = log_path
         self.is_gossip = cfg.experiment.agents.is_gossip
         self.use_equilibrium_knowledge = cfg.experiment.agents.use_equilibrium_knowledge
+        self.prompt_layout = cfg.llm.get("prompt_layout", "default")
         self.horizon = cfg.experiment.env.horizon
         self.horizon_length = horizon_length
         self.env = env
         self.stm = []
 
-    def sell_policy_llm(self, rule_prompt, seller_prompt_text):
-        response_class = SellerActionResponse
-        if self.cfg.llm.api == 'openai' or self.cfg.llm.api == 'gemini-v2':
-            response = self.client.beta.chat.completions.parse(
-                model=self.cfg.llm.model,
-                messages=[
-                    {"role": "developer", "content": rule_prompt},
-                    {"role": "user", "content": seller_prompt_text}
-                ],
-                response_format=response_class,
-            )
-            return response.choices[0].message.parsed.justification, response.choices[0].message.parsed.seller_action
-        
-        elif self.cfg.llm.api == 'together':
-            response = self.client.chat.completions.create(
-                model=self.cfg.llm.model,
-                messages=[
-                    {"role": "system", "content": rule_prompt},
-                    {"role": "user", "content": seller_prompt_text}
-                ],
-                response_format={'type': 'json_schema',
-                                 "schema": response_class.model_json_schema()}
-            )
-            response_content = json.loads(response.choices[0].message.content)
-            return response_content['justification'], response_content['seller_action']
-        
-        elif self.cfg.llm.api == "gemini":
-            response = self.client.models.generate_content(
-                model=self.cfg.llm.model,
-                contents=[rule_prompt, seller_prompt_text],
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": response_class,
-                }
-            )
-            response_content = json.loads(response.text)
-            return response_content['justification'], response_content['seller_action']
-        
-        elif self.cfg.llm.api == 'deepseek':
-            response = self.client.chat.completions.create(
-                model=self.cfg.llm.model,
-                messages=[
-                    {"role": "system", "content": rule_prompt},
-                    {"role": "user", "content": seller_prompt_text}
-                ],
-                response_format={'type': 'json_object'}
-            )
-            structured_response = json.loads(response.choices[0].message.content)
-            return structured_response["justification"], structured_response["seller_action"]
+    def sell_policy_llm(self, rule_prompt, seller_prompt_text, counterpart=None):
+        with call_tags(agent=self.name, counterpart=counterpart, role="seller", call="action"):
+            response = self.client.complete(rule_prompt, seller_prompt_text, SellerActionResponse)
+        return response["justification"], response["seller_action"]
         
     def sell(self, rules, buyer):
         """
@@ -73,6 +29,7 @@ class SellerBaselineAgent:
             horizon=self.horizon,
             is_gossip=self.is_gossip,
             use_equilibrium_knowledge=self.use_equilibrium_knowledge,
+            layout=self.prompt_layout,
         ).substitute(
             seller_name=self.name,
             buyer_name=buyer.name,
@@ -85,7 +42,7 @@ class SellerBaselineAgent:
             seller_Ls_reward=self.env.payoff_matrix[("L", "s")][0],
         ).strip()
 
-        justification, seller_action = self.sell_policy_llm(rules, seller_prompt_text)
+        justification, seller_action = self.sell_policy_llm(rules, seller_prompt_text, buyer.name)
         return justification, seller_action
 
     def update_stm(self, round_idx, round_info):
@@ -104,7 +61,7 @@ class SellerBaselineAgent:
 
         round_context = f""" In round {round_idx}, I, {self.name}, was matched with buyer {buyer_name}. I chose {seller_action}. The buyer chose {buyer_action}. My reward was {seller_reward}. This is my justification: "{seller_justification}".
         """
-        self.stm.append(round_context)
+        self.stm.append(round_context, summary=summarize_round(self.name, round_idx, round_info))
 
 
 class SellerGossipAgent(SellerBaselineAgent):
@@ -123,6 +80,7 @@ class SellerGossipAgent(SellerBaselineAgent):
             horizon=self.horizon,
             is_gossip=self.is_gossip,
             use_equilibrium_knowledge=self.use_equilibrium_knowledge,
+            layout=self.prompt_layout,
         ).substitute(
             seller_name=self.name,
             buyer_name=buyer.name,
@@ -135,7 +93,7 @@ class SellerGossipAgent(SellerBaselineAgent):
             seller_Lc_reward=self.env.payoff_matrix[("L", "c")][0],
             seller_Ls_reward=self.env.payoff_matrix[("L", "s")][0],
         ).strip()
-        justification, seller_action = self.sell_policy_llm(rules, seller_prompt_text)
+        justification, seller_action = self.sell_policy_llm(rules, seller_prompt_text, buyer.name)
         return justification, seller_action
 
     def update_stm(self, round_idx, round_info):
@@ -156,7 +114,7 @@ class SellerGossipAgent(SellerBaselineAgent):
 
         round_context = f""" In round {round_idx}, I, {self.name}, was matched with buyer {buyer_name}. I chose {seller_action}. The buyer chose {buyer_action}. My reward was {seller_reward}. This is my justification: "{seller_justification}".{extra}
         """
-        self.stm.append(round_context)
+        self.stm.append(round_context, summary=summarize_round(self.name, round_idx, round_info))
 
 
 # ============================================================
@@ -171,60 +129,16 @@ class BuyerBaselineAgent:
         self.log_path = log_path
         self.is_gossip = cfg.experiment.agents.is_gossip
         self.use_equilibrium_knowledge = cfg.experiment.agents.use_equilibrium_knowledge
+        self.prompt_layout = cfg.llm.get("prompt_layout", "default")
         self.horizon = cfg.experiment.env.horizon
         self.horizon_length = horizon_length
         self.env = env
         self.stm = []
 
-    def buy_policy_llm(self, rule_prompt, buyer_prompt_text):
-        response_class = BuyerActionResponse
-        if self.cfg.llm.api == 'openai' or self.cfg.llm.api == 'gemini-v2':
-            response = self.client.beta.chat.completions.parse(
-                model=self.cfg.llm.model,
-                messages=[
-                    {"role": "developer", "content": rule_prompt},
-                    {"role": "user", "content": buyer_prompt_text}
-                ],
-                response_format=response_class,
-            )
-            return response.choices[0].message.parsed.justification, response.choices[0].message.parsed.buyer_action
-        
-        elif self.cfg.llm.api == 'together':
-            response = self.client.chat.completions.create(
-                model=self.cfg.llm.model,
-                messages=[
-                    {"role": "system", "content": rule_prompt},
-                    {"role": "user", "content": buyer_prompt_text}
-                ],
-                response_format={'type': 'json_schema',
-                                 "schema": response_class.model_json_schema()}
-            )
-            response_content = json.loads(response.choices[0].message.content)
-            return response_content['justification'], response_content['buyer_action']
-        
-        elif self.cfg.llm.api == "gemini":
-            response = self.client.models.generate_content(
-                model=self.cfg.llm.model,
-                contents=[rule_prompt, buyer_prompt_text],
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": response_class,
-                }
-            )
-            response_content = json.loads(response.text)
-            return response_content['justification'], response_content['buyer_action']
-        
-        elif self.cfg.llm.api == 'deepseek':
-            response = self.client.chat.completions.create(
-                model=self.cfg.llm.model,
-                messages=[
-                    {"role": "system", "content": rule_prompt},
-                    {"role": "user", "content": buyer_prompt_text}
-                ],
-                response_format={'type': 'json_object'}
-            )
-            structured_response = json.loads(response.choices[0].message.content)
-            return structured_response["justification"], structured_response["buyer_action"]
+    def buy_policy_llm(self, rule_prompt, buyer_prompt_text, counterpart=None):
+        with call_tags(agent=self.name, counterpart=counterpart, role="buyer", call="action"):
+            response = self.client.complete(rule_prompt, buyer_prompt_text, BuyerActionResponse)
+        return response["justification"], response["buyer_action"]
 
     def buy(self, rules, seller, historical_messages=""):
         """
@@ -234,6 +148,7 @@ class BuyerBaselineAgent:
             horizon=self.horizon,
             is_gossip=self.is_gossip,
             use_equilibrium_knowledge=self.use_equilibrium_knowledge,
+            layout=self.prompt_layout,
         ).substitute(
             buyer_name=self.name,
             seller_name=seller.name,
@@ -247,7 +162,7 @@ class BuyerBaselineAgent:
             buyer_Ls_reward=self.env.payoff_matrix[("L", "s")][1],
         ).strip()
 
-        justification, buyer_action = self.buy_policy_llm(rules, buyer_prompt_text)
+        justification, buyer_action = self.buy_policy_llm(rules, buyer_prompt_text, seller.name)
         return justification, buyer_action
 
     def update_stm(self, round_idx, round_info):
@@ -270,67 +185,17 @@ class BuyerBaselineAgent:
 
         round_context = f""" In round {round_idx}, I, {self.name}, was matched with seller {seller_name}. The seller chose {seller_action}. I chose {buyer_action}. My reward was {buyer_reward}. This is my justification: "{buyer_justification}".{extra}
         """
-        self.stm.append(round_context)
+        self.stm.append(round_context, summary=summarize_round(self.name, round_idx, round_info))
 
 
 class BuyerGossipAgent(BuyerBaselineAgent):
     def __init__(self, client, agent_id, cfg, log_path, horizon_length, env):
         super().__init__(client, agent_id, cfg, log_path, horizon_length, env)
 
-    def gossip_policy_llm(self, rule_prompt, gossip_prompt_text):
-        response_class = BuyerGossipResponse
-        if self.cfg.llm.api == 'openai' or self.cfg.llm.api == 'gemini-v2':
-            response = self.client.beta.chat.completions.parse(
-                model=self.cfg.llm.model,
-                messages=[
-                    {"role": "developer", "content": rule_prompt},
-                    {"role": "user", "content": gossip_prompt_text}
-                ],
-                response_format=response_class,
-            )
-            return (response.choices[0].message.parsed.justification,
-                    response.choices[0].message.parsed.tone,
-                    response.choices[0].message.parsed.gossip)
-        elif self.cfg.llm.api == 'together':
-            response = self.client.chat.completions.create(
-                model=self.cfg.llm.model,
-                messages=[
-                    {"role": "system", "content": rule_prompt},
-                    {"role": "user", "content": gossip_prompt_text}
-                ],
-                response_format={'type': 'json_schema',
-                                 "schema": response_class.model_json_schema()}
-            )
-            response_content = json.loads(response.choices[0].message.content)
-            return (response_content['justification'],
-                    response_content['tone'],
-                    response_content['gossip'])
-        elif self.cfg.llm.api == "gemini":
-            response = self.client.models.generate_content(
-                model=self.cfg.llm.model,
-                contents=[rule_prompt, gossip_prompt_text],
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": response_class,
-                }
-            )
-            response_content = json.loads(response.text)
-            return (response_content['justification'],
-                    response_content['tone'],
-                    response_content['gossip'])
-        elif self.cfg.llm.api == 'deepseek':
-            response = self.client.chat.completions.create(
-                model=self.cfg.llm.model,
-                messages=[
-                    {"role": "system", "content": rule_prompt},
-                    {"role": "user", "content": gossip_prompt_text}
-                ],
-                response_format={'type': 'json_object'}
-            )
-            structured_response = json.loads(response.choices[0].message.content)
-            return (structured_response["justification"],
-                    structured_response["tone"],
-                    structured_response["gossip"])
+    def gossip_policy_llm(self, rule_prompt, gossip_prompt_text, counterpart=None):
+        with call_tags(agent=self.name, counterpart=counterpart, role="buyer", call="gossip"):
+            response = self.client.complete(rule_prompt, gossip_prompt_text, BuyerGossipResponse)
+        return response["justification"], response["tone"], response["gossip"]
 
     def gossip(self, rules, seller, seller_action, buyer_action, seller_reward, buyer_reward, historical_messages):
         """
@@ -342,6 +207,7 @@ class BuyerGossipAgent(BuyerBaselineAgent):
         gossip_prompt_text = buyerGossipPrompt(
             horizon=self.horizon,
             use_equilibrium_knowledge=self.use_equilibrium_knowledge,
+            layout=self.prompt_layout,
         ).substitute(
             buyer_name=self.name,
             seller_name=seller.name,
@@ -355,7 +221,7 @@ class BuyerGossipAgent(BuyerBaselineAgent):
             horizon_length=self.horizon_length,
         ).strip()
 
-        justification, tone, gossip_response = self.gossip_policy_llm(rules, gossip_prompt_text)
+        justification, tone, gossip_response = self.gossip_policy_llm(rules, gossip_prompt_text, seller.name)
         return justification, tone, gossip_response
 
     def update_stm(self, round_idx, round_info):
@@ -374,4 +240,4 @@ class BuyerGossipAgent(BuyerBaselineAgent):
 
         round_context = f""" In round {round_idx}, I, {self.name}, was matched with seller {seller_name}. The seller chose {seller_action}. I chose {buyer_action}. My reward was {buyer_reward}. This is my justification: "{buyer_justification}".{extra}
         """
-        self.stm.append(round_context)
\ No newline at end of file
+        self.stm.append(round_context, summary=summarize_round(self.name, round_idx, round_info))
\ No newline at end of file
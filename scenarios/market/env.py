@@ -1,3 +1,5 @@
+from scenarios.common.memory import ShortTermMemory
+
 class ProductChoiceMarketEnv:
     """
     Multi-seller / multi-buyer product-choice environment.
@@ -33,7 +35,7 @@ class ProductChoiceMarketEnv:
         for agent in list(sellers) + list(buyers):
             agent.actions = []
             agent.rewards = [] # stores the reward obtained at every time step
-            agent.stm = [] # The interaction log for each episode    
+            agent.stm = ShortTermMemory.from_config(self.config) # The interaction log for each episode    
 
     def step(self, seller_action, buyer_action):
         # Refuse to buy: no sale, no production, no cost.
@@ -1,10 +1,10 @@
 import numpy as np
-import wandb
-from omegaconf import OmegaConf
 
+from scenarios.common.metrics import discount_vector, discounted_returns, inequality_metrics, row_means, stack, std_err
+from scenarios.common.metrics_sink import make_metrics_sink
 
-def init_log(cfg, is_test):
-    cfg_dict = OmegaConf.to_container(cfg, resolve=True)
+
+def init_log(cfg, is_test, log_path):
     model_name = cfg.llm.model.replace("/", "_") # Replace slashes to avoid issues with wandb
     game_name = cfg.experiment.env.game_name
     discount_factor = cfg.experiment.env.discount_factor
@@ -19,47 +19,13 @@ def init_log(cfg, is_test):
     )
     trial_name = cfg.metadata.trial_timestamp
 
-    run = wandb.init(
-        entity="ALIGN",
-        project=project_name,
-        group=group_name,
-        name=trial_name,
-        dir=cfg.metadata.save_dir,
-        config=cfg_dict,
-    )
-    return run
+    return make_metrics_sink(cfg, log_path, project_name, group_name, trial_name)
 
 
 def close_log(run):
     run.finish()
 
 
-def get_std_err(data):
-    data = np.asarray(data, dtype=float)
-    if data.size == 0:
-        return 0.0
-    std_dev = np.std(data)  # ddof=0
-    std_err = std_dev / np.sqrt(len(data))
-    return float(std_err)
-
-
-def compute_avg_reward(agent):
-    rewards = np.asarray(getattr(agent, "rewards", []), dtype=float)
-    return float(np.mean(rewards)) if rewards.size else 0.0
-
-
-def compute_dis_cum_reward(agent, discount_factor):
-    rewards = np.asarray(getattr(agent, "rewards", []), dtype=float)
-    if rewards.size == 0:
-        return 0.0
-    gamma = float(discount_factor)
-    disc = 0.0
-    g = 1.0
-    for r in rewards:
-        disc += g * float(r)
-        g *= gamma
-    return float(disc)
-
 def compute_deal_rate(round_infos):
     if len(round_infos) == 0:
         return 0.0
@@ -121,19 +87,15 @@ def compute_welfare_per_round(round_infos):
 def compute_discounted_welfare(round_infos, discount_factor):
     if len(round_infos) == 0:
         return 0.0
-    gamma = float(discount_factor)
-    disc = 0.0
-    g = 1.0
-    for ri in round_infos:
-        disc += g * (float(ri.get("seller_reward", 0.0)) + float(ri.get("buyer_reward", 0.0)))
-        g *= gamma
-    return float(disc)
+    welfare = np.array([float(ri.get("seller_reward", 0.0)) + float(ri.get("buyer_reward", 0.0)) for ri in round_infos])
+    return float(welfare @ discount_vector(discount_factor, len(welfare)))
 
 
 # -----------------------------
 # Main logging function (episode)
 # -----------------------------
 def logging_metrics_market(
+    run,
     sellers,
     buyers,
     round_infos: list,
@@ -141,6 +103,7 @@ def logging_metrics_market(
 ):
     """
     Call once per episode.
+    - run: the metrics sink returned by `init_log`
     - sellers, buyers: lists of agent objects
     - round_infos: list of per-round logs for the episode
     """
@@ -157,15 +120,13 @@ def logging_metrics_market(
     welfare_per_round = compute_welfare_per_round(round_infos)
     discounted_welfare = compute_discounted_welfare(round_infos, discount_factor)
 
-    # ---- per-agent metrics ----
-    seller_avg_rewards = [compute_avg_reward(a) for a in sellers]
-    buyer_avg_rewards = [compute_avg_reward(a) for a in buyers]
+    # ---- per-agent metrics, over the stacked (agents x steps) rewards of the sellers, then the buyers ----
+    rewards, num_rewards = stack([getattr(a, "rewards", []) for a in list(sellers) + list(buyers)])
+    all_avg_rewards = row_means(rewards, num_rewards)
+    all_disc_returns = discounted_returns(rewards, discount_factor)
 
-    seller_disc_returns = [compute_dis_cum_reward(a, discount_factor) for a in sellers]
-    buyer_disc_returns = [compute_dis_cum_reward(a, discount_factor) for a in buyers]
-
-    all_avg_rewards = seller_avg_rewards + buyer_avg_rewards
-    all_disc_returns = seller_disc_returns + buyer_disc_returns
+    seller_avg_rewards, buyer_avg_rewards = all_avg_rewards[:len(sellers)], all_avg_rewards[len(sellers):]
+    seller_disc_returns, buyer_disc_returns = all_disc_returns[:len(sellers)], all_disc_returns[len(sellers):]
 
     # requested aggregates
     avg_reward_seller = float(np.mean(seller_avg_rewards)) if len(seller_avg_rewards) else 0.0
@@ -177,16 +138,16 @@ def logging_metrics_market(
     avg_disc_return_all_agents = float(np.mean(all_disc_returns)) if len(all_disc_returns) else 0.0
 
     # standard errors (helpful in plots)
-    se_avg_reward_seller = get_std_err(seller_avg_rewards)
-    se_avg_reward_buyer = get_std_err(buyer_avg_rewards)
-    se_avg_reward_all = get_std_err(all_avg_rewards)
+    se_avg_reward_seller = std_err(seller_avg_rewards)
+    se_avg_reward_buyer = std_err(buyer_avg_rewards)
+    se_avg_reward_all = std_err(all_avg_rewards)
 
-    se_disc_return_seller = get_std_err(seller_disc_returns)
-    se_disc_return_buyer = get_std_err(buyer_disc_returns)
-    se_disc_return_all = get_std_err(all_disc_returns)
+    se_disc_return_seller = std_err(seller_disc_returns)
+    se_disc_return_buyer = std_err(buyer_disc_returns)
+    se_disc_return_all = std_err(all_disc_returns)
 
-    # ---- wandb.log: episode-level ----
-    wandb.log({
+    # ---- episode-level ----
+    run.log({
         # deals + outcome distribution
         "Deal Rate": deal_rate,
         "Pair Prop (Hc)": pair_props["Hc"],
@@ -220,16 +181,21 @@ def logging_metrics_market(
         "StdErr Disc Return Seller": se_disc_return_seller,
         "StdErr Disc Return Buyer": se_disc_return_buyer,
         "StdErr Disc Return All": se_disc_return_all,
+
+        # inequality between all agents
+        **inequality_metrics(all_disc_returns, "Discounted Returns (all agents)"),
     })
 
-    # ---- wandb.log: per-agent (like donor game) ----
+    # ---- per-agent (like donor game) ----
+    agent_metrics = {}
     for idx, a in enumerate(sellers):
-        wandb.log({
+        agent_metrics.update({
             f"Seller {idx} Avg Reward": seller_avg_rewards[idx],
             f"Seller {idx} Discounted Return": seller_disc_returns[idx],
         })
     for idx, a in enumerate(buyers):
-        wandb.log({
+        agent_metrics.update({
             f"Buyer {idx} Avg Reward": buyer_avg_rewards[idx],
             f"Buyer {idx} Discounted Return": buyer_disc_returns[idx],
-        })
\ No newline at end of file
+        })
+    run.log(agent_metrics)
\ No newline at end of file
@@ -1,7 +1,10 @@
 import textwrap
 from string import Template
 
+from scenarios.common.templates import compiled_template, join_sections
 
+
+@compiled_template
 def rulePrompt(horizon: str, is_gossip: bool) -> Template:
     """
     Shared rules prompt for the Transaction Market.
@@ -75,7 +78,8 @@ def rulePrompt(horizon: str, is_gossip: bool) -> Template:
 
 
 
-def sellerPrompt(horizon: str, is_gossip: bool, use_equilibrium_knowledge: bool) -> Template:
+@compiled_template
+def sellerPrompt(horizon: str, is_gossip: bool, use_equilibrium_knowledge: bool, layout: str = "default") -> Template:
     identity = textwrap.dedent("""\
         ## Seller Instructions
         ### Identity and Observation
@@ -184,12 +188,13 @@ def sellerPrompt(horizon: str, is_gossip: bool, use_equilibrium_knowledge: bool)
     """)
 
     sections = [identity, objective, memory, community, accountability, equilibrium_knowledge, action_rule, response_instruction]
-    prompt_text = "\n\n".join(s.strip() for s in sections if s)
+    prompt_text = join_sections(sections, dynamic=[identity, memory, community], layout=layout)
     return Template(prompt_text)
 
 
 
-def buyerPrompt(horizon: str, is_gossip: bool, use_equilibrium_knowledge: bool) -> Template:
+@compiled_template
+def buyerPrompt(horizon: str, is_gossip: bool, use_equilibrium_knowledge: bool, layout: str = "default") -> Template:
     identity = textwrap.dedent("""\
         ## Buyer Instructions
         ### Identity and Observation
@@ -291,12 +296,13 @@ def buyerPrompt(horizon: str, is_gossip: bool, use_equilibrium_knowledge: bool)
     """)
 
     sections = [identity, objective, memory, community, equilibrium_knowledge, action_rule, response]
-    prompt_text = "\n\n".join(s.strip() for s in sections if s)
+    prompt_text = join_sections(sections, dynamic=[identity, memory, community], layout=layout)
     return Template(prompt_text)
 
 
 
-def buyerGossipPrompt(horizon: str, use_equilibrium_knowledge: bool) -> Template:
+@compiled_template
+def buyerGossipPrompt(horizon: str, use_equilibrium_knowledge: bool, layout: str = "default") -> Template:
     """
     Build the buyer-side gossip prompt for the Transaction Market.
     """
@@ -425,7 +431,7 @@ def buyerGossipPrompt(horizon: str, use_equilibrium_knowledge: bool) -> Template
             gossip_rule, response_instruction
         ]
 
-    prompt_text = "\n\n".join(s.strip() for s in sections if s)
+    prompt_text = join_sections(sections, dynamic=[identity, memory, community_messages], layout=layout)
     return Template(prompt_text)
 
 
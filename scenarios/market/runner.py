@@ -1,12 +1,15 @@
-import json
 from itertools import product
 
 import numpy as np
-from omegaconf import OmegaConf
 
 from scenarios.market.env import ProductChoiceMarketEnv
 from scenarios.market.prompt import rulePrompt
 from scenarios.market.log_metrics import init_log, logging_metrics_market, close_log
+from scenarios.common.wal import RoundLog
+from scenarios.common.message_log import MessageLog
+from scenarios.common.interaction_log import InteractionLog
+from scenarios.market.utility import message_subjects
+from llm.telemetry import call_tags
 
 from scenarios.market.agent import (
     BuyerBaselineAgent,
@@ -108,143 +111,163 @@ class ProductChoiceMarketRunner:
             rng.shuffle(pairs)
         return pairs
 
+    # ---------------------------
+    # rounds
+    # ---------------------------
+    def play_round(self, round_index, seller, buyer, historical_messages, num_rounds):
+        """
+        Play one seller/buyer interaction (1-based `round_index`), update both agents and return the round info.
+        """
+        # ---- seller chooses quality ----
+        if self.is_gossip:
+            seller_justification, seller_action = seller.sell(
+                rules=self.rules,
+                buyer=buyer,
+                historical_messages=historical_messages.view(seller.name),  # seller can read public log
+            )
+        else:
+            seller_justification, seller_action = seller.sell(
+                rules=self.rules,
+                buyer=buyer,
+            )
+        assert seller_action in ("H", "L"), f"Invalid seller_action: {seller_action}"
+
+        # ---- buyer chooses purchase/refuse ----
+        if self.is_gossip:
+            buyer_justification, buyer_action = buyer.buy(
+                rules=self.rules,
+                seller=seller,
+                historical_messages=historical_messages.view(seller.name),  # buyer can read public log
+            )
+        else:
+            buyer_justification, buyer_action = buyer.buy(
+                rules=self.rules,
+                seller=seller,
+            )
+        assert buyer_action in ("c", "s", "none"), f"Invalid buyer_action: {buyer_action}"
+
+        # ---- env payoff ----
+        seller_reward, buyer_reward = self.env.step(
+            seller_action=seller_action,
+            buyer_action=buyer_action,
+        )
+
+        # ---- buyer gossip (ONLY buyer publishes) ----
+        gossip_pack = None
+        if self.is_gossip:
+            g_just, g_tone, g_msg = buyer.gossip(
+                rules=self.rules,
+                seller=seller,
+                seller_action=seller_action,
+                buyer_action=buyer_action,
+                seller_reward=seller_reward,
+                buyer_reward=buyer_reward,
+                historical_messages=historical_messages.view(seller.name),
+            )
+            gossip_pack = {
+                "buyer_gossip_justification": g_just,
+                "tone": g_tone,
+                "gossip": g_msg,
+            }
+
+        # ---- round log ----
+        round_info = {
+            "round": round_index,
+            "seller_name": seller.name,
+            "buyer_name": buyer.name,
+            "seller_action": seller_action,
+            "buyer_action": buyer_action,
+            "seller_reward": float(seller_reward),
+            "buyer_reward": float(buyer_reward),
+            "seller_justification": seller_justification,
+            "buyer_justification": buyer_justification,
+        }
+        if gossip_pack is not None:
+            round_info.update(gossip_pack)
+
+        self.apply_round(round_index, seller, buyer, round_info, historical_messages)
+
+        print(f"Round {round_index}/{num_rounds}")
+        print(f"Seller: {seller.name}, action: {seller_action}, reward: {seller_reward}")
+        print(f"Buyer: {buyer.name}, action: {buyer_action}, reward: {buyer_reward}")
+        if self.is_gossip:
+            print(f"Gossip from {buyer.name} to public: {g_msg} (tone: {g_tone})")
+        return round_info
+
+    def apply_round(self, round_index, seller, buyer, round_info, historical_messages):
+        """
+        Apply the outcome of a played (or logged) round to both agents and the public log.
+        """
+        # Store rewards only (no resources tracked)
+        seller.rewards.append(round_info["seller_reward"])
+        buyer.rewards.append(round_info["buyer_reward"])
+
+        # Optional action logs
+        if hasattr(seller, "actions"):
+            seller.actions.append({"round": round_index, "seller_action": round_info["seller_action"]})
+        if hasattr(buyer, "actions"):
+            buyer.actions.append({"round": round_index, "buyer_action": round_info["buyer_action"]})
+
+        if self.is_gossip:
+            historical_messages.append(
+                {
+                    "round": round_index,
+                    "seller": seller.name,
+                    "buyer": buyer.name,
+                    "tone": round_info["tone"],
+                    "message": round_info["gossip"],
+                }
+            )
+
+        # Update STM if you keep it
+        if hasattr(seller, "update_stm"):
+            seller.update_stm(round_index, round_info)
+        if hasattr(buyer, "update_stm"):
+            buyer.update_stm(round_index, round_info)
+
     # ---------------------------
     # run
     # ---------------------------
     def run_simulation(self, is_test: bool):
-        run = init_log(self.cfg, is_test)
+        run = init_log(self.cfg, is_test, self.log_path)
+        round_log = RoundLog.for_run(self.cfg, self.log_path)
 
-        scenario_data = {"config": OmegaConf.to_container(self.cfg, resolve=True)}
-        episode_logs = {}
-        episode_data = {}
+        interaction_log = InteractionLog(self.log_path, self.cfg)
         episode_round_infos = []
 
         # Public log (buyers write; everyone can read)
-        historical_messages = []
+        historical_messages = MessageLog.from_config(self.cfg, message_subjects)
 
         # Reset env + agent episode buffers
         self.env.reset(self.sellers, self.buyers)
 
-        schedule = self.all_pairs_schedule(shuffle=True)
+        # the shuffled schedule is logged, so a resumed run replays the same order
+        schedule = round_log.schedule(1, self.all_pairs_schedule(shuffle=True), self.sellers + self.buyers)
+        interaction_log.expect_rounds(1, len(schedule))
 
         for round_index, (seller, buyer) in enumerate(schedule, start=1):
-            # ---- seller chooses quality ----
-            if self.is_gossip:
-                seller_justification, seller_action = seller.sell(
-                    rules=self.rules,
-                    buyer=buyer,
-                    historical_messages=historical_messages,  # seller can read public log
-                )
-            else:
-                seller_justification, seller_action = seller.sell(
-                    rules=self.rules,
-                    buyer=buyer,
-                )
-            assert seller_action in ("H", "L"), f"Invalid seller_action: {seller_action}"
-
-            # ---- buyer chooses purchase/refuse ----
-            if self.is_gossip:
-                buyer_justification, buyer_action = buyer.buy(
-                    rules=self.rules,
-                    seller=seller,
-                    historical_messages=historical_messages,  # buyer can read public log
-                )
-            else:
-                buyer_justification, buyer_action = buyer.buy(
-                    rules=self.rules,
-                    seller=seller,
-                )
-            assert buyer_action in ("c", "s", "none"), f"Invalid buyer_action: {buyer_action}"
-
-            # ---- env payoff ----
-            seller_reward, buyer_reward = self.env.step(
-                seller_action=seller_action,
-                buyer_action=buyer_action,
-            )
-
-            # Store rewards only (no resources tracked)
-            seller.rewards.append(float(seller_reward))
-            buyer.rewards.append(float(buyer_reward))
-
-            # Optional action logs
-            if hasattr(seller, "actions"):
-                seller.actions.append({"round": round_index, "seller_action": seller_action})
-            if hasattr(buyer, "actions"):
-                buyer.actions.append({"round": round_index, "buyer_action": buyer_action})
-
-            # ---- buyer gossip (ONLY buyer publishes) ----
-            gossip_pack = None
-            if self.is_gossip:
-                g_just, g_tone, g_msg = buyer.gossip(
-                    rules=self.rules,
-                    seller=seller,
-                    seller_action=seller_action,
-                    buyer_action=buyer_action,
-                    seller_reward=seller_reward,
-                    buyer_reward=buyer_reward,
-                    historical_messages=historical_messages,
-                )
-                gossip_pack = {
-                    "buyer_gossip_justification": g_just,
-                    "tone": g_tone,
-                    "gossip": g_msg,
-                }
-                
-                historical_messages.append(
-                    {
-                        "round": round_index,
-                        "seller": seller.name,
-                        "buyer": buyer.name,
-                        "tone": g_tone,
-                        "message": g_msg,
-                    }
+            with call_tags(episode=1, round=round_index):
+                round_info = round_log.play_or_restore(
+                    1,
+                    round_index,
+                    lambda: self.play_round(round_index, seller, buyer, historical_messages, len(schedule)),
+                    lambda round_info: self.apply_round(round_index, seller, buyer, round_info, historical_messages),
                 )
-
-            # ---- round log ----
-            round_info = {
-                "round": round_index,
-                "seller_name": seller.name,
-                "buyer_name": buyer.name,
-                "seller_action": seller_action,
-                "buyer_action": buyer_action,
-                "seller_reward": float(seller_reward),
-                "buyer_reward": float(buyer_reward),
-                "seller_justification": seller_justification,
-                "buyer_justification": buyer_justification,
-            }
-            if gossip_pack is not None:
-                round_info.update(gossip_pack)
-
-            episode_data[f"round_{round_index}"] = round_info
+            interaction_log.write(1, round_index, round_info)
             episode_round_infos.append(round_info)
 
-            # Update STM if you keep it
-            if hasattr(seller, "update_stm"):
-                seller.update_stm(round_index, round_info)
-            if hasattr(buyer, "update_stm"):
-                buyer.update_stm(round_index, round_info)
-
-            print(f"Round {round_index}/{len(schedule)}")
-            print(f"Seller: {seller.name}, action: {seller_action}, reward: {seller_reward}")
-            print(f"Buyer: {buyer.name}, action: {buyer_action}, reward: {buyer_reward}")
-            if self.is_gossip:
-                print(f"Gossip from {buyer.name} to public: {g_msg} (tone: {g_tone})")
-
 
         # ---- metrics ----
         logging_metrics_market(
+            run,
             sellers=self.sellers,
             buyers=self.buyers,
             round_infos=episode_round_infos,
             discount_factor=self.discount_factor,
         )
 
-        episode_logs["interaction"] = episode_data
-        scenario_data["episode_1"] = episode_logs
-
+        round_log.close()
         close_log(run)
+        interaction_log.close()
 
-        with open(self.log_path, "w") as f:
-            json.dump(scenario_data, f, indent=4)
-
-        print(f"Simulation completed. Logs saved to {self.log_path}")
\ No newline at end of file
+        print(f"Simulation completed. Logs saved to {interaction_log.path}")
@@ -12,4 +12,20 @@ class BuyerActionResponse(BaseModel):
 class BuyerGossipResponse(BaseModel):
     justification: str
     tone: str
-    gossip: str
\ No newline at end of file
+    gossip: str
+
+
+def summarize_round(name, round_idx, round_info):
+    """ One-line summary of a round from the perspective of `name`, used for older rounds in the STM """
+    if name == round_info["seller_name"]:
+        summary = f"Round {round_idx}: seller to {round_info['buyer_name']}, I chose {round_info['seller_action']}, the buyer chose {round_info['buyer_action']}, my reward {round_info['seller_reward']}."
+    else:
+        summary = f"Round {round_idx}: buyer from {round_info['seller_name']}, the seller chose {round_info['seller_action']}, I chose {round_info['buyer_action']}, my reward {round_info['buyer_reward']}."
+    if "tone" in round_info:
+        summary += f" Buyer message tone: {round_info['tone']}."
+    return summary
+
+
+def message_subjects(message):
+    """ Agents a public message is about: buyers only publish messages about the seller """
+    return [message["seller"]]
@@ -0,0 +1,27 @@
+import numpy as np
+
+from scenarios.common.population import payoff_tables
+from scenarios.common.vec_env import VecGameEnv
+from scenarios.market.env import ProductChoiceMarketEnv
+
+
+class ProductChoiceMarketVecEnv(VecGameEnv):
+    """
+    `num_envs` repeated seller-buyer product-choice games with the payoffs of `ProductChoiceMarketEnv`.
+    Player 0 is the seller (1 = high quality H, 0 = low quality L), player 1 the buyer (1 = customized c,
+    2 = standardized s, 0 = refuse to buy).
+    """
+
+    def __init__(self, cfg, num_envs, max_steps=None, seed=None):
+        self.seller_rewards, self.buyer_rewards = payoff_tables(ProductChoiceMarketEnv(cfg), "market")
+        super().__init__(cfg, num_envs, max_steps, seed)
+
+    def _play(self, actions):
+        seller_action, buyer_action = actions[:, 0], actions[:, 1]
+        if not np.isin(seller_action, (0, 1)).all():
+            raise ValueError("Seller actions must be 1 (H) or 0 (L).")
+        if not np.isin(buyer_action, (0, 1, 2)).all():
+            raise ValueError("Buyer actions must be 1 (c), 2 (s) or 0 (none).")
+        seller_action, buyer_action = seller_action.astype(np.intp), buyer_action.astype(np.intp)
+        rewards = np.stack([self.seller_rewards[seller_action, buyer_action], self.buyer_rewards[seller_action, buyer_action]], axis=1)
+        return rewards, actions.astype(float)
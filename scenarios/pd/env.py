@@ -1,3 +1,5 @@
+from scenarios.common.memory import ShortTermMemory
+
 class PDEnv:
     def __init__(self, cfg):
         self.config = cfg
@@ -12,7 +14,7 @@ class PDEnv:
         for agent in agents:
             agent.actions = []
             agent.rewards = [] # stores the reward obtained at every time step
-            agent.stm = [] # The interaction log for each episode
+            agent.stm = ShortTermMemory.from_config(self.config) # The interaction log for each episode
 
     def step(self, actions):
         action1, action2 = actions
@@ -2,7 +2,10 @@ import os
 import textwrap
 from string import Template
 
+from scenarios.common.templates import compiled_template, join_sections
 
+
+@compiled_template
 def rulePrompt(horizon: str, is_gossip: bool) -> Template:
     """
     Build a rules prompt for the prisoner's dilemma game.
@@ -91,7 +94,8 @@ def rulePrompt(horizon: str, is_gossip: bool) -> Template:
     return Template(prompt_text)
 
 
-def actionPrompt(horizon: str, is_gossip: bool, use_equilibrium_knowledge: bool
+@compiled_template
+def actionPrompt(horizon: str, is_gossip: bool, use_equilibrium_knowledge: bool, layout: str = "default"
 ) -> Template:
     """
     Build the action prompt for a single round of prisoner's dilemma.
@@ -226,12 +230,13 @@ def actionPrompt(horizon: str, is_gossip: bool, use_equilibrium_knowledge: bool
         sections = [identity, objective, memory, community_messages, accountability, equilibrium_knowledge, pd_rule, response_instruction]
     else:
         sections = [identity, objective, memory, community_messages, accountability, pd_rule, response_instruction]
-    full_prompt = "\n\n".join(s.strip() for s in sections if s)
+    full_prompt = join_sections(sections, dynamic=[identity, memory, community_messages], layout=layout)
 
     return Template(full_prompt)
 
 
-def gossipPrompt(horizon: str, use_equilibrium_knowledge: bool) -> Template:
+@compiled_template
+def gossipPrompt(horizon: str, use_equilibrium_knowledge: bool, layout: str = "default") -> Template:
     """
     Build the gossip prompt for prisoner's dilemma.
     """
@@ -354,7 +359,7 @@ def gossipPrompt(horizon: str, use_equilibrium_knowledge: bool) -> Template:
         sections = [identity, objective, memory, community_messages, accountability, equilibrium_knowledge, gossip_rule, response_instruction]
     else:
         sections = [identity, objective, memory, community_messages, accountability, gossip_rule, response_instruction]
-    prompt_text = "\n\n".join(s.strip() for s in sections if s)
+    prompt_text = join_sections(sections, dynamic=[identity, memory, community_messages], layout=layout)
     return Template(prompt_text)
 
 
@@ -3,9 +3,13 @@ from scenarios.pd.env import PDEnv
 from scenarios.pd.prompt import rulePrompt
 from scenarios.pd.utility import *
 from scenarios.pd.log_metrics import *
+from scenarios.common.parallel import play_schedule, play_batch, play_episodes
+from scenarios.common.wal import RoundLog
+from scenarios.common.message_log import MessageLog
+from scenarios.common.interaction_log import InteractionLog
+from llm.telemetry import call_tags
 import numpy as np
 from itertools import combinations
-import json
 
 class PDRunner:
     def __init__(self, cfg, client, log_path):
@@ -30,13 +34,15 @@ class PDRunner:
         ]
         return agents
 
-    def round_robin_pd_game(self, agents):
+    def round_robin_pd_game(self, agents, flatten=True):
         """
         Return an ordered list of unordered pairs (a, b) such that:
         1) Each unordered pair appears exactly once.
         2) The order spreads appearances across rounds (round-robin 'circle' method).
 
         One pair plays per round — the list order IS the round order.
+        With flatten=False, return the circle-method matchings instead: a list of
+        rounds, each a list of disjoint pairs that can be played at the same time.
         """
         agents = list(agents)
         n = len(agents)
@@ -63,81 +69,135 @@ class PDRunner:
             # Rotate everything except the first element
             players = [players[0]] + [players[-1]] + players[1:-1]
 
+        if not flatten:
+            return rounds
         # Flatten rounds to a single pair-per-round schedule
         schedule = [pair for rnd in rounds for pair in rnd]
         return schedule
 
+    def play_round(self, round_index, pair, historical_messages, outbox=None):
+        """
+        Play one simultaneous-move round between the two agents of `pair`, update both agents and return the round info.
+        If `outbox` is given, the round's public message is collected there instead of being appended to `historical_messages`.
+        """
+        actions = []
+        action_justifications = []
+        for agent_id in range(2):
+            if self.is_gossip:
+                action_justification, action = pair[agent_id].act(self.rules, pair[1-agent_id], historical_messages.view(pair[1-agent_id].name))
+            else:
+                action_justification, action = pair[agent_id].act(self.rules, pair[1-agent_id])
+            assert action in ["C", "D"], "Invalid action taken by agent {}.".format(agent_id)
+            actions.append(action)
+            action_justifications.append(action_justification)
+        rewards = self.env.step(actions)
+        print(f"Round {round_index+1}: Player 1: {pair[0].name}, Action: {actions[0]}, Player 2: {pair[1].name}, Action: {actions[1]}, Rewards: {rewards}\n")
+        
+        if self.is_gossip:
+            tones = []
+            messages = []
+            message_justifications = []
+            for agent_id in range(2):
+                gossip_justification, tone, message = pair[agent_id].gossip(self.rules, pair[1-agent_id], actions[1-agent_id], historical_messages.view(pair[1-agent_id].name))
+                messages.append(message)
+                tones.append(tone)
+                message_justifications.append(gossip_justification)
+            cur_round_info = {"player_1": pair[0].name, "player_2": pair[1].name, "action_1": actions[0], "action_2": actions[1], "reward_1": rewards[0], "reward_2": rewards[1], "action_justification_1": action_justifications[0], "action_justification_2": action_justifications[1], "tone_1": tones[0], "tone_2": tones[1], "message_1": messages[0], "message_2": messages[1], "gossip_justification_1": message_justifications[0], "gossip_justification_2": message_justifications[1]} # Update the trajectory(STM) of the players with this current round info
+        else:
+            cur_round_info = {"player_1": pair[0].name, "player_2": pair[1].name, "action_1": actions[0], "action_2": actions[1], "reward_1": rewards[0], "reward_2": rewards[1], "action_justification_1": action_justifications[0], "action_justification_2": action_justifications[1]} # Update the trajectory(STM) of the players with this current round info
+
+        self.apply_round(round_index, pair, cur_round_info, historical_messages, outbox)
+        return cur_round_info
+
+    def apply_round(self, round_index, pair, cur_round_info, historical_messages, outbox=None):
+        """
+        Apply the outcome of a played (or logged) round to both agents and the public message log (or `outbox`)
+        """
+        if self.is_gossip:
+            message_summary = {"round": {round_index+1}, "player_1": pair[0].name, "player_2": pair[1].name, f"message from {pair[0].name}": cur_round_info["message_1"], f"message from {pair[1].name}": cur_round_info["message_2"]}
+            (historical_messages if outbox is None else outbox).append(message_summary)
+        for idx, agent in enumerate(pair):
+            agent.update_stm(round_index+1, cur_round_info)
+            agent.actions.append(cur_round_info[f"action_{idx+1}"])
+            agent.rewards.append(cur_round_info[f"reward_{idx+1}"])
+
+    def play_or_restore(self, round_log, episode, round_index, pair, historical_messages, outbox=None, step=None):
+        with call_tags(episode=episode, round=round_index+1):
+            cur_round_info = round_log.play_or_restore(
+                episode, round_index+1,
+                lambda: self.play_round(round_index, pair, historical_messages, outbox),
+                lambda cur_round_info: self.apply_round(round_index, pair, cur_round_info, historical_messages, outbox),
+            )
+        if step is not None:
+            cur_round_info["step"] = step
+        self.interaction_log.write(episode, round_index+1, cur_round_info) # Log data per round
+        return cur_round_info
+
+    def play_matching(self, round_log, episode, first_round_index, pairs, historical_messages, step):
+        """
+        Play all disjoint pairs of one circle-method matching as time step `step` (1-based).
+        Every pair reads the public log as it was at the start of the step; the step's
+        messages are appended to the log in pair order once all pairs have finished.
+        """
+        outboxes = [[] for _ in pairs]
+        play_batch(pairs, lambda i, pair: self.play_or_restore(round_log, episode, first_round_index + i, pair, historical_messages, outboxes[i], step), self.cfg.runtime.max_workers)
+        for outbox in outboxes:
+            historical_messages.extend(outbox)
+
+    def play_episode(self, round_log, episode, agents, max_workers=None):
+        """
+        Reset `agents` and play episode `episode` (1-based) with them
+        """
+        historical_messages = MessageLog.from_config(self.cfg, message_subjects)
+        self.env.reset(agents)
+        if self.cfg.runtime.concurrent_matching:
+            # one time step per circle-method matching; its disjoint pairs play simultaneously
+            num_rounds = 0
+            matchings = round_log.schedule(episode, self.round_robin_pd_game(agents, flatten=False), agents)
+            self.interaction_log.expect_rounds(episode, sum(len(pairs) for pairs in matchings))
+            for step, pairs in enumerate(matchings):
+                self.play_matching(round_log, episode, num_rounds, pairs, historical_messages, step + 1)
+                num_rounds += len(pairs)
+        else:
+            all_pairs_schedule = round_log.schedule(episode, self.round_robin_pd_game(agents), agents)
+            self.interaction_log.expect_rounds(episode, len(all_pairs_schedule))
+            play_schedule(all_pairs_schedule, lambda round_index, pair: self.play_or_restore(round_log, episode, round_index, pair, historical_messages), max_workers)
+
     def run_simulation(self, is_test):
         """
         run simulation
         """
-        run = init_log(self.cfg, is_test)
-        scenario_data = {}
-        scenario_data["config"] = OmegaConf.to_container(self.cfg, resolve=True)
-        for episode in range(self.cfg.experiment.env.num_episodes):
-            episode_logs = {}
-            episode_data = {}
-            historical_messages = []
-            self.env.reset(self.agents)
-            # rounds = self.round_robin_donor_game(self.agents)
-            all_pairs_schedule = self.round_robin_pd_game(self.agents)
+        run = init_log(self.cfg, is_test, self.log_path)
+        round_log = RoundLog.for_run(self.cfg, self.log_path)
+        self.interaction_log = InteractionLog(self.log_path, self.cfg)
+        # Without gossip a round only touches its own two agents, so independent rounds can overlap
+        max_workers = self.cfg.runtime.max_workers if self.cfg.runtime.parallel_rounds and not self.is_gossip else None
+        # Episodes are independent: in parallel, each plays with its own agents
+        parallel_episodes = self.cfg.runtime.get("parallel_episodes", False)
 
-            for round_index, pair in enumerate(all_pairs_schedule):
-                actions = []
-                action_justifications = []
-                for agent_id in range(2):
-                    if self.is_gossip:
-                        action_justification, action = pair[agent_id].act(self.rules, pair[1-agent_id], historical_messages)
-                    else:
-                        action_justification, action = pair[agent_id].act(self.rules, pair[1-agent_id])
-                    assert action in ["C", "D"], "Invalid action taken by agent {}.".format(agent_id)
-                    actions.append(action)
-                    action_justifications.append(action_justification)
-                rewards = self.env.step(actions)
-                print(f"Round {round_index+1}: Player 1: {pair[0].name}, Action: {actions[0]}, Player 2: {pair[1].name}, Action: {actions[1]}, Rewards: {rewards}\n")
-                
-                if self.is_gossip:
-                    tones = []
-                    messages = []
-                    message_justifications = []
-                    for agent_id in range(2):
-                        gossip_justification, tone, message = pair[agent_id].gossip(self.rules, pair[1-agent_id], actions[1-agent_id], historical_messages)
-                        messages.append(message)
-                        tones.append(tone)
-                        message_justifications.append(gossip_justification)
-                    message_summary = {"round": {round_index+1}, "player_1": pair[0].name, "player_2": pair[1].name, f"message from {pair[0].name}": messages[0], f"message from {pair[1].name}": messages[1]}
-                    historical_messages.append(message_summary)
-                    cur_round_info = {"player_1": pair[0].name, "player_2": pair[1].name, "action_1": actions[0], "action_2": actions[1], "reward_1": rewards[0], "reward_2": rewards[1], "action_justification_1": action_justifications[0], "action_justification_2": action_justifications[1], "tone_1": tones[0], "tone_2": tones[1], "message_1": messages[0], "message_2": messages[1], "gossip_justification_1": message_justifications[0], "gossip_justification_2": message_justifications[1]} # Update the trajectory(STM) of the players with this current round info
-                else:
-                    cur_round_info = {"player_1": pair[0].name, "player_2": pair[1].name, "action_1": actions[0], "action_2": actions[1], "reward_1": rewards[0], "reward_2": rewards[1], "action_justification_1": action_justifications[0], "action_justification_2": action_justifications[1]} # Update the trajectory(STM) of the players with this current round info
-                episode_data[f"round_{round_index+1}"] = cur_round_info # Log data per round
+        def play(episode):
+            agents = self.init_agents() if parallel_episodes else self.agents
+            self.play_episode(round_log, episode, agents, max_workers)
+            return agents
 
-                for idx, agent in enumerate(pair):
-                    agent.update_stm(round_index+1, cur_round_info)
-                    agent.actions.append(actions[idx])
-                    agent.rewards.append(rewards[idx])
-            
-            for k, agent in enumerate(self.agents):
-                rewards = agent.rewards
+        episodes = play_episodes(self.cfg.experiment.env.num_episodes, play, self.cfg.runtime.max_workers if parallel_episodes else None)
+        for agents in episodes:
+            step_series = {}
+            for k, agent in enumerate(agents):
                 actions_bits = [1 if action == "C" else 0 for action in agent.actions]
-                for step in range(len(actions_bits)):
-                    wandb.log({f"Agent {k} Action Per Step": actions_bits[step], f"Agent {k} Reward Per Step": rewards[step]})
+                step_series.update({f"Agent {k} Action Per Step": actions_bits, f"Agent {k} Reward Per Step": agent.rewards[:len(actions_bits)]})
+            run.log_series(step_series)
 
             # Compute metrics
-            returns_all = discounted_cumulative_rewards_all = [compute_dis_cum_reward(agent, 1.0) for agent in self.agents]
-            discounted_cumulative_rewards_all = [compute_dis_cum_reward(agent, self.discount_factor) for agent in self.agents] # This should be appended to the agent's long-term memory as a feedback signal
-            image_score_all = [compute_image_score(agent) for agent in self.agents]
-            cooperation_ratio_all = [compute_cooperation_ratio(agent) for agent in self.agents]
+            # The discounted cumulative rewards should be appended to the agents' long-term memory as a feedback signal
+            returns_all, discounted_cumulative_rewards_all, image_score_all, cooperation_ratio_all = compute_episode_metrics(agents, self.discount_factor)
 
-            episode_logs["interaction"] = episode_data
-            scenario_data[f"episode_{episode+1}"] = episode_logs
             # Log metrics per episode    
-            logging_metrics(cooperation_ratio_all, returns_all, discounted_cumulative_rewards_all, image_score_all)
+            logging_metrics(run, cooperation_ratio_all, returns_all, discounted_cumulative_rewards_all, image_score_all)
+        round_log.close()
         close_log(run)
-        # print(scenario_data)
-        with open(f'{self.log_path}', "w") as f:
-            json.dump(scenario_data, f, indent=4)
-        print(f"Simulation completed. Logs saved to {self.log_path}")
+        self.interaction_log.close()
+        print(f"Simulation completed. Logs saved to {self.interaction_log.path}")
 
 
 class PDRunnerrWithGreedyAgent:
@@ -184,12 +244,9 @@ class PDRunnerrWithGreedyAgent:
         """
         run simulation
         """
-        run = init_log(self.cfg, is_test)
-        scenario_data = {}
-        scenario_data["config"] = OmegaConf.to_container(self.cfg, resolve=True)
+        run = init_log(self.cfg, is_test, self.log_path)
+        interaction_log = InteractionLog(self.log_path, self.cfg)
         for episode in range(self.cfg.experiment.env.num_episodes):
-            episode_logs = {}
-            episode_data = {}
             historical_messages = []
             self.env.reset(self.agents)
             all_pairs_schedule = self.schedule_vs_newcomer()
@@ -223,34 +280,27 @@ class PDRunnerrWithGreedyAgent:
                     cur_round_info = {"player_1": pair[0].name, "player_2": pair[1].name, "action_1": actions[0], "action_2": actions[1], "reward_1": rewards[0], "reward_2": rewards[1], "action_justification_1": action_justifications[0], "action_justification_2": action_justifications[1], "tone_1": tones[0], "tone_2": tones[1], "message_1": messages[0], "message_2": messages[1], "gossip_justification_1": message_justifications[0], "gossip_justification_2": message_justifications[1]} # Update the trajectory(STM) of the players with this current round info
                 else:
                     cur_round_info = {"player_1": pair[0].name, "player_2": pair[1].name, "action_1": actions[0], "action_2": actions[1], "reward_1": rewards[0], "reward_2": rewards[1], "action_justification_1": action_justifications[0], "action_justification_2": action_justifications[1]} # Update the trajectory(STM) of the players with this current round info
-                episode_data[f"round_{round_index+1}"] = cur_round_info # Log data per round
+                interaction_log.write(episode+1, round_index+1, cur_round_info) # Log data per round
 
                 for idx, agent in enumerate(pair):
                     agent.update_stm(round_index+1, cur_round_info)
                     agent.actions.append(actions[idx])
                     agent.rewards.append(rewards[idx])
 
-            for step in range(len(greedy_agent.rewards)):
-                wandb.log({f"Greedy Agent Reward Per Step": greedy_agent.rewards[step]})
+            run.log_series({f"Greedy Agent Reward Per Step": greedy_agent.rewards})
 
+            step_series = {}
             for k, agent in enumerate(self.agents):
-                rewards = agent.rewards
                 actions_bits = [1 if action == "C" else 0 for action in agent.actions]
-                for step in range(len(actions_bits)):
-                    wandb.log({f"Agent {k} Action Per Step": actions_bits[step], f"Agent {k} Reward Per Step": rewards[step]})
+                step_series.update({f"Agent {k} Action Per Step": actions_bits, f"Agent {k} Reward Per Step": agent.rewards[:len(actions_bits)]})
+            run.log_series(step_series)
 
             # Compute metrics
-            returns_all = discounted_cumulative_rewards_all = [compute_dis_cum_reward(agent, 1.0) for agent in self.agents]
-            discounted_cumulative_rewards_all = [compute_dis_cum_reward(agent, self.discount_factor) for agent in self.agents] # This should be appended to the agent's long-term memory as a feedback signal
-            image_score_all = [compute_image_score(agent) for agent in self.agents]
-            cooperation_ratio_all = [compute_cooperation_ratio(agent) for agent in self.agents]
+            # The discounted cumulative rewards should be appended to the agents' long-term memory as a feedback signal
+            returns_all, discounted_cumulative_rewards_all, image_score_all, cooperation_ratio_all = compute_episode_metrics(self.agents, self.discount_factor)
 
-            episode_logs["interaction"] = episode_data
-            scenario_data[f"episode_{episode+1}"] = episode_logs
             # Log metrics per episode    
-            logging_metrics(cooperation_ratio_all, returns_all, discounted_cumulative_rewards_all, image_score_all)
+            logging_metrics(run, cooperation_ratio_all, returns_all, discounted_cumulative_rewards_all, image_score_all)
         close_log(run)
-        # print(scenario_data)
-        with open(f'{self.log_path}', "w") as f:
-            json.dump(scenario_data, f, indent=4)
-        print(f"Simulation completed. Logs saved to {self.log_path}")
\ No newline at end of file
+        interaction_log.close()
+        print(f"Simulation completed. Logs saved to {interaction_log.path}")
\ No newline at end of file
@@ -1,6 +1,8 @@
 from pydantic import BaseModel
 import numpy as np
 
+from scenarios.common.metrics import discounted_returns, row_means, signed_counts, stack, stack_attribute
+
 class ActionResponse(BaseModel):
     justification: str
     player_action: str
@@ -10,35 +12,28 @@ class GossipResponse(BaseModel):
     tone: str
     gossip: str
 
-def compute_return(agent, resources_start): 
-    return agent.resources - resources_start
-
-def compute_dis_cum_reward(agent, discount_factor):
+def compute_episode_metrics(agents, discount_factor):
     """
-    Calculate the discounted cumulative reward for an agent.
+    Return, discounted cumulative reward, image score and cooperation ratio of every agent in an
+    episode, as arrays over `agents`
     """
-    discounted_cumulative_reward = 0
-    for idx, reward in enumerate(agent.rewards):
-        discounted_cumulative_reward += (discount_factor ** idx) * reward
-    return discounted_cumulative_reward
+    rewards, _ = stack_attribute(agents, "rewards")
+    cooperations, num_actions = stack([[action == "C" for action in agent.actions] for agent in agents], dtype=bool)
+    return (
+        rewards.sum(axis=-1),
+        discounted_returns(rewards, discount_factor),
+        signed_counts(cooperations, num_actions),
+        row_means(cooperations, num_actions),
+    )
 
-def compute_image_score(agent):
-    """
-    Calculate the image score for an agent based on their donations.
-    """
-    image_score = 0
-    for action in agent.actions:
-        if action == "C":
-            image_score += 1
-        else:
-            image_score -= 1
-    return image_score
+def summarize_round(name, round_idx, round_info):
+    """ One-line summary of a round from the perspective of `name`, used for older rounds in the STM """
+    me, other = ("1", "2") if name == round_info["player_1"] else ("2", "1")
+    summary = f"Round {round_idx}: vs {round_info['player_' + other]}, I played {round_info['action_' + me]}, they played {round_info['action_' + other]}, my reward {round_info['reward_' + me]}."
+    if "tone_" + other in round_info:
+        summary += f" Their message tone: {round_info['tone_' + other]}."
+    return summary
 
-def compute_cooperation_ratio(agent):
-    """
-    Calculate the cooperation ratio for an agent.
-    """
-    if len(agent.actions) == 0:
-        return 0.0
-    cooperation_count = sum(1 for action in agent.actions if action == "C")
-    return cooperation_count / len(agent.actions)
\ No newline at end of file
+def message_subjects(message):
+    """ Agents a public message is about: each player's message is about the other one """
+    return [message["player_1"], message["player_2"]]
@@ -0,0 +1,23 @@
+import numpy as np
+
+from scenarios.common.population import payoff_tables
+from scenarios.common.vec_env import VecGameEnv
+from scenarios.pd.env import PDEnv
+
+
+class PDVecEnv(VecGameEnv):
+    """
+    `num_envs` repeated prisoner's dilemmas with the payoffs of `PDEnv`.
+    Actions: 1 = cooperate (C), 0 = defect (D) for both players.
+    """
+
+    def __init__(self, cfg, num_envs, max_steps=None, seed=None):
+        self.rewards_1, self.rewards_2 = payoff_tables(PDEnv(cfg), "pd")
+        super().__init__(cfg, num_envs, max_steps, seed)
+
+    def _play(self, actions):
+        if not np.isin(actions, (0, 1)).all():
+            raise ValueError("PD actions must be 1 (cooperate) or 0 (defect).")
+        action_1, action_2 = actions[:, 0].astype(np.intp), actions[:, 1].astype(np.intp)
+        rewards = np.stack([self.rewards_1[action_1, action_2], self.rewards_2[action_1, action_2]], axis=1)
+        return rewards, actions.astype(float)
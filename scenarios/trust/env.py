@@ -1,3 +1,5 @@
+from scenarios.common.memory import ShortTermMemory
+
 class TrustGameEnv:
     def __init__(self, cfg):
         self.config = cfg
@@ -13,7 +15,7 @@ class TrustGameEnv:
             agent.returned_amounts = [] # stores the amount returned by the agent every time they take on the responder role
             agent.returned_ratios = [] # stores the return ratio (returned amount / (investment * investment_ratio)) by the agent every time they take on the responder role
             agent.rewards = []  # stores the reward obtained at every time step (so includes both investor and responder roles)
-            agent.stm = []  # The interaction log for each episode
+            agent.stm = ShortTermMemory.from_config(self.config)  # The interaction log for each episode
     
     def step(self, investor, responder, investment, investment_ratio, returned_amount, returned_ratio):
         investor.resources = investor.resources - investment + returned_amount
@@ -2,6 +2,9 @@ import os
 import textwrap
 from string import Template
 
+from scenarios.common.templates import compiled_template, join_sections
+
+@compiled_template
 def rulePrompt(horizon: str, is_gossip: bool) -> Template:
     """
     Build a rules prompt for the (traditional) trust game.
@@ -135,10 +138,12 @@ def rulePrompt(horizon: str, is_gossip: bool) -> Template:
     return Template(prompt_text)
 
 
+@compiled_template
 def investorPrompt(
     horizon: str,
     is_gossip: bool,
-    use_equilibrium_knowledge: bool
+    use_equilibrium_knowledge: bool,
+    layout: str = "default"
 ) -> Template:
     """
     Build the investor-instruction prompt for a single round of the (standard) trust game.
@@ -262,14 +267,16 @@ def investorPrompt(
             trust_rule, response_instruction
         ]
 
-    full_prompt = "\n\n".join(s.strip() for s in sections if s)
+    full_prompt = join_sections(sections, dynamic=[identity, memory, community_messages, trust_rule, response_instruction], layout=layout)
     return Template(full_prompt)
 
 
+@compiled_template
 def responderPrompt(
     horizon: str,
     is_gossip: bool,
-    use_equilibrium_knowledge: bool
+    use_equilibrium_knowledge: bool,
+    layout: str = "default"
 ) -> Template:
     """
     Build the responder-instruction prompt for choosing the return amount
@@ -401,11 +408,12 @@ def responderPrompt(
             return_rule, response_instruction
         ]
 
-    full_prompt = "\n\n".join(s.strip() for s in sections if s)
+    full_prompt = join_sections(sections, dynamic=[identity, memory, community_messages, return_rule, response_instruction], layout=layout)
     return Template(full_prompt)
 
 
-def investorGossipPrompt(horizon: str, use_equilibrium_knowledge: bool) -> Template:
+@compiled_template
+def investorGossipPrompt(horizon: str, use_equilibrium_knowledge: bool, layout: str = "default") -> Template:
     """
     Build the investor-side gossip prompt for the trust game.
 
@@ -547,11 +555,12 @@ def investorGossipPrompt(horizon: str, use_equilibrium_knowledge: bool) -> Templ
             gossip_rule, response_instruction
         ]
 
-    prompt_text = "\n\n".join(s.strip() for s in sections if s)
+    prompt_text = join_sections(sections, dynamic=[identity, memory, community_messages, gossip_rule, response_instruction], layout=layout)
     return Template(prompt_text)
 
 
-def responderGossipPrompt(horizon: str, use_equilibrium_knowledge: bool) -> Template:
+@compiled_template
+def responderGossipPrompt(horizon: str, use_equilibrium_knowledge: bool, layout: str = "default") -> Template:
     """
     Build the responder-side gossip prompt for the trust game.
 
@@ -696,5 +705,5 @@ def responderGossipPrompt(horizon: str, use_equilibrium_knowledge: bool) -> Temp
             gossip_rule, response_instruction
         ]
 
-    prompt_text = "\n\n".join(s.strip() for s in sections if s)
+    prompt_text = join_sections(sections, dynamic=[identity, memory, community_messages, gossip_rule, response_instruction], layout=layout)
     return Template(prompt_text)
\ No newline at end of file
@@ -2,9 +2,14 @@ from scenarios.trust.agent import BaselineAgent, GossipAgent
 from scenarios.trust.env import TrustGameEnv
 from scenarios.trust.prompt import rulePrompt
 from scenarios.trust.log_metrics import *
+from scenarios.trust.utility import message_subjects
+from scenarios.common.parallel import play_schedule
+from scenarios.common.wal import RoundLog
+from scenarios.common.schedule import round_robin_schedule
+from scenarios.common.message_log import MessageLog
+from scenarios.common.interaction_log import InteractionLog
+from llm.telemetry import call_tags
 import numpy as np
-from itertools import combinations
-import json
 
 class TrustGameRunner:
     def __init__(self, cfg, client, log_path):
@@ -41,124 +46,98 @@ class TrustGameRunner:
         3. Each agent is donor ⌊(n-1)/2⌋ or ⌈(n-1)/2⌉ times.
 
         One pair plays per round —­ the list order *is* the round order.
-        Raises RuntimeError if no schedule exists (rare for n ≤ 10).
+        Built constructively in O(n^2) (see scenarios/common/schedule.py).
         """
-        n = len(agents)
-        plays_per_agent  = n - 1
-        donor_low, donor_high = plays_per_agent // 2, (plays_per_agent + 1) // 2
+        return round_robin_schedule(agents)
 
-        # --- all unordered pairs produced in one line with *combinations* ---
-        remaining_pairs = list(combinations(agents, 2))      # ← ★ here ★
-
-        # bookkeeping
-        donor_cnt, recip_cnt = {a: 0 for a in agents}, {a: 0 for a in agents}
-        last_role           = {a: None for a in agents}
-        used_pairs, schedule = set(), []
-
-        # depth-first search with back-tracking — minimalist but guaranteed
-        def dfs():
-            if len(schedule) == len(remaining_pairs):
-                return True
-
-            for a, b in remaining_pairs:
-                if (a, b) in used_pairs:
-                    continue
-
-                for donor, recip in ((a, b), (b, a)):      # orient the pair
-                    # quotas
-                    if donor_cnt[donor]   >= donor_high or recip_cnt[recip] >= donor_high:
-                        continue
-                    # role alternation
-                    if last_role[donor] == 'D' or last_role[recip] == 'R':
-                        continue
-
-                    # commit
-                    used_pairs.add((a, b))
-                    schedule.append((donor, recip))
-                    donor_cnt[donor]   += 1
-                    recip_cnt[recip]   += 1
-                    prev_d, prev_r      = last_role[donor], last_role[recip]
-                    last_role[donor]    = 'D'
-                    last_role[recip]    = 'R'
+    def play_round(self, round_index, pair, historical_messages):
+        """
+        Play one investor/responder interaction, update both agents and return the round info
+        """
+        print(f"Round {round_index + 1}")
+        investor, responder = pair
+        resources_before_investment = {"investor": investor.resources, "responder": responder.resources}
 
-                    if dfs():
-                        return True
+        if self.is_gossip:
+            investor_justification, investment = investor.invest(self.rules, responder, historical_messages.view(responder.name))
+        else:
+            investor_justification, investment = investor.invest(self.rules, responder)
+        # transfer investment from str to float if needed
+        if isinstance(investment, str):
+            investment = float(investment)
+        assert investment <= investor.resources, "Investment amount is invalid."
+        investment_ratio = investment/investor.resources if investor.resources > 0 else 0
+        benefit = investment * self.cfg.experiment.env.investment_multiplier
 
-                    # back-track
-                    used_pairs.remove((a, b))
-                    schedule.pop()
-                    donor_cnt[donor]   -= 1
-                    recip_cnt[recip]   -= 1
-                    last_role[donor]    = prev_d
-                    last_role[recip]    = prev_r
-            return False
+        if self.is_gossip:
+            # responder choose returns
+            responder_justification, returned_amount = responder.respond(self.rules, investor, investment, investment_ratio, benefit, historical_messages.view(investor.name))
+        else:
+            responder_justification, returned_amount = responder.respond(self.rules, investor, investment, investment_ratio, benefit)
+        if isinstance(returned_amount, str):
+            returned_amount = float(returned_amount)
+        assert returned_amount <= benefit, "Returned amount is invalid."
+        returned_ratio = returned_amount / (investment * self.investment_multiplier) if investment > 0 else 0
+        
+        print(f"Investor: {investor.name}, Investment: {investment},\n Justification: {investor_justification}")
+        print(f"Responder: {responder.name}, Returned Amount: {returned_amount},\n Justification: {responder_justification}")
+        # Gossip Phase
+        if self.is_gossip:
+            # investor gossip after observing investment and returned amount
+            investor_gossip_justification, investor_tone, investor_message = investor.investor_gossip(self.rules, responder, investment, investment_ratio, benefit, returned_amount, returned_ratio, historical_messages.view(responder.name))
+            # responder gossip after observing investment and returned amount
+            responder_gossip_justification, responder_tone, responder_message = responder.responder_gossip(self.rules, investor, investment, investment_ratio, benefit, returned_amount, returned_ratio, historical_messages.view(investor.name))
+            print(f"Investor: {investor.name}, Selected Tone: {investor_tone}, Gossip: {investor_message},\n Investor's Justification: {investor_gossip_justification}\n")
+            print(f"Responder: {responder.name}, Selected Tone: {responder_tone}, Gossip: {responder_message},\n Responder's Justification: {responder_gossip_justification}\n")
+            cur_round_info = {"investor_name": investor.name, "responder_name": responder.name, "resources_before_investment": resources_before_investment, "investment": investment, "investment_ratio": investment_ratio, "investor_justification": investor_justification, "returned_amount": returned_amount, "returned_ratio": returned_ratio, "responder_justification": responder_justification, "investor_tone":investor_tone, "investor_gossip": investor_message, "investor_gossip_justification": investor_gossip_justification, "responder_tone":responder_tone, "responder_gossip": responder_message, "responder_gossip_justification": responder_gossip_justification} # Update the trajectory(STM) of the players with this current round info 
+        else:
+            cur_round_info = {"investor_name": investor.name, "responder_name": responder.name, "resources_before_investment": resources_before_investment, "investment": investment, "investment_ratio": investment_ratio, "investor_justification": investor_justification, "returned_amount": returned_amount, "returned_ratio": returned_ratio, "responder_justification": responder_justification}
+        self.apply_round(round_index, pair, cur_round_info, historical_messages)
+        return cur_round_info
 
-        if not dfs():
-            raise RuntimeError("No valid schedule under the requested constraints.")
-        return schedule
+    def apply_round(self, round_index, pair, cur_round_info, historical_messages):
+        """
+        Apply the outcome of a played (or logged) round to both agents and the public message log
+        """
+        investor, responder = pair
+        if self.is_gossip:
+            message_summary_investor = {"round": {round_index+1}, "investor": investor.name, "responder": responder.name, f"message from {investor.name}": cur_round_info["investor_gossip"]}
+            message_summary_responder = {"round": {round_index+1}, "investor": investor.name, "responder": responder.name, f"message from {responder.name}": cur_round_info["responder_gossip"]}
+            historical_messages.append(message_summary_investor)
+            historical_messages.append(message_summary_responder)
+        investor.update_stm(round_index+1, cur_round_info)
+        responder.update_stm(round_index+1, cur_round_info)
+        self.env.step(investor, responder, cur_round_info["investment"], cur_round_info["investment_ratio"], cur_round_info["returned_amount"], cur_round_info["returned_ratio"])
+
+    def play_or_restore(self, round_log, episode, round_index, pair, historical_messages):
+        with call_tags(episode=episode, round=round_index+1):
+            cur_round_info = round_log.play_or_restore(
+                episode, round_index+1,
+                lambda: self.play_round(round_index, pair, historical_messages),
+                lambda cur_round_info: self.apply_round(round_index, pair, cur_round_info, historical_messages),
+            )
+        self.interaction_log.write(episode, round_index+1, cur_round_info) # Log data per round
+        return cur_round_info
 
     def run_simulation(self, is_test):
         """
         run simulation
         """
-        run = init_log(self.cfg, is_test)
+        run = init_log(self.cfg, is_test, self.log_path)
+        round_log = RoundLog.for_run(self.cfg, self.log_path)
         # Only one episode for trust game
-        episode_data = {}
-        episode_data["config"] = OmegaConf.to_container(self.cfg, resolve=True)
-        historical_messages = []
+        self.interaction_log = InteractionLog(self.log_path, self.cfg, episodes=False)
+        historical_messages = MessageLog.from_config(self.cfg, message_subjects)
         self.env.reset(self.agents)
-        all_pairs_schedule = self.round_robin_donor_game(self.agents)
-        for round_index, pair in enumerate(all_pairs_schedule):
-            print(f"Round {round_index + 1}")
-            investor, responder = pair
-            resources_before_investment = {"investor": investor.resources, "responder": responder.resources}
+        all_pairs_schedule = round_log.schedule(1, self.round_robin_donor_game(self.agents), self.agents)
+        self.interaction_log.expect_rounds(1, len(all_pairs_schedule))
+        # Without gossip a round only touches its own two agents, so independent rounds can overlap
+        max_workers = self.cfg.runtime.max_workers if self.cfg.runtime.parallel_rounds and not self.is_gossip else None
+        play_schedule(all_pairs_schedule, lambda round_index, pair: self.play_or_restore(round_log, 1, round_index, pair, historical_messages), max_workers)
 
-            if self.is_gossip:
-                investor_justification, investment = investor.invest(self.rules, responder, historical_messages)
-            else:
-                investor_justification, investment = investor.invest(self.rules, responder)
-            # transfer investment from str to float if needed
-            if isinstance(investment, str):
-                investment = float(investment)
-            assert investment <= investor.resources, "Investment amount is invalid."
-            investment_ratio = investment/investor.resources if investor.resources > 0 else 0
-            benefit = investment * self.cfg.experiment.env.investment_multiplier
-
-            if self.is_gossip:
-                # responder choose returns
-                responder_justification, returned_amount = responder.respond(self.rules, investor, investment, investment_ratio, benefit, historical_messages)
-            else:
-                responder_justification, returned_amount = responder.respond(self.rules, investor, investment, investment_ratio, benefit)
-            if isinstance(returned_amount, str):
-                returned_amount = float(returned_amount)
-            assert returned_amount <= benefit, "Returned amount is invalid."
-            returned_ratio = returned_amount / (investment * self.investment_multiplier) if investment > 0 else 0
-            
-            print(f"Investor: {investor.name}, Investment: {investment},\n Justification: {investor_justification}")
-            print(f"Responder: {responder.name}, Returned Amount: {returned_amount},\n Justification: {responder_justification}")
-            # Gossip Phase
-            if self.is_gossip:
-                # investor gossip after observing investment and returned amount
-                investor_gossip_justification, investor_tone, investor_message = investor.investor_gossip(self.rules, responder, investment, investment_ratio, benefit, returned_amount, returned_ratio, historical_messages)
-                # responder gossip after observing investment and returned amount
-                responder_gossip_justification, responder_tone, responder_message = responder.responder_gossip(self.rules, investor, investment, investment_ratio, benefit, returned_amount, returned_ratio, historical_messages)
-                print(f"Investor: {investor.name}, Selected Tone: {investor_tone}, Gossip: {investor_message},\n Investor's Justification: {investor_gossip_justification}\n")
-                print(f"Responder: {responder.name}, Selected Tone: {responder_tone}, Gossip: {responder_message},\n Responder's Justification: {responder_gossip_justification}\n")
-                message_summary_investor = {"round": {round_index+1}, "investor": investor.name, "responder": responder.name, f"message from {investor.name}": investor_message}
-                message_summary_responder = {"round": {round_index+1}, "investor": investor.name, "responder": responder.name, f"message from {responder.name}": responder_message}
-                historical_messages.append(message_summary_investor)
-                historical_messages.append(message_summary_responder)
-                cur_round_info = {"investor_name": investor.name, "responder_name": responder.name, "resources_before_investment": resources_before_investment, "investment": investment, "investment_ratio": investment_ratio, "investor_justification": investor_justification, "returned_amount": returned_amount, "returned_ratio": returned_ratio, "responder_justification": responder_justification, "investor_tone":investor_tone, "investor_gossip": investor_message, "investor_gossip_justification": investor_gossip_justification, "responder_tone":responder_tone, "responder_gossip": responder_message, "responder_gossip_justification": responder_gossip_justification} # Update the trajectory(STM) of the players with this current round info 
-            else:
-                cur_round_info = {"investor_name": investor.name, "responder_name": responder.name, "resources_before_investment": resources_before_investment, "investment": investment, "investment_ratio": investment_ratio, "investor_justification": investor_justification, "returned_amount": returned_amount, "returned_ratio": returned_ratio, "responder_justification": responder_justification}
-            episode_data[f"round_{round_index+1}"] = cur_round_info # Log data per round
-            investor.update_stm(round_index+1, cur_round_info)
-            responder.update_stm(round_index+1, cur_round_info)
-            self.env.step(investor, responder, investment, investment_ratio, returned_amount, returned_ratio)
-        
         # Logging metrics at the end of the episode
-        logging_metrics(self.agents, self.discount_factor)
+        logging_metrics(run, self.agents, self.discount_factor)
+        round_log.close()
         close_log(run)
-        with open(f'{self.log_path}', "w") as f:
-            json.dump(episode_data, f, indent=4)
-        print(f"Simulation completed. Logs saved to {self.log_path}")
\ No newline at end of file
+        self.interaction_log.close()
+        print(f"Simulation completed. Logs saved to {self.interaction_log.path}")
\ No newline at end of file
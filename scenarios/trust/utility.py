@@ -18,9 +18,22 @@ class ResponderGossipResponse(BaseModel):
     tone: str
     gossip: str
 
-def extract_json(s: str) -> str:
-    start = s.find("{")
-    end = s.rfind("}")
-    if start == -1 or end == -1 or end <= start:
-        raise ValueError(f"No JSON object found in string: {repr(s)}")
-    return s[start:end+1]
\ No newline at end of file
+
+def summarize_round(name, round_idx, round_info):
+    """ One-line summary of a round from the perspective of `name`, used for older rounds in the STM """
+    if name == round_info["investor_name"]:
+        summary = f"Round {round_idx}: investor with {round_info['responder_name']}, I invested {round_info['investment']} and got back {round_info['returned_amount']}."
+        tone_key = "responder_tone"
+    else:
+        summary = f"Round {round_idx}: responder to {round_info['investor_name']}, who invested {round_info['investment']}; I returned {round_info['returned_amount']}."
+        tone_key = "investor_tone"
+    if tone_key in round_info:
+        summary += f" Their message tone: {round_info[tone_key]}."
+    return summary
+
+
+def message_subjects(message):
+    """ Agents a public message is about: the party of the round that did not write it """
+    if f"message from {message['investor']}" in message:
+        return [message["responder"]]
+    return [message["investor"]]
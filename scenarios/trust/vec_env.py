@@ -0,0 +1,45 @@
+import numpy as np
+
+from scenarios.common.vec_env import VecGameEnv, alternating_roles
+
+
+class TrustGameVecEnv(VecGameEnv):
+    """
+    `num_envs` repeated trust games with the rules of `TrustGameEnv`: the two players alternate as investor
+    (player 0 at even steps) and responder. Actions are ratios in [0, 1]: the investor's is the share of its
+    resources it invests (the investment ratio), the responder's the share of the multiplied investment it
+    returns (the return ratio). Both are chosen simultaneously. Observations add both players' `resources`
+    and the current `investor`.
+    """
+
+    def __init__(self, cfg, num_envs, max_steps=None, seed=None):
+        env_cfg = cfg.experiment.env
+        self.investment_multiplier = env_cfg.investment_multiplier
+        self.initial_resources = float(env_cfg.initial_resources)
+        self.resources = np.full((num_envs, 2), self.initial_resources)
+        super().__init__(cfg, num_envs, max_steps, seed)
+
+    def _reset_games(self, mask):
+        self.resources[mask] = self.initial_resources
+
+    def _play(self, actions):
+        games = np.arange(self.num_envs)
+        investor, responder = alternating_roles(self.t)
+        investment_ratio = actions[games, investor].astype(float)
+        returned_ratio = actions[games, responder].astype(float)
+        if ((investment_ratio < 0) | (investment_ratio > 1) | (returned_ratio < 0) | (returned_ratio > 1)).any():
+            raise ValueError("Trust game actions must be ratios between 0 and 1.")
+        investment = investment_ratio * np.maximum(self.resources[games, investor], 0.0)
+        benefit = investment * self.investment_multiplier
+        returned_amount = returned_ratio * benefit
+        rewards = np.zeros((self.num_envs, 2))
+        rewards[games, investor] = returned_amount - investment
+        rewards[games, responder] = benefit - returned_amount
+        self.resources += rewards
+        played = np.empty((self.num_envs, 2))
+        played[games, investor] = investment_ratio
+        played[games, responder] = returned_ratio
+        return rewards, played
+
+    def _observe(self):
+        return {"resources": self.resources.copy(), "investor": alternating_roles(self.t)[0]}
@@ -0,0 +1,147 @@
+"""
+Sweep driver: expands Hydra-style sweep overrides into one job per configuration and runs the jobs
+on a pool of worker processes, each calling `main.run_experiment`.
+
+    python sweep.py --workers 8 experiment=donor,pd experiment.env.discount_factor=0.9,0.99 \
+        experiment.agents.is_gossip=true,false llm.model=o4-mini,gpt-4o-mini
+
+All workers share
+- one LLM response cache (`llm.cache`, SQLite; enabled for the sweep unless --no-shared-cache), so
+  configurations that send the same request pay for it once;
+- one requests/min and tokens/min budget per provider (`llm.rate_limit.shared_path`, a SQLite file
+  in the sweep directory), so N workers together stay within the provider's limits.
+
+To spread a sweep over several machines, run it on each with `--shard i/k` (the i-th of k disjoint
+slices of the job list). Sharing the cache and the budgets then needs their SQLite files on a
+filesystem with working locks; otherwise give each machine its own files and 1/k of the budget.
+
+The output of every job goes to `<sweep dir>/job_<i>.log`; a summary with per-job wall time, LLM
+calls and the aggregate throughput is printed and saved to `<sweep dir>/sweep.json`.
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing import get_context
+
+from hydra.core.override_parser.overrides_parser import OverridesParser
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "conf")
+
+
+def expand_overrides(overrides):
+    """ Cartesian product of the sweep overrides (`key=a,b,c`, `key=range(...)`): one override list per job """
+    choices = []
+    for override in OverridesParser.create().parse_overrides(overrides):
+        if override.is_sweep_override():
+            key = override.get_key_element()
+            choices.append([f"{key}={value}" for value in override.sweep_string_iterator()])
+        else:
+            choices.append([override.input_line])
+    return [list(job) for job in itertools.product(*choices)]
+
+
+def run_job(index, overrides, timestamp, log_file):
+    """ Compose the config of one job and run it in this worker process; all output goes to `log_file` """
+    start = time.perf_counter()
+    from hydra import compose, initialize_config_dir
+    from main import run_experiment
+
+    result = {"job": index, "overrides": overrides, "status": "done", "log_path": None, "error": None}
+    with open(log_file, "w", buffering=1) as f, contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
+        try:
+            with initialize_config_dir(config_dir=CONFIG_DIR, version_base=None):
+                cfg = compose(config_name="config", overrides=overrides)
+            result["log_path"] = run_experiment(cfg, timestamp)
+        except Exception as e:
+            traceback.print_exc()
+            result["status"] = "failed"
+            result["error"] = f"{type(e).__name__}: {e}"
+    result["wall_s"] = round(time.perf_counter() - start, 3)
+    # LLM calls of the job, from its call telemetry summary (if enabled)
+    summary_path = f"{os.path.splitext(result['log_path'])[0]}.calls.summary.json" if result["log_path"] else None
+    if summary_path and os.path.exists(summary_path):
+        with open(summary_path) as f:
+            summary = json.load(f)
+        result["llm_calls"] = summary["calls"]
+        result["cache_hits"] = summary["cache_hits"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a Hydra-style sweep of main.py configurations on a process pool.")
+    parser.add_argument("overrides", nargs="*", help="config overrides; comma-separated values (or range(...)) are swept")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--shard", default=None, metavar="I/K", help="run only the I-th of K slices of the jobs (0-based), e.g. one per machine")
+    parser.add_argument("--dir", default=None, help="sweep directory for job logs, the shared rate limit and the summary (default: sweeps/<timestamp>)")
+    parser.add_argument("--no-shared-cache", action="store_true", help="leave llm.cache as configured instead of enabling the shared response cache")
+    parser.add_argument("--dry-run", action="store_true", help="only list the jobs")
+    args = parser.parse_args()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    sweep_dir = os.path.abspath(args.dir or os.path.join("sweeps", timestamp))
+    jobs = list(enumerate(expand_overrides(args.overrides)))
+    if args.shard:
+        shard, num_shards = (int(x) for x in args.shard.split("/"))
+        jobs = jobs[shard::num_shards]
+
+    # settings shared by every job, unless the sweep sets them explicitly
+    keys = {override.split("=", 1)[0].lstrip("+~") for override in args.overrides}
+    shared = {"llm.rate_limit.shared_path": os.path.join(sweep_dir, "rate_limit.sqlite")}
+    if not args.no_shared_cache:
+        shared["llm.cache.enabled"] = "true"
+    shared = [f"{key}={value}" for key, value in shared.items() if key not in keys]
+    jobs = [(index, overrides + shared) for index, overrides in jobs]
+
+    print(f"Sweep of {len(jobs)} jobs on {args.workers} workers in {sweep_dir}")
+    for index, overrides in jobs:
+        print(f"  job {index}: {' '.join(overrides)}")
+    if args.dry_run or not jobs:
+        return
+    os.makedirs(sweep_dir, exist_ok=True)
+
+    results = []
+    start = time.perf_counter()
+    # one fresh process per job, so that wandb runs and module-level caches do not leak between configurations
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=get_context("spawn"), max_tasks_per_child=1) as pool:
+        futures = [
+            pool.submit(run_job, index, overrides, f"{timestamp}_job{index}", os.path.join(sweep_dir, f"job_{index}.log"))
+            for index, overrides in jobs
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            detail = result["log_path"] if result["status"] == "done" else result["error"]
+            print(f"[{len(results)}/{len(jobs)}] job {result['job']} {result['status']} in {result['wall_s']:.1f}s: {detail}", flush=True)
+    wall = time.perf_counter() - start
+
+    results.sort(key=lambda result: result["job"])
+    job_seconds = sum(result["wall_s"] for result in results)
+    calls = sum(result.get("llm_calls", 0) for result in results)
+    throughput = {
+        "jobs": len(results),
+        "failed": sum(result["status"] == "failed" for result in results),
+        "wall_s": round(wall, 3),
+        "job_s": round(job_seconds, 3), # the wall time of running the jobs one after another
+        "speedup": round(job_seconds / wall, 2) if wall else None,
+        "jobs_per_hour": round(len(results) / wall * 3600, 1) if wall else None,
+        "llm_calls": calls,
+        "cache_hits": sum(result.get("cache_hits", 0) for result in results),
+        "llm_calls_per_s": round(calls / wall, 2) if wall else None,
+    }
+    with open(os.path.join(sweep_dir, "sweep.json"), "w") as f:
+        json.dump({"workers": args.workers, "shard": args.shard, "overrides": args.overrides, "throughput": throughput, "jobs": results}, f, indent=4)
+    print(f"Sweep throughput: {throughput}")
+    print(f"Summary saved to {os.path.join(sweep_dir, 'sweep.json')}")
+    if throughput["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()